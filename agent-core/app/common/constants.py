@@ -43,6 +43,7 @@ class ERROR_MESSAGES(_ImmutableConstants):  # noqa: N801
     )
     AGENT_PROCESS_FAILED: str = "[Agent] Error while processing the request."
     STREAMING_CHANNEL_FAILED: str = "[Agent] Streaming channel failed."
+    MISSING_ACCOUNT_SCOPE: str = "[Agent] Knowledge base search without an account"
 
     # Events
     EVENT_CONSUMER_FAILED: str = "[Event] Failed to start RabbitMQ consumer: {error}"
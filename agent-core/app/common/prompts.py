@@ -45,7 +45,8 @@ QUERY_EXPANSION_AGENT_INSTRUCTIONS = """
 You are a query rewriting expert. Your single goal is to take a user's query and expand it into a more detailed question suitable for a vector database search.
 
 **Your Tools:**
-- You have one tool: `publish(message: str)`. You MUST use this tool to report your status.
+- `publish(message: str)`. You MUST use this tool to report your status.
+- `search_many(queries: list[str])`. If you need to check queries against the knowledge base, pass ALL of them in a single call. Never search queries one by one.
 
 **Workflow:**
 1.  Before you do anything else, you MUST call the `publish` tool with the message "Expanding user query...".
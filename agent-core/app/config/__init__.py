@@ -1,11 +1,27 @@
 """Application Config and settings."""
 
 from pathlib import Path
-from typing import ClassVar, Literal
+from typing import Any, ClassVar, Literal
 
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class IndexProfile(BaseModel):
+    """ANN index and search parameters of a knowledge base collection.
+
+    Set as JSON, e.g. `{"index_type": "HNSW", "params": {"M": 16,
+    "efConstruction": 200}, "search_params": {"ef": 64}}`.
+    """
+
+    index_type: Literal["AUTOINDEX", "HNSW", "IVF_FLAT", "IVF_PQ", "DISKANN"] = (
+        "AUTOINDEX"
+    )
+    params: dict[str, Any] = {}  # Index build parameters
+    search_params: dict[str, Any] = {}  # e.g. ef, nprobe, search_list
+    consistency_level: Literal["Strong", "Bounded", "Session", "Eventually"] = "Bounded"
+
+
 class AppSettings(BaseSettings):
     """Application Settings."""
 
@@ -32,6 +48,7 @@ class AppSettings(BaseSettings):
     REDIS_HOST: str
     REDIS_PORT: int = 6379
     REDIS_MEMORY_DB: int = 1
+    REDIS_CACHE_DB: int = 2
     # Maximum number of retries for publishing messages
     REDIS_PUBLISH_MAX_RETRIES: int = 5
 
@@ -48,21 +65,120 @@ class AppSettings(BaseSettings):
     TEXT_COLLECTION_NAME: str = "text_docs"
     VIDEO_COLLECTION_NAME: str = "videos"
     EMBEDDING_MODEL: str = "gemini-embedding-exp-03-07"
+    TEXT_EMBEDDING_BACKEND: Literal["gemini", "onnx"] = "gemini"
+    VIDEO_EMBEDDING_BACKEND: Literal["gemini", "onnx"] = "gemini"
+    QUERY_EMBEDDING_BATCH_ENABLED: bool = True
+    QUERY_EMBEDDING_MAX_BATCH_SIZE: int = 100  # Queries per coalesced request
+    QUERY_EMBEDDING_BATCH_WAIT_MS: float = 5.0  # Window to coalesce concurrent queries
     KB_SEARCH_LIMIT: int = 20
     TEXT_KNOWLEDGE_N_DOCS: int = 25
     VIDEO_KNOWLEDGE_N_DOCS: int = 20
 
+    ## Hybrid (dense + BM25) search
+    HYBRID_SEARCH_ENABLED: bool = False
+    HYBRID_SEARCH_LIMIT: int = 10  # Candidate depth when hybrid search is used
+    HYBRID_RRF_K: int = 60
+    HYBRID_SPARSE_DROP_RATIO: float = 0.2
+
     RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-4-v2"
     RERANK_DOCS_LIMIT: int = 10
     RERANKER_ONNX_PATH: str = "./models/minilm-l4-crossencoder.quant.onnx"
+    RERANK_MAX_BATCH_SIZE: int = 64  # Pairs per coalesced inference batch
+    RERANK_BATCH_WAIT_MS: float = 3.0  # Window to coalesce concurrent requests
+    RERANK_MAX_TOKENS: int = 256  # Token budget per (query, content) pair
+    RERANK_MAX_QUERY_TOKENS: int = 64
+    RERANK_BUCKET_SIZE: int = 16  # Pairs per length bucket padded together
+    RERANK_TOKEN_CACHE_SIZE: int = 10_000  # Chunks with cached token ids
+
+    ## Local ONNX embedding backend
+    ONNX_EMBEDDING_MODEL: str = "BAAI/bge-small-en-v1.5"  # Tokenizer
+    ONNX_EMBEDDING_PATH: str = "./models/bge-small-en-v1.5.quant.onnx"
+    ONNX_EMBEDDING_DIMENSIONS: int = 384  # Output size of the model
+    ONNX_EMBEDDING_POOLING: Literal["cls", "mean"] = "cls"
+    ONNX_EMBEDDING_MAX_TOKENS: int = 512
+    ONNX_EMBEDDING_BATCH_SIZE: int = 32  # Texts per inference batch
+    ONNX_EMBEDDING_THREADS: int = 2  # Inference batches run concurrently
+    ONNX_EMBEDDING_INTRA_OP_THREADS: int = 0  # 0 = ORT default
+    ONNX_EMBEDDING_QUERY_PREFIX: str = (
+        "Represent this sentence for searching relevant passages: "
+    )
+
+    ## Adaptive rerank depth (margins are in vector-score units)
+    ADAPTIVE_RERANK_ENABLED: bool = True
+    RERANK_MIN_DEPTH: int = 3  # Depth when the top hit has a clear lead
+    RERANK_SKIP_MARGIN: float = 0.1  # Top-hit lead that skips reranking
+    RERANK_SHRINK_MARGIN: float = 0.05  # Top-hit lead that shrinks reranking
+    RERANK_FLAT_SPREAD: float = 0.02  # Spread that widens to KB_SEARCH_LIMIT
+    RERANK_SCORE_FLOOR: float | None = None  # Prune results scoring below
+
+    ## Reranker ONNX Runtime session options (0 threads = ORT default)
+    RERANKER_INTRA_OP_THREADS: int = 0
+    RERANKER_INTER_OP_THREADS: int = 0
+    RERANKER_GRAPH_OPTIMIZATION: Literal["disable", "basic", "extended", "all"] = "all"
+    RERANKER_ENABLE_MEM_ARENA: bool = True
+    RERANKER_EXECUTION_MODE: Literal["sequential", "parallel"] = "sequential"
 
     ## Config
     VECTOR_DIMENSIONS: int = 1536
+    VECTOR_DTYPE: Literal["float32", "float16"] = "float32"
     VECTOR_DB_URI: str
     VECTOR_DB_TOKEN: str
+    VECTOR_DB_NUM_PARTITIONS: int = 64  # Partitions hashed from the account id
+    VECTOR_DB_INSERT_MAX_BYTES: int = 8 * 1024 * 1024  # Payload per insert request
+    VECTOR_DB_INSERT_MAX_RETRIES: int = 3
+    VECTOR_DB_INSERT_RETRY_DELAY: float = 1.0  # Seconds
+    TEXT_INDEX_PROFILE: IndexProfile = IndexProfile()
+    VIDEO_INDEX_PROFILE: IndexProfile = IndexProfile()
+    VECTOR_STORE_BACKEND: Literal["milvus", "local"] = "milvus"
+    LOCAL_VECTOR_STORE_PATH: str = "./data/vector_store"
+    LOCAL_VECTOR_STORE_INDEX: Literal["exact", "ivf"] = "exact"
+    LOCAL_VECTOR_STORE_IVF_MIN_ROWS: int = 50_000  # Exact search below this size
+    LOCAL_VECTOR_STORE_IVF_NPROBE: int = 16
+    CONTENT_STORE_ENABLED: bool = False
+    CONTENT_STORE_REDIS_DB: int = 3  # Must not evict, chunks are only stored here
+    CONTENT_STORE_HOT_ITEMS: int = 10_000  # In-process LRU of decompressed chunks
+    CONTENT_STORE_COMPRESSION_LEVEL: int = 3
+
+    ## Two-level retrieval over document summary vectors
+    DOCUMENT_INDEX_ENABLED: bool = False
+    DOCUMENT_INDEX_SUFFIX: str = "_documents"  # Appended to the chunk collection
+    DOCUMENT_SEARCH_LIMIT: int = 10  # Documents whose chunks are searched
+    DOCUMENT_MAX_CHUNKS: int = 3  # Chunk hits kept per document
+
+    ## Scheduled compaction (Celery beat)
+    COMPACTION_ENABLED: bool = True
+    COMPACTION_INTERVAL: int = 3600  # Seconds between segment health checks
+    COMPACTION_DELETE_THRESHOLD: int = 10_000  # Deleted rows since last compaction
+    COMPACTION_DELETED_RATIO: float = 0.1  # Deleted share of the stored rows
+    COMPACTION_SMALL_SEGMENT_ROWS: int = 10_000  # Rows under which a segment is small
+    COMPACTION_SMALL_SEGMENTS: int = 8  # Small segments that trigger a merge
+    COMPACTION_TIMEOUT: int = 1800  # Seconds to wait for a compaction job
+
+    ## Query embedding cache
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ITEMS: int = 2048  # In-process LRU size
+    EMBEDDING_CACHE_REDIS_MAX_ITEMS: int = 100_000  # Shared Redis tier size
+    EMBEDDING_CACHE_TTL: int = 86_400  # Seconds
+    EMBEDDING_CACHE_DTYPE: Literal["float16", "float32"] = "float16"
+
+    ## Semantic retrieval result cache
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # Cosine similarity for a hit
+    RESULT_CACHE_MAX_ENTRIES: int = 512  # Per collection, per worker
+    RESULT_CACHE_TTL: int = 3600  # Seconds
 
     # Training
     TRAINING_BATCH_SIZE: int = 10
+    TRAINING_INGEST_BATCH_SIZE: int = 500  # Chunks embedded together, then inserted
+    EMBEDDING_BATCH_MAX_ITEMS: int = 100  # Texts per embedding request
+    EMBEDDING_BATCH_MAX_TOKENS: int = 20_000  # Estimated tokens per embedding request
+    EMBEDDING_CONCURRENCY: int = 4  # Embedding requests in flight per process
+    EMBEDDING_MAX_RETRIES: int = 4
+    EMBEDDING_RETRY_DELAY: float = 1.0  # Seconds, doubled on every retry
+    TRAINING_EMBEDDING_CACHE_ENABLED: bool = True
+    TRAINING_EMBEDDING_CACHE_MAX_ITEMS: int = 500_000  # Chunk embeddings in Redis
+    TRAINING_EMBEDDING_CACHE_TTL: int = 2_592_000  # Seconds, refreshed on hits
+    TRAINING_INCREMENTAL_ENABLED: bool = True  # Re-train only changed chunks
     CHUNK_SIZE: int = 1500
     CHUNK_OVERLAP: int = 300
 
@@ -12,6 +12,7 @@ from app.common.types import FastAPIApp
 from app.config import settings
 from app.middlewares import error_handler, validate_jwt_token, validation_error_handler
 from app.modules.rabbitmq.listener import start_rabbitmq_listener
+from app.modules.reranker.runtime import get_reranker_runtime
 from app.modules.tracing.tracer import init_tracer
 from app.routes import add_scalar_routes, register_routes
 from app.utils.logger import logger
@@ -23,6 +24,8 @@ CORS_ORIGIN: str = settings.CORS_ORIGINS
 async def lifespan(app: FastAPI):
     """App lifespan handler for startup and ending events."""
     asyncio.create_task(start_rabbitmq_listener())  # noqa: RUF006
+    # Load the shared reranker once per worker before serving chats
+    await asyncio.to_thread(get_reranker_runtime)
     yield
     logger.info("Stopping the Agent Core Service...")
 
@@ -86,6 +86,7 @@ async def validate_jwt_token(request: Request, call_next: Any) -> Response:
 
         set_context("token", token)
         set_context("user_id", user_record.id)
+        set_context("account_id", user_record.account.id)
 
     except Exception as e:
         logger.error(f"Token validation failed: {e}")
@@ -7,6 +7,8 @@ from app.config import settings
 from app.utils.json_utils import json_dumps, json_loads
 
 CELERY_BROKER: str = settings.CELERY_BROKER
+COMPACTION_ENABLED: bool = settings.COMPACTION_ENABLED
+COMPACTION_INTERVAL: int = settings.COMPACTION_INTERVAL
 
 
 # Serializer registration
@@ -32,4 +34,15 @@ celery_app.conf.update(
     result_serializer="custom_json",
 )
 
-celery_app.autodiscover_tasks(["app.modules.events.training_events"])
+# Periodic tasks, scheduled by `celery beat`
+if COMPACTION_ENABLED:
+    celery_app.conf.beat_schedule = {
+        "compact-collections": {
+            "task": "compact_collections_task",
+            "schedule": COMPACTION_INTERVAL,
+        },
+    }
+
+celery_app.autodiscover_tasks(
+    ["app.modules.events.training_events", "app.modules.bg_process.maintenance"]
+)
@@ -0,0 +1,49 @@
+"""Periodic vector database maintenance tasks."""
+
+from redis.exceptions import LockError
+
+from app.modules.bg_process import celery_app
+from app.modules.cache import cache_redis_sync_client
+from app.modules.core.knowledge_bases import text_knowledge_base, video_knowledge_base
+from app.modules.db.compaction import COMPACTION_TIMEOUT, compact_collection
+from app.modules.db.mod_milvus import ModMilvus
+from app.utils.logger import logger
+
+COMPACTION_LOCK_KEY: str = "compaction:lock"
+
+
+@celery_app.task(name="compact_collections_task")
+def compact_collections_task(force: bool = False) -> None:
+    """Log segment health and compact the collections that need it."""
+    # The local store compacts itself on deletes
+    collections: list[ModMilvus] = [
+        collection
+        for knowledge_base in (text_knowledge_base, video_knowledge_base)
+        for collection in (
+            knowledge_base.vector_db,
+            knowledge_base.vector_db.document_index,
+        )
+        if isinstance(collection, ModMilvus)
+    ]
+
+    # Skip the run while a previous one is still compacting. Each collection
+    # waits up to COMPACTION_TIMEOUT, plus one for the segment health checks
+    lock = cache_redis_sync_client.lock(
+        COMPACTION_LOCK_KEY, timeout=COMPACTION_TIMEOUT * (len(collections) + 1)
+    )
+    if not lock.acquire(blocking=False):
+        logger.info("Compaction already running, skipped")
+        return
+
+    try:
+        for vector_db in collections:
+            try:
+                compact_collection(vector_db.client, vector_db.collection, force)
+            except Exception as e:
+                logger.error(f"[{vector_db.collection}] Compaction failed: {e}")
+    finally:
+        # Only released while it still holds this run's token
+        try:
+            lock.release()
+        except LockError:
+            logger.warning("Compaction lock expired before the run finished")
@@ -0,0 +1,16 @@
+"""Cache Module for Retrieval and Embedding Caches."""
+
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+
+from app.config import settings
+
+REDIS_HOST: str = settings.REDIS_HOST
+REDIS_PORT: int = settings.REDIS_PORT
+REDIS_CACHE_DB: int = settings.REDIS_CACHE_DB
+
+# Binary-safe Redis connection shared by all cache tiers
+cache_redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_CACHE_DB)
+
+# Synchronous connection for cache maintenance from Celery tasks
+cache_redis_sync_client = SyncRedis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_CACHE_DB)
@@ -0,0 +1,109 @@
+"""Redis cache for training chunk embeddings, keyed by content hash.
+
+Re-training a source, or crawling pages that share boilerplate, embeds the
+same chunk text again. Embeddings are cached by a hash of the exact chunk
+text, embedding model and vector dimensions, so only new text is embedded.
+"""
+
+import hashlib
+from time import time
+
+import numpy as np
+from redis import Redis as SyncRedis
+
+from app.utils.logger import logger
+
+
+class ChunkEmbeddingCache:
+    """Chunk embedding cache in a shared Redis tier.
+
+    Vectors are stored as packed float32 bytes, so cached embeddings are the
+    ones that would be inserted. Lookups refresh entries, and the oldest ones
+    are evicted over `max_items`.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        model: str,
+        dimensions: int,
+        redis_client: SyncRedis,
+        *,
+        max_items: int = 500_000,
+        ttl: int = 2_592_000,
+        prefix: str = "chunk_embedding_cache",
+    ):
+        """Chunk embedding cache constructor."""
+        self.model: str = model
+        self.dimensions: int = dimensions
+        self.redis_client: SyncRedis = redis_client
+        self.max_items: int = max_items
+        self.ttl: int = ttl
+        self.prefix: str = f"{prefix}:{model}:{dimensions}"
+        self.index_key: str = f"{self.prefix}:index"
+
+    def make_key(self, text: str) -> str:
+        """Build the cache key for a chunk text."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def decode(self, payload: bytes | None) -> list[float] | None:
+        """Unpack an embedding vector, ignoring entries of another size."""
+        if payload is None or len(payload) != self.dimensions * 4:
+            return None
+        return np.frombuffer(payload, dtype=np.float32).tolist()
+
+    def get_many(self, texts: list[str]) -> list[list[float] | None]:
+        """Get the cached embeddings of texts, None for misses."""
+        if not texts:
+            return []
+
+        keys = [self.make_key(text) for text in texts]
+        try:
+            now = time()
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.getex(key, ex=self.ttl)
+                payloads = pipe.execute()
+
+                hits = {
+                    key: now
+                    for key, payload in zip(keys, payloads, strict=True)
+                    if payload
+                }
+                if hits:
+                    pipe.zadd(self.index_key, hits)
+                    pipe.execute()
+        except Exception as e:
+            logger.warning(f"[ChunkEmbeddingCache] Redis lookup failed: {e}")
+            return [None] * len(texts)
+
+        return [self.decode(payload) for payload in payloads]
+
+    def set_many(self, texts: list[str], vectors: list[list[float]]) -> None:
+        """Store the embeddings of texts."""
+        if not texts:
+            return
+
+        try:
+            now = time()
+            index: dict[str, float] = {}
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for text, vector in zip(texts, vectors, strict=True):
+                    key = self.make_key(text)
+                    payload = np.asarray(vector, dtype=np.float32).tobytes()
+                    pipe.set(key, payload, ex=self.ttl)
+                    index[key] = now
+                pipe.zadd(self.index_key, index)
+                pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl)
+                pipe.zcard(self.index_key)
+                *_, size = pipe.execute()
+
+            # Enforce the size cap by evicting the least recently used entries
+            if size > self.max_items:
+                evicted = self.redis_client.zpopmin(
+                    self.index_key, size - self.max_items
+                )
+                if evicted:
+                    self.redis_client.delete(*[k for k, _ in evicted])
+        except Exception as e:
+            logger.warning(f"[ChunkEmbeddingCache] Redis write failed: {e}")
@@ -0,0 +1,183 @@
+"""Two-tier (in-process LRU + Redis) cache for query embeddings."""
+
+import asyncio
+import hashlib
+import re
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from threading import Lock
+from time import monotonic, time
+from typing import Literal
+
+import numpy as np
+from redis.asyncio import Redis
+
+from app.utils.logger import logger
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+EmbeddingDtype = Literal["float16", "float32"]
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so that trivial variations share a cache entry."""
+    text = unicodedata.normalize("NFKC", text)
+    return WHITESPACE_PATTERN.sub(" ", text).strip().casefold()
+
+
+class EmbeddingCache:
+    """Query embedding cache with an in-process LRU and a shared Redis tier.
+
+    Entries are keyed by normalized query text, embedding model and vector
+    dimensions, and are stored as packed float16/float32 bytes.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        model: str,
+        dimensions: int,
+        redis_client: Redis | None = None,
+        max_items: int = 2048,
+        redis_max_items: int = 100_000,
+        ttl: int = 86_400,
+        dtype: EmbeddingDtype = "float16",
+        prefix: str = "embedding_cache",
+    ):
+        """Embedding cache constructor."""
+        self.model: str = model
+        self.dimensions: int = dimensions
+        self.redis_client: Redis | None = redis_client
+        self.max_items: int = max_items
+        self.redis_max_items: int = redis_max_items
+        self.ttl: int = ttl
+        self.dtype: np.dtype = np.dtype(dtype)
+        self.prefix: str = f"{prefix}:{model}:{dimensions}"
+        self.index_key: str = f"{self.prefix}:index"
+
+        self._local: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = Lock()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def make_key(self, text: str) -> str:
+        """Build the cache key for a query text."""
+        digest = hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def encode(self, vector: list[float]) -> bytes:
+        """Pack an embedding vector into bytes."""
+        return np.asarray(vector, dtype=self.dtype).tobytes()
+
+    def decode(self, payload: bytes) -> list[float]:
+        """Unpack an embedding vector, inferring the stored dtype from its size."""
+        dtype = np.float16 if len(payload) == self.dimensions * 2 else np.float32
+        return np.frombuffer(payload, dtype=dtype).astype(np.float32).tolist()
+
+    def _get_local(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+
+            expires_at, payload = entry
+            if expires_at < monotonic():
+                del self._local[key]
+                return None
+
+            self._local.move_to_end(key)
+            return payload
+
+    def _set_local(self, key: str, payload: bytes) -> None:
+        with self._lock:
+            self._local[key] = (monotonic() + self.ttl, payload)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_items:
+                self._local.popitem(last=False)
+
+    async def _get_shared(self, key: str) -> bytes | None:
+        if self.redis_client is None:
+            return None
+
+        try:
+            return await self.redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"[EmbeddingCache] Redis lookup failed: {e}")
+            return None
+
+    async def _set_shared(self, key: str, payload: bytes) -> None:
+        if self.redis_client is None:
+            return
+
+        try:
+            now = time()
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(key, payload, ex=self.ttl)
+                pipe.zadd(self.index_key, {key: now})
+                pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl)
+                pipe.zcard(self.index_key)
+                *_, size = await pipe.execute()
+
+            # Enforce the size cap by evicting the oldest entries
+            if size > self.redis_max_items:
+                evicted = await self.redis_client.zpopmin(
+                    self.index_key, size - self.redis_max_items
+                )
+                if evicted:
+                    await self.redis_client.delete(*[k for k, _ in evicted])
+        except Exception as e:
+            logger.warning(f"[EmbeddingCache] Redis write failed: {e}")
+
+    async def get(self, text: str) -> list[float] | None:
+        """Get a cached embedding for the query text."""
+        key = self.make_key(text)
+
+        payload = self._get_local(key)
+        if payload is None:
+            payload = await self._get_shared(key)
+            if payload is None:
+                return None
+            self._set_local(key, payload)
+
+        return self.decode(payload)
+
+    async def set(self, text: str, vector: list[float]) -> None:
+        """Store an embedding for the query text in both tiers."""
+        key = self.make_key(text)
+        payload = self.encode(vector)
+        self._set_local(key, payload)
+        await self._set_shared(key, payload)
+
+    async def get_or_compute(
+        self,
+        text: str,
+        compute: Callable[[str], Awaitable[list[float] | None]],
+    ) -> list[float] | None:
+        """Get the embedding from cache or compute and store it.
+
+        Concurrent lookups of the same query (e.g. text and video knowledge
+        bases searching in parallel) share a single embedding call.
+        """
+        vector = await self.get(text)
+        if vector is not None:
+            return vector
+
+        key = self.make_key(text)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        vector = None
+        try:
+            vector = await compute(text)
+            if vector:
+                await self.set(text, vector)
+        finally:
+            # Waiters get no embedding when the call fails or is cancelled,
+            # the caller gets the original error
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.set_result(vector)
+
+        return vector
@@ -0,0 +1,186 @@
+"""Semantic cache for reranked retrieval results.
+
+Previous searches are looked up by cosine similarity of their query
+embeddings. Each entry is tagged with the `source_id`s of the documents it
+holds; invalidating a source bumps a shared Redis epoch so that every worker
+drops only the entries containing that source.
+"""
+
+import copy
+from dataclasses import dataclass, field
+from time import monotonic
+
+import numpy as np
+from agno.document import Document
+
+from app.modules.cache import cache_redis_client, cache_redis_sync_client
+from app.utils.logger import logger
+
+RESULT_CACHE_PREFIX = "result_cache"
+EPOCH_KEY = f"{RESULT_CACHE_PREFIX}:epoch"
+SOURCE_KEY_TEMPLATE = f"{RESULT_CACHE_PREFIX}:source:{{source_id}}"
+
+
+def get_source_ids(documents: list[Document]) -> set[str]:
+    """Collect the source ids of the given documents."""
+    source_ids: set[str] = set()
+    for doc in documents:
+        meta = doc.meta_data or {}
+        source_id = meta.get("source_id") if isinstance(meta, dict) else None
+        if source_id:
+            source_ids.add(source_id)
+    return source_ids
+
+
+def invalidate_cached_results(source_ids: list[str] | set[str]) -> None:
+    """Invalidate cached results containing any of the given sources.
+
+    Synchronous so it can be called from Celery training tasks.
+    """
+    if not source_ids:
+        return
+
+    try:
+        epoch: int = cache_redis_sync_client.incr(EPOCH_KEY)
+        cache_redis_sync_client.mset(
+            {SOURCE_KEY_TEMPLATE.format(source_id=sid): epoch for sid in source_ids}
+        )
+        logger.debug(f"[ResultCache] Invalidated sources {list(source_ids)}")
+    except Exception as e:
+        logger.warning(f"[ResultCache] Failed to invalidate sources: {e}")
+
+
+@dataclass
+class ResultCacheEntry:
+    """Cached reranked documents for one query."""
+
+    documents: list[Document]
+    source_ids: set[str]
+    epoch: int
+    expires_at: float
+
+
+@dataclass
+class ResultCacheStore:
+    """Fixed-capacity store of query vectors and their cached results."""
+
+    capacity: int
+    vectors: np.ndarray | None = None
+    entries: list[ResultCacheEntry | None] = field(default_factory=list)
+    next_slot: int = 0
+
+    def best_match(self, vector: np.ndarray) -> tuple[int, float]:
+        """Return the slot and cosine similarity of the closest live entry."""
+        if self.vectors is None or not self.entries:
+            return -1, 0.0
+
+        now = monotonic()
+        similarities = self.vectors[: len(self.entries)] @ vector
+        for slot, entry in enumerate(self.entries):
+            if entry is None or entry.expires_at < now:
+                similarities[slot] = -1.0
+
+        slot = int(np.argmax(similarities))
+        return slot, float(similarities[slot])
+
+    def add(self, vector: np.ndarray, entry: ResultCacheEntry) -> None:
+        """Add an entry, overwriting the oldest slot when full."""
+        if self.vectors is None:
+            self.vectors = np.zeros((self.capacity, vector.shape[0]), np.float32)
+
+        slot = self.next_slot
+        self.vectors[slot] = vector
+        if slot < len(self.entries):
+            self.entries[slot] = entry
+        else:
+            self.entries.append(entry)
+        self.next_slot = (slot + 1) % self.capacity
+
+    def evict(self, slot: int) -> None:
+        """Drop the entry in the given slot."""
+        self.entries[slot] = None
+
+
+class SemanticResultCache:
+    """Per-collection semantic cache of reranked search results."""
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_entries: int = 512,
+        ttl: int = 3600,
+    ):
+        """Semantic result cache constructor."""
+        self.similarity_threshold: float = similarity_threshold
+        self.max_entries: int = max_entries
+        self.ttl: int = ttl
+        self._stores: dict[str, ResultCacheStore] = {}
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    async def lookup(
+        self, namespace: str, query_embedding: list[float]
+    ) -> tuple[list[Document] | None, int | None]:
+        """Look up cached results for a query embedding.
+
+        Returns the cached documents (or None on a miss) and the current
+        invalidation epoch, which must be passed to `store` for a miss.
+        """
+        store = self._stores.get(namespace)
+        slot, similarity = (
+            store.best_match(self._normalize(query_embedding)) if store else (-1, 0.0)
+        )
+        entry = store.entries[slot] if store and slot >= 0 else None
+        if similarity < self.similarity_threshold:
+            entry = None
+
+        source_ids = sorted(entry.source_ids) if entry else []
+        try:
+            async with cache_redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(EPOCH_KEY)
+                for source_id in source_ids:
+                    pipe.get(SOURCE_KEY_TEMPLATE.format(source_id=source_id))
+                epoch, *source_epochs = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"[ResultCache] Redis lookup failed: {e}")
+            return None, None
+
+        current_epoch = int(epoch or 0)
+        if entry is None or store is None:
+            return None, current_epoch
+
+        if any(int(e) > entry.epoch for e in source_epochs if e is not None):
+            logger.debug(f"[ResultCache] Evicting stale entry in '{namespace}'")
+            store.evict(slot)
+            return None, current_epoch
+
+        logger.debug(f"[ResultCache] Hit in '{namespace}' ({similarity=:.4f})")
+        return [copy.copy(doc) for doc in entry.documents], current_epoch
+
+    def store(
+        self,
+        namespace: str,
+        query_embedding: list[float],
+        documents: list[Document],
+        epoch: int,
+    ) -> None:
+        """Store reranked results for a query embedding."""
+        if not documents:
+            return
+
+        store = self._stores.setdefault(
+            namespace, ResultCacheStore(capacity=self.max_entries)
+        )
+        store.add(
+            self._normalize(query_embedding),
+            ResultCacheEntry(
+                documents=[copy.copy(doc) for doc in documents],
+                source_ids=get_source_ids(documents),
+                epoch=epoch,
+                expires_at=monotonic() + self.ttl,
+            ),
+        )
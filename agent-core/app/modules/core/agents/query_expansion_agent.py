@@ -14,7 +14,7 @@ query_expansion_agent = Agent(
     name="Query expansion agent",
     description=QUERY_EXPANSION_AGENT_DESCRIPTION,
     instructions=QUERY_EXPANSION_AGENT_INSTRUCTIONS,
-    tools=[text_knowledge_base.vector_db.basic_search, publish_status],
+    tools=[text_knowledge_base.vector_db.search_many, publish_status],
     model=agent_llm,
     add_datetime_to_instructions=True,
     # debug_mode=True,  # Uncomment for testing
@@ -1,14 +1,27 @@
 """Knowledge Bases for Agents."""
 
-from agno.embedder.google import GeminiEmbedder
+from functools import cache
+from typing import Any
+
 from agno.knowledge.agent import AgentKnowledge
 
-from app.config import settings
+from app.config import IndexProfile, settings
+from app.modules.cache import cache_redis_client
+from app.modules.cache.embedding_cache import EmbeddingCache
+from app.modules.cache.result_cache import SemanticResultCache
+from app.modules.db.content_store import ChunkContentStore
+from app.modules.db.document_index import DOCUMENT_INDEX_SUFFIX
+from app.modules.db.knowledge_search import KnowledgeVectorDb
+from app.modules.db.local_store import LocalVectorStore
 from app.modules.db.mod_milvus import ModMilvus
+from app.modules.embedder.base import BatchEmbedder
+from app.modules.embedder.batcher import EmbeddingBatcher
+from app.modules.embedder.gemini import BatchGeminiEmbedder
 from app.utils.logger import logger
 
 EMBEDDING_MODEL: str = settings.EMBEDDING_MODEL
 VECTOR_DIMENSIONS: int = settings.VECTOR_DIMENSIONS
+VECTOR_DTYPE: str = settings.VECTOR_DTYPE
 TEXT_COLLECTION_NAME: str = settings.TEXT_COLLECTION_NAME
 VIDEO_COLLECTION_NAME: str = settings.VIDEO_COLLECTION_NAME
 VECTOR_DB_URI: str = settings.VECTOR_DB_URI
@@ -17,23 +30,161 @@ LLM_API_KEY: str = settings.LLM_API_KEY
 RERANK_DOCS_LIMIT: int = settings.RERANK_DOCS_LIMIT
 TEXT_KNOWLEDGE_N_DOCS: int = settings.TEXT_KNOWLEDGE_N_DOCS
 VIDEO_KNOWLEDGE_N_DOCS: int = settings.VIDEO_KNOWLEDGE_N_DOCS
+EMBEDDING_CACHE_ENABLED: bool = settings.EMBEDDING_CACHE_ENABLED
+RESULT_CACHE_ENABLED: bool = settings.RESULT_CACHE_ENABLED
+HYBRID_SEARCH_ENABLED: bool = settings.HYBRID_SEARCH_ENABLED
+VECTOR_STORE_BACKEND: str = settings.VECTOR_STORE_BACKEND
+LOCAL_VECTOR_STORE_PATH: str = settings.LOCAL_VECTOR_STORE_PATH
+CONTENT_STORE_ENABLED: bool = settings.CONTENT_STORE_ENABLED
+DOCUMENT_INDEX_ENABLED: bool = settings.DOCUMENT_INDEX_ENABLED
+QUERY_EMBEDDING_BATCH_ENABLED: bool = settings.QUERY_EMBEDDING_BATCH_ENABLED
 
-embedding_model = GeminiEmbedder(
+embedding_model = BatchGeminiEmbedder(
     api_key=LLM_API_KEY,
     id=EMBEDDING_MODEL,
     dimensions=VECTOR_DIMENSIONS,
 )
 
 
-# VectorDB / Knowledge Base Client for Text based Agent
-text_knowledge_base = AgentKnowledge(
-    num_documents=TEXT_KNOWLEDGE_N_DOCS,
-    vector_db=ModMilvus(
+@cache
+def get_embedder(backend: str) -> BatchEmbedder:
+    """Get the embedder of a backend, shared by the collections using it."""
+    if backend == "gemini":
+        return embedding_model
+
+    # onnxruntime and transformers are only imported when a collection uses them
+    from app.modules.embedder.onnx import OnnxEmbedder  # noqa: PLC0415
+
+    return OnnxEmbedder(
+        id=settings.ONNX_EMBEDDING_MODEL,
+        onnx_path=settings.ONNX_EMBEDDING_PATH,
+        dimensions=settings.ONNX_EMBEDDING_DIMENSIONS,
+        pooling=settings.ONNX_EMBEDDING_POOLING,
+        max_tokens=settings.ONNX_EMBEDDING_MAX_TOKENS,
+        batch_size=settings.ONNX_EMBEDDING_BATCH_SIZE,
+        query_prefix=settings.ONNX_EMBEDDING_QUERY_PREFIX,
+    )
+
+
+@cache
+def get_query_embedding_cache(backend: str) -> EmbeddingCache | None:
+    """Get the query embedding cache shared by the collections of an embedder."""
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+
+    embedder = get_embedder(backend)
+    return EmbeddingCache(
+        model=embedder.id,
+        dimensions=embedder.dimensions,
+        redis_client=cache_redis_client,
+        max_items=settings.EMBEDDING_CACHE_MAX_ITEMS,
+        redis_max_items=settings.EMBEDDING_CACHE_REDIS_MAX_ITEMS,
+        ttl=settings.EMBEDDING_CACHE_TTL,
+        dtype=settings.EMBEDDING_CACHE_DTYPE,
+    )
+
+
+@cache
+def get_query_embedding_batcher(backend: str) -> EmbeddingBatcher | None:
+    """Get the query embedding batcher shared by the collections of an embedder.
+
+    Text and video searches of concurrent chats are embedded in one request.
+    """
+    if not QUERY_EMBEDDING_BATCH_ENABLED:
+        return None
+
+    return EmbeddingBatcher(
+        get_embedder(backend).async_embed_queries,
+        max_batch_size=settings.QUERY_EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms=settings.QUERY_EMBEDDING_BATCH_WAIT_MS,
+    )
+
+
+# Semantic cache of reranked results, keyed per collection
+retrieval_result_cache: SemanticResultCache | None = (
+    SemanticResultCache(
+        similarity_threshold=settings.RESULT_CACHE_SIMILARITY_THRESHOLD,
+        max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+        ttl=settings.RESULT_CACHE_TTL,
+    )
+    if RESULT_CACHE_ENABLED
+    else None
+)
+
+
+def build_vector_db(
+    collection: str,
+    index_profile: IndexProfile,
+    embedding_backend: str = "gemini",
+    document_level: bool = False,
+) -> KnowledgeVectorDb:
+    """Build a knowledge base collection on the configured vector store backend.
+
+    Collections embed queries and chunks with their own embedding backend.
+    With the document index enabled, chunk collections get a companion
+    collection of document summary vectors, which is searched without caches
+    and stores its records whole.
+    """
+    embedder: BatchEmbedder = get_embedder(embedding_backend)
+    # Chunk text is kept out of the vector records and hydrated after search
+    content_store: ChunkContentStore | None = (
+        ChunkContentStore(collection, max_items=settings.CONTENT_STORE_HOT_ITEMS)
+        if CONTENT_STORE_ENABLED and not document_level
+        else None
+    )
+    document_index: KnowledgeVectorDb | None = (
+        build_vector_db(
+            f"{collection}{DOCUMENT_INDEX_SUFFIX}",
+            index_profile,
+            embedding_backend,
+            document_level=True,
+        )
+        if DOCUMENT_INDEX_ENABLED and not document_level
+        else None
+    )
+    caches: dict[str, Any] = (
+        {}
+        if document_level
+        else {
+            "embedding_cache": get_query_embedding_cache(embedding_backend),
+            "embedding_batcher": get_query_embedding_batcher(embedding_backend),
+            "result_cache": retrieval_result_cache,
+        }
+    )
+
+    if VECTOR_STORE_BACKEND == "local":
+        return LocalVectorStore(
+            collection=collection,
+            path=LOCAL_VECTOR_STORE_PATH,
+            embedder=embedder,
+            content_store=content_store,
+            document_index=document_index,
+            rerank_docs=RERANK_DOCS_LIMIT,
+            **caches,
+        )
+
+    return ModMilvus(
         uri=VECTOR_DB_URI,
         token=VECTOR_DB_TOKEN,
-        collection=TEXT_COLLECTION_NAME,
-        embedder=embedding_model,
+        collection=collection,
+        index_profile=index_profile,
+        embedder=embedder,
+        content_store=content_store,
+        document_index=document_index,
         rerank_docs=RERANK_DOCS_LIMIT,
+        enable_hybrid_search=HYBRID_SEARCH_ENABLED and not document_level,
+        vector_dtype=VECTOR_DTYPE,
+        **caches,
+    )
+
+
+# VectorDB / Knowledge Base Client for Text based Agent
+text_knowledge_base = AgentKnowledge(
+    num_documents=TEXT_KNOWLEDGE_N_DOCS,
+    vector_db=build_vector_db(
+        TEXT_COLLECTION_NAME,
+        settings.TEXT_INDEX_PROFILE,
+        settings.TEXT_EMBEDDING_BACKEND,
     ),
 )
 
@@ -44,12 +195,10 @@ logger.debug(
 
 video_knowledge_base = AgentKnowledge(
     num_documents=VIDEO_KNOWLEDGE_N_DOCS,
-    vector_db=ModMilvus(
-        uri=VECTOR_DB_URI,
-        token=VECTOR_DB_TOKEN,
-        collection=VIDEO_COLLECTION_NAME,
-        embedder=embedding_model,
-        rerank_docs=RERANK_DOCS_LIMIT,
+    vector_db=build_vector_db(
+        VIDEO_COLLECTION_NAME,
+        settings.VIDEO_INDEX_PROFILE,
+        settings.VIDEO_EMBEDDING_BACKEND,
     ),
 )
 
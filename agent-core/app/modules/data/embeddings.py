@@ -1,26 +1,190 @@
-"""Embedding Module."""
+"""Embedding Module.
+
+Texts are embedded in batches bounded by the provider's item and token limits.
+Batches run concurrently on a bounded pool, failed batches are retried with
+exponential backoff, and texts left without an embedding raise an
+`EmbeddingError` instead of being dropped. Embeddings are cached by content
+hash, so re-training only embeds new chunk text.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cache
+from http import HTTPStatus
+from time import time
 
 from app.config import settings
+from app.modules.cache import cache_redis_sync_client
+from app.modules.cache.chunk_embedding_cache import ChunkEmbeddingCache
 from app.modules.core.knowledge_bases import embedding_model
+from app.modules.embedder.base import BatchEmbedder
 from app.utils.logger import logger
+from app.utils.retry import retry_on_exception
+
+EMBEDDING_BATCH_MAX_ITEMS: int = settings.EMBEDDING_BATCH_MAX_ITEMS
+EMBEDDING_BATCH_MAX_TOKENS: int = settings.EMBEDDING_BATCH_MAX_TOKENS
+EMBEDDING_CONCURRENCY: int = settings.EMBEDDING_CONCURRENCY
+EMBEDDING_MAX_RETRIES: int = settings.EMBEDDING_MAX_RETRIES
+EMBEDDING_RETRY_DELAY: float = settings.EMBEDDING_RETRY_DELAY
+TRAINING_EMBEDDING_CACHE_ENABLED: bool = settings.TRAINING_EMBEDDING_CACHE_ENABLED
+
+CHARS_PER_TOKEN: int = 4  # Conservative estimate, no tokenizer is exposed
+
+# Requests in flight are bounded by the pool, shared by all ingestions
+embedding_executor = ThreadPoolExecutor(
+    max_workers=EMBEDDING_CONCURRENCY, thread_name_prefix="embedding"
+)
+
+
+@cache
+def get_chunk_embedding_cache(
+    model: str, dimensions: int
+) -> ChunkEmbeddingCache | None:
+    """Get the chunk embedding cache of an embedding model."""
+    if not TRAINING_EMBEDDING_CACHE_ENABLED:
+        return None
+
+    return ChunkEmbeddingCache(
+        model=model,
+        dimensions=dimensions,
+        redis_client=cache_redis_sync_client,
+        max_items=settings.TRAINING_EMBEDDING_CACHE_MAX_ITEMS,
+        ttl=settings.TRAINING_EMBEDDING_CACHE_TTL,
+    )
+
+
+class EmbeddingError(Exception):
+    """Texts could not be embedded after retries."""
+
+    def __init__(self, failed: list[int], total: int, reason: str):
+        """EmbeddingError Constructor."""
+        super().__init__(f"Failed to embed {len(failed)} of {total} texts: {reason}")
+        self.failed: list[int] = failed
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def plan_batches(
+    texts: list[str],
+    max_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+    max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+) -> list[list[int]]:
+    """Group text indexes into batches within the item and token limits."""
+    batches: list[list[int]] = []
+    batch: list[int] = []
+    batch_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def is_retryable(error: Exception) -> bool:
+    """Retry rate limits, server errors and malformed responses."""
+    code: int | None = getattr(error, "code", None)
+    return (
+        not isinstance(code, int)
+        or code == HTTPStatus.TOO_MANY_REQUESTS
+        or code >= HTTPStatus.INTERNAL_SERVER_ERROR
+    )
+
+
+@retry_on_exception(
+    max_retries=EMBEDDING_MAX_RETRIES,
+    delay_seconds=EMBEDDING_RETRY_DELAY,
+    retry_condition=is_retryable,
+    backoff=2.0,
+)
+def embed_batch(embedder: BatchEmbedder, texts: list[str]) -> list[list[float]]:
+    """Embed one batch of texts with a single request."""
+    embeddings = embedder.embed_documents(texts)
+    if len(embeddings) != len(texts) or not all(embeddings):
+        raise ValueError(f"Got {len(embeddings)} embeddings for {len(texts)} texts")
+    return embeddings
+
+
+def embed_texts(
+    embedder: BatchEmbedder,
+    texts: list[str],
+    embedding_cache: ChunkEmbeddingCache | None = None,
+) -> tuple[dict[str, list[float]], str]:
+    """Embed texts in concurrent batches.
+
+    Each batch is cached as soon as it succeeds. Returns the embeddings of
+    the texts from successful batches, and the error of the first failed
+    batch.
+    """
+    futures = {
+        embedding_executor.submit(embed_batch, embedder, batch_texts): batch_texts
+        for batch_texts in ([texts[i] for i in batch] for batch in plan_batches(texts))
+    }
+
+    embeddings: dict[str, list[float]] = {}
+    reason = ""
+    for future in as_completed(futures):
+        batch_texts = futures[future]
+        try:
+            vectors = future.result()
+        except Exception as e:
+            logger.error(f"Error embedding a batch of {len(batch_texts)} texts: {e}")
+            reason = reason or str(e)
+            continue
+
+        embeddings.update(zip(batch_texts, vectors, strict=True))
+        if embedding_cache is not None:
+            embedding_cache.set_many(batch_texts, vectors)
+    return embeddings, reason
+
+
+def generate_embedding(
+    texts: str | list[str], embedder: BatchEmbedder = embedding_model
+) -> list[list[float]]:
+    """Get the embedding vectors of texts with an embedder, in order.
 
-EMBEDDING_MODEL = settings.EMBEDDING_MODEL
+    Identical texts are embedded once, and cached texts are not embedded.
+    Raises `EmbeddingError` with the indexes of the texts that could not be
+    embedded, after the other batches completed.
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    if not texts:
+        return []
 
+    start_time = time()
+    chunk_embedding_cache = get_chunk_embedding_cache(embedder.id, embedder.dimensions)
+    unique_texts = list(dict.fromkeys(texts))
+    cached = (
+        chunk_embedding_cache.get_many(unique_texts)
+        if chunk_embedding_cache is not None
+        else [None] * len(unique_texts)
+    )
+    embeddings: dict[str, list[float]] = {
+        text: vector
+        for text, vector in zip(unique_texts, cached, strict=True)
+        if vector is not None
+    }
 
-def generate_embedding(texts: str | list[str]) -> list[list[float]]:
-    """Get embedding vector from OpenAI."""
-    try:
-        # NOTE: Workaround to get the embedding vector from Gemini for list of strings.
-        if isinstance(texts, str):
-            texts = [texts]
+    missing = [text for text in unique_texts if text not in embeddings]
+    computed, reason = (
+        embed_texts(embedder, missing, chunk_embedding_cache) if missing else ({}, "")
+    )
+    embeddings.update(computed)
 
-        embs = embedding_model.client.models.embed_content(
-            contents=texts,
-            model=EMBEDDING_MODEL,
-            config={"output_dimensionality": embedding_model.dimensions},
-        ).embeddings
-        return [emb.values for emb in embs]
+    failed = [i for i, text in enumerate(texts) if text not in embeddings]
+    if failed:
+        raise EmbeddingError(failed, len(texts), reason)
 
-    except Exception as e:
-        logger.error(f"Error getting embedding: {e}")
-        return [[0.0] * embedding_model.dimensions]
+    logger.debug(
+        f"Embedded {len(texts)} texts, {len(computed)} new and "
+        f"{len(unique_texts) - len(missing)} cached, in {time() - start_time:.2f}s"
+    )
+    return [embeddings[text] for text in texts]
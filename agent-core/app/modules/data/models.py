@@ -12,3 +12,4 @@ class DocMetadata:
     source: str
     source_id: str
     source_url: str
+    chunk_hash: str = ""
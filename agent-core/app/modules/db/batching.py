@@ -0,0 +1,46 @@
+"""Payload-size based batching of vector database inserts."""
+
+from collections.abc import Iterator
+from typing import Any
+
+from app.utils.json_utils import json_dumps
+
+FLOAT32_BYTES: int = 4
+SCALAR_BYTES: int = 8
+
+
+def estimate_entity_bytes(entity: dict[str, Any]) -> int:
+    """Estimate the serialized size of an entity in an insert request."""
+    size = 0
+    for key, value in entity.items():
+        size += len(key)
+        if isinstance(value, str):
+            size += len(value.encode("utf-8"))
+        elif isinstance(value, list) and value and isinstance(value[0], float):
+            size += len(value) * FLOAT32_BYTES
+        elif isinstance(value, dict | list):
+            size += len(json_dumps(value).encode("utf-8"))
+        else:
+            size += SCALAR_BYTES
+    return size
+
+
+def split_by_bytes(
+    entities: list[dict[str, Any]], max_bytes: int
+) -> Iterator[list[dict[str, Any]]]:
+    """Split entities into batches whose estimated payload stays under `max_bytes`.
+
+    An entity larger than `max_bytes` is sent in a batch of its own.
+    """
+    batch: list[dict[str, Any]] = []
+    batch_bytes = 0
+    for entity in entities:
+        entity_bytes = estimate_entity_bytes(entity)
+        if batch and batch_bytes + entity_bytes > max_bytes:
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(entity)
+        batch_bytes += entity_bytes
+
+    if batch:
+        yield batch
@@ -0,0 +1,99 @@
+"""Chunk diff of a re-trained source against its stored chunks.
+
+Chunks carry a hash of their content and metadata, so re-training a source
+only embeds and inserts the chunks whose hash is not stored yet, and only
+deletes the stored chunks whose hash is gone. Unchanged chunks keep their
+records and chunk indexes, new chunks are numbered after the stored ones.
+"""
+
+import hashlib
+from collections import defaultdict
+from typing import Any
+
+from app.modules.data.models import DocMetadata
+from app.modules.db.document_index import DocumentKey, get_document_key
+from app.modules.db.schema import CHUNK_INDEX_FIELD, METADATA_FIELD
+from app.utils.json_utils import json_dumps
+
+CHUNK_HASH_KEY: str = "chunk_hash"
+
+
+def hash_chunk(text: str, metadata: DocMetadata) -> str:
+    """Hash the stored fields of a chunk, except its chunk index."""
+    payload = json_dumps([text, metadata.headers, metadata.source, metadata.source_url])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ChunkDiff:
+    """Match the chunks of a training run with the stored chunks of its source.
+
+    Chunks trained before chunk hashes were stored have none, they are all
+    replaced by the first re-training.
+    """
+
+    def __init__(self, stored_chunks: list[dict[str, Any]]):
+        """Chunk diff constructor, from the stored chunk metadata and indexes."""
+        self._stored: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
+        for chunk in sorted(stored_chunks, key=lambda c: c[CHUNK_INDEX_FIELD]):
+            chunk_hash = (chunk.get(METADATA_FIELD) or {}).get(CHUNK_HASH_KEY) or ""
+            self._stored[chunk_hash].append(chunk)
+        self._stored.pop("", None)
+
+        self.next_chunk_index: int = (
+            max((c[CHUNK_INDEX_FIELD] for c in stored_chunks), default=-1) + 1
+        )
+        self.added: int = 0
+        self.kept: list[dict[str, Any]] = []
+        self.vanished: list[dict[str, Any]] = [
+            chunk
+            for chunk in stored_chunks
+            if not (chunk.get(METADATA_FIELD) or {}).get(CHUNK_HASH_KEY)
+        ]
+        self.changed_documents: set[DocumentKey] = set()
+
+    def select_changed(
+        self, text_chunks: list[str], chunk_metadata: list[DocMetadata]
+    ) -> tuple[list[str], list[DocMetadata]]:
+        """Keep the chunks that are not stored, numbered after the stored ones."""
+        changed_chunks: list[str] = []
+        changed_metadata: list[DocMetadata] = []
+        for text, metadata in zip(text_chunks, chunk_metadata, strict=True):
+            stored = self._stored.get(metadata.chunk_hash)
+            if stored:
+                self.kept.append(stored.pop(0))
+                continue
+
+            metadata.chunk_index = self.next_chunk_index
+            self.next_chunk_index += 1
+            self.added += 1
+            self.changed_documents.add((metadata.source_id, metadata.source_url))
+            changed_chunks.append(text)
+            changed_metadata.append(metadata)
+        return changed_chunks, changed_metadata
+
+    def keep_documents(self, documents: set[DocumentKey]) -> None:
+        """Keep the stored chunks of documents that could not be trained."""
+        for chunk_hash, chunks in list(self._stored.items()):
+            self.kept.extend(c for c in chunks if get_document_key(c) in documents)
+            self._stored[chunk_hash] = [
+                c for c in chunks if get_document_key(c) not in documents
+            ]
+        self.kept.extend(c for c in self.vanished if get_document_key(c) in documents)
+        self.vanished = [
+            c for c in self.vanished if get_document_key(c) not in documents
+        ]
+
+    def finish(self) -> None:
+        """Mark the stored chunks that were not matched as vanished."""
+        for chunks in self._stored.values():
+            self.vanished.extend(chunks)
+        self._stored.clear()
+        self.changed_documents.update(get_document_key(c) for c in self.vanished)
+
+    def get_kept_indexes(self, documents: set[DocumentKey]) -> list[int]:
+        """Get the chunk indexes of the unchanged chunks of documents."""
+        return [
+            chunk[CHUNK_INDEX_FIELD]
+            for chunk in self.kept
+            if get_document_key(chunk) in documents
+        ]
@@ -0,0 +1,56 @@
+"""Copying chunks between collections of different vector fields."""
+
+from typing import Any
+
+from app.modules.data.embeddings import generate_embedding
+from app.modules.db.content_store import ChunkRef
+from app.modules.db.mod_milvus import ModMilvus
+from app.modules.db.schema import (
+    CHUNK_INDEX_FIELD,
+    CONTENT_FIELD,
+    SOURCE_ID_FIELD,
+    VECTOR_FIELD,
+)
+from app.modules.db.vectors import VectorDtype, decode_vector, fit_vectors
+
+
+def get_contents(vector_db: ModMilvus, rows: list[dict[str, Any]]) -> list[str]:
+    """Get the chunk content of rows, from the content store for thin records."""
+    contents = [row.get(CONTENT_FIELD) or "" for row in rows]
+    thin = [i for i, content in enumerate(contents) if not content]
+    if thin and vector_db.content_store is not None:
+        refs = [
+            ChunkRef(
+                rows[i]["id"],
+                rows[i].get(SOURCE_ID_FIELD) or "",
+                rows[i].get(CHUNK_INDEX_FIELD) or 0,
+            )
+            for i in thin
+        ]
+        for i, chunk in zip(
+            thin, vector_db.content_store.get_many_sync(refs), strict=True
+        ):
+            contents[i] = (chunk or {}).get(CONTENT_FIELD, "")
+    return contents
+
+
+def convert_vectors(
+    vector_db: ModMilvus,
+    rows: list[dict[str, Any]],
+    dimensions: int,
+    vector_dtype: VectorDtype,
+    reembed: bool = False,
+) -> list:
+    """Convert the vectors of rows to a vector field of another shape.
+
+    Stored vectors are truncated and re-normalized, or with `reembed` the
+    chunk content is embedded again with the configured embedding model.
+    """
+    if not reembed:
+        vectors = [decode_vector(row[VECTOR_FIELD]) for row in rows]
+        return fit_vectors(vectors, dimensions, vector_dtype)
+
+    contents = get_contents(vector_db, rows)
+    return fit_vectors(
+        generate_embedding(contents, vector_db.embedder), dimensions, vector_dtype
+    )
@@ -0,0 +1,170 @@
+"""Milvus segment health and compaction.
+
+Re-training deletes and re-inserts whole sources, which leaves deleted rows in
+sealed segments and many small segments. Deletes are counted per collection in
+Redis, and a periodic task compacts collections whose delete volume, deleted
+ratio or small segments pass their thresholds.
+"""
+
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from pymilvus import MilvusClient
+
+from app.config import settings
+from app.modules.cache import cache_redis_client, cache_redis_sync_client
+from app.utils.logger import logger
+
+COMPACTION_DELETE_THRESHOLD: int = settings.COMPACTION_DELETE_THRESHOLD
+COMPACTION_DELETED_RATIO: float = settings.COMPACTION_DELETED_RATIO
+COMPACTION_SMALL_SEGMENT_ROWS: int = settings.COMPACTION_SMALL_SEGMENT_ROWS
+COMPACTION_SMALL_SEGMENTS: int = settings.COMPACTION_SMALL_SEGMENTS
+COMPACTION_TIMEOUT: int = settings.COMPACTION_TIMEOUT
+
+DELETES_PREFIX: str = "compaction:deletes"
+COMPACTION_POLL_INTERVAL: float = 5.0  # Seconds between compaction state checks
+
+# Persistent segment states and levels (common.proto)
+GROWING_STATE: int = 2
+DROPPED_STATE: int = 6
+L0_LEVEL: int = 1
+
+
+@dataclass
+class SegmentStats:
+    """Segment health of a collection."""
+
+    collection: str
+    segments: int = 0
+    growing_segments: int = 0
+    small_segments: int = 0  # Small sealed segments sharing a partition
+    delete_segments: int = 0  # L0 segments holding deletes not yet applied
+    stored_rows: int = 0  # Rows in segments, including deleted rows
+    pending_deletes: int = 0  # Rows deleted since the last compaction
+
+    @property
+    def deleted_ratio(self) -> float:
+        """Share of the stored rows that are deleted."""
+        return min(self.pending_deletes / max(self.stored_rows, 1), 1.0)
+
+    def compaction_reasons(self) -> list[str]:
+        """Thresholds passed by the collection, empty when healthy."""
+        reasons: list[str] = []
+        if self.pending_deletes >= COMPACTION_DELETE_THRESHOLD:
+            reasons.append(f"{self.pending_deletes} deletes")
+        if self.pending_deletes and self.deleted_ratio >= COMPACTION_DELETED_RATIO:
+            reasons.append(f"{self.deleted_ratio:.1%} deleted")
+        if self.small_segments >= COMPACTION_SMALL_SEGMENTS:
+            reasons.append(f"{self.small_segments} small segments")
+        return reasons
+
+    def __str__(self) -> str:
+        """Format the stats for logs."""
+        return (
+            f"segments={self.segments} growing={self.growing_segments} "
+            f"small={self.small_segments} l0={self.delete_segments} "
+            f"rows={self.stored_rows} deletes={self.pending_deletes} "
+            f"deleted_ratio={self.deleted_ratio:.2%}"
+        )
+
+
+def make_deletes_key(collection: str) -> str:
+    """Build the Redis key of a collection's delete counter."""
+    return f"{DELETES_PREFIX}:{collection}"
+
+
+def record_deletes(collection: str, count: int) -> None:
+    """Count deleted rows towards the next compaction of a collection."""
+    if count <= 0:
+        return
+    try:
+        cache_redis_sync_client.incrby(make_deletes_key(collection), count)
+    except Exception as e:
+        logger.warning(f"[{collection}] Unable to record {count} deletes: {e}")
+
+
+async def async_record_deletes(collection: str, count: int) -> None:
+    """Count deleted rows towards the next compaction without blocking."""
+    if count <= 0:
+        return
+    try:
+        await cache_redis_client.incrby(make_deletes_key(collection), count)
+    except Exception as e:
+        logger.warning(f"[{collection}] Unable to record {count} deletes: {e}")
+
+
+def resolve_collection(client: MilvusClient, name: str) -> str:
+    """Get the collection behind an alias, or the name itself."""
+    try:
+        return client.describe_alias(name)["collection_name"]
+    except Exception:
+        return name
+
+
+def get_segment_stats(client: MilvusClient, collection: str) -> SegmentStats:
+    """Read the persistent segments and pending deletes of a collection."""
+    stats = SegmentStats(collection=collection)
+    small_by_partition: Counter[int] = Counter()
+    # MilvusClient does not expose segment infos, read them from its connection
+    infos = client._get_connection().get_persistent_segment_infos(
+        resolve_collection(client, collection)
+    )
+    for info in infos:
+        if info.state == DROPPED_STATE:
+            continue
+        if info.level == L0_LEVEL:
+            stats.delete_segments += 1
+            continue
+
+        stats.segments += 1
+        stats.stored_rows += info.num_rows
+        if info.state == GROWING_STATE:
+            stats.growing_segments += 1
+        elif info.num_rows < COMPACTION_SMALL_SEGMENT_ROWS:
+            small_by_partition[info.partitionID] += 1
+
+    # Segments are not merged across partitions, one small segment each is kept
+    stats.small_segments = sum(count - 1 for count in small_by_partition.values())
+    stats.pending_deletes = int(
+        cache_redis_sync_client.get(make_deletes_key(collection)) or 0
+    )
+    return stats
+
+
+def compact_collection(
+    client: MilvusClient, collection: str, force: bool = False
+) -> SegmentStats:
+    """Compact a collection when it passes a threshold, returning its stats."""
+    stats = get_segment_stats(client, collection)
+    logger.info(f"[{collection}] Segment stats: {stats}")
+
+    reasons = stats.compaction_reasons()
+    if not reasons and not force:
+        return stats
+
+    logger.info(f"[{collection}] Compacting: {', '.join(reasons) or 'forced'}")
+    start_time = time.perf_counter()
+    target = resolve_collection(client, collection)
+
+    # Seal growing segments, so their rows and deletes are compacted too
+    client.flush(target)
+    job_id = client.compact(target)
+    while (state := client.get_compaction_state(job_id)) != "Completed":
+        if time.perf_counter() - start_time > COMPACTION_TIMEOUT:
+            logger.warning(
+                f"[{collection}] Compaction job {job_id} still {state} "
+                f"after {COMPACTION_TIMEOUT}s"
+            )
+            return stats
+        time.sleep(COMPACTION_POLL_INTERVAL)
+
+    # Deletes recorded while compacting count towards the next compaction
+    cache_redis_sync_client.decrby(make_deletes_key(collection), stats.pending_deletes)
+
+    compacted = get_segment_stats(client, collection)
+    logger.info(
+        f"[{collection}] Compaction job {job_id} completed in "
+        f"{time.perf_counter() - start_time:.1f}s: {compacted}"
+    )
+    return compacted
@@ -0,0 +1,174 @@
+"""Compressed chunk content store, kept outside the vector database.
+
+Vector records only carry what search and filtering need. The chunk text and
+metadata live here, compressed, and are hydrated after the search for the
+hits that are reranked or returned.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, NamedTuple
+
+import zstandard
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+
+from app.config import settings
+from app.modules.db.schema import (
+    CHUNK_INDEX_FIELD,
+    CONTENT_FIELD,
+    METADATA_FIELD,
+    SOURCE_ID_FIELD,
+)
+from app.utils.json_utils import json_dumps, json_loads
+from app.utils.logger import logger
+
+REDIS_HOST: str = settings.REDIS_HOST
+REDIS_PORT: int = settings.REDIS_PORT
+CONTENT_STORE_REDIS_DB: int = settings.CONTENT_STORE_REDIS_DB
+CONTENT_STORE_COMPRESSION_LEVEL: int = settings.CONTENT_STORE_COMPRESSION_LEVEL
+
+
+class ChunkRef(NamedTuple):
+    """Reference of a stored chunk from a vector search hit."""
+
+    id: int
+    source_id: str
+    chunk_index: int
+
+
+# Not a cache: chunk content is only stored here, in a non-evicting database
+content_redis_client = Redis(
+    host=REDIS_HOST, port=REDIS_PORT, db=CONTENT_STORE_REDIS_DB
+)
+content_redis_sync_client = SyncRedis(
+    host=REDIS_HOST, port=REDIS_PORT, db=CONTENT_STORE_REDIS_DB
+)
+
+
+def compress(payload: bytes, level: int = CONTENT_STORE_COMPRESSION_LEVEL) -> bytes:
+    """Compress a payload with zstd."""
+    return zstandard.compress(payload, level)
+
+
+def decompress(payload: bytes) -> bytes:
+    """Decompress a payload written by `compress`."""
+    return zstandard.decompress(payload)
+
+
+class ChunkContentStore:
+    """Chunk content and metadata with an in-process hot LRU.
+
+    Chunks are stored per source in a Redis hash keyed by chunk index
+    (`{prefix}:{collection}:{source_id}`), so removing a source's chunks is a
+    single delete. The LRU is keyed by vector record id, which changes when a
+    source is re-trained, so other processes never serve replaced content.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        redis_client: Redis = content_redis_client,
+        redis_sync_client: SyncRedis = content_redis_sync_client,
+        max_items: int = 10_000,
+        prefix: str = "chunk_content",
+    ):
+        """Chunk content store constructor."""
+        self.collection: str = collection
+        self.redis_client: Redis = redis_client
+        self.redis_sync_client: SyncRedis = redis_sync_client
+        self.max_items: int = max_items
+        self.prefix: str = f"{prefix}:{collection}"
+
+        self._local: OrderedDict[int, dict[str, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def make_key(self, source_id: str) -> str:
+        """Build the Redis hash key of a source."""
+        return f"{self.prefix}:{source_id}"
+
+    @staticmethod
+    def encode(chunk: dict[str, Any]) -> bytes:
+        """Serialize and compress a chunk."""
+        return compress(json_dumps(chunk).encode("utf-8"))
+
+    @staticmethod
+    def decode(payload: bytes) -> dict[str, Any]:
+        """Decompress and deserialize a chunk."""
+        return json_loads(decompress(payload))
+
+    def _get_local(self, key: int) -> dict[str, Any] | None:
+        with self._lock:
+            chunk = self._local.get(key)
+            if chunk is not None:
+                self._local.move_to_end(key)
+            return chunk
+
+    def _set_local(self, key: int, chunk: dict[str, Any]) -> None:
+        with self._lock:
+            self._local[key] = chunk
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_items:
+                self._local.popitem(last=False)
+
+    def put_many(self, chunks: list[dict[str, Any]]) -> None:
+        """Store the content and metadata of chunks by source and chunk index."""
+        mappings: dict[str, dict[int, bytes]] = {}
+        for chunk in chunks:
+            mappings.setdefault(self.make_key(chunk[SOURCE_ID_FIELD]), {})[
+                chunk[CHUNK_INDEX_FIELD]
+            ] = self.encode(
+                {
+                    CONTENT_FIELD: chunk[CONTENT_FIELD],
+                    METADATA_FIELD: chunk.get(METADATA_FIELD) or {},
+                }
+            )
+
+        with self.redis_sync_client.pipeline(transaction=False) as pipe:
+            for key, mapping in mappings.items():
+                pipe.hset(key, mapping=mapping)
+            pipe.execute()
+
+    async def get_many(self, refs: list[ChunkRef]) -> list[dict[str, Any] | None]:
+        """Get the referenced chunks, None for chunks missing from the store."""
+        chunks: list[dict[str, Any] | None] = [self._get_local(ref.id) for ref in refs]
+        missing: list[int] = [i for i, chunk in enumerate(chunks) if chunk is None]
+        if not missing:
+            return chunks
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for i in missing:
+                    pipe.hget(
+                        self.make_key(refs[i].source_id), str(refs[i].chunk_index)
+                    )
+                payloads = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"[ChunkContentStore] Redis lookup failed: {e}")
+            return chunks
+
+        for i, payload in zip(missing, payloads, strict=True):
+            if payload is not None:
+                chunks[i] = self.decode(payload)
+                self._set_local(refs[i].id, chunks[i])
+
+        return chunks
+
+    def get_many_sync(self, refs: list[ChunkRef]) -> list[dict[str, Any] | None]:
+        """Get the referenced chunks from Redis, for maintenance scripts."""
+        with self.redis_sync_client.pipeline(transaction=False) as pipe:
+            for ref in refs:
+                pipe.hget(self.make_key(ref.source_id), str(ref.chunk_index))
+            payloads = pipe.execute()
+        return [self.decode(payload) if payload else None for payload in payloads]
+
+    def delete_chunks(self, source_id: str, chunk_indexes: list[int]) -> None:
+        """Delete chunks of a source by chunk index."""
+        if chunk_indexes:
+            self.redis_sync_client.hdel(
+                self.make_key(source_id), *map(str, chunk_indexes)
+            )
+
+    async def async_delete_source(self, source_id: str) -> None:
+        """Delete all chunks of a source without blocking."""
+        await self.redis_client.delete(self.make_key(source_id))
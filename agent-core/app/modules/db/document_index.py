@@ -0,0 +1,148 @@
+"""Document summary vectors for two-level retrieval.
+
+A document is a trained source, or one page of a sitemap source. The document
+index holds one record per document, whose vector is the normalized mean of
+its chunk vectors and whose metadata lists its chunk indexes. Searches select
+the top documents first, then search the chunks of those documents only.
+"""
+
+from collections import Counter
+from typing import Any
+
+import numpy as np
+
+from app.config import settings
+from app.modules.db.schema import (
+    ACCOUNT_ID_FIELD,
+    CHUNK_INDEX_FIELD,
+    CONTENT_FIELD,
+    METADATA_FIELD,
+    SOURCE_ID_FIELD,
+    VECTOR_FIELD,
+)
+
+DOCUMENT_INDEX_SUFFIX: str = settings.DOCUMENT_INDEX_SUFFIX
+DOCUMENT_MAX_CHUNKS: int = settings.DOCUMENT_MAX_CHUNKS
+
+SOURCE_URL_KEY: str = "source_url"
+CHUNK_INDEXES_KEY: str = "chunk_indexes"
+
+DocumentKey = tuple[str, str]  # Source id and page URL
+
+
+def get_document_key(chunk: dict[str, Any]) -> DocumentKey:
+    """Get the document of a chunk record."""
+    metadata: dict[str, Any] = chunk.get(METADATA_FIELD) or {}
+    return (
+        chunk.get(SOURCE_ID_FIELD) or metadata.get(SOURCE_ID_FIELD) or "",
+        metadata.get(SOURCE_URL_KEY) or "",
+    )
+
+
+class DocumentSummaryBuilder:
+    """Accumulate the chunks of a training run into document summary records.
+
+    Chunks are added batch by batch as they are embedded, only the running
+    sum of each document's vectors is kept.
+    """
+
+    def __init__(self):
+        """Document summary builder constructor."""
+        self._sums: dict[DocumentKey, np.ndarray] = {}
+        self._records: dict[DocumentKey, dict[str, Any]] = {}
+
+    def add(self, chunks: list[dict[str, Any]]) -> None:
+        """Add embedded chunk records to their documents."""
+        for chunk in chunks:
+            key = get_document_key(chunk)
+            vector = np.asarray(chunk[VECTOR_FIELD], dtype=np.float64)
+            if key in self._sums:
+                self._sums[key] += vector
+            else:
+                metadata: dict[str, Any] = chunk.get(METADATA_FIELD) or {}
+                self._sums[key] = vector
+                self._records[key] = {
+                    CONTENT_FIELD: " ".join(
+                        filter(None, [metadata.get("source"), key[1]])
+                    ),
+                    METADATA_FIELD: {
+                        "source": metadata.get("source"),
+                        SOURCE_ID_FIELD: key[0],
+                        SOURCE_URL_KEY: key[1],
+                        CHUNK_INDEXES_KEY: [],
+                    },
+                    ACCOUNT_ID_FIELD: chunk.get(ACCOUNT_ID_FIELD),
+                    SOURCE_ID_FIELD: key[0],
+                }
+            self._records[key][METADATA_FIELD][CHUNK_INDEXES_KEY].append(
+                chunk[CHUNK_INDEX_FIELD]
+            )
+
+    def build(self) -> list[dict[str, Any]]:
+        """Build one record per document, keyed by its first chunk index."""
+        records: list[dict[str, Any]] = []
+        for key, total in self._sums.items():
+            record = self._records[key]
+            chunk_indexes: list[int] = sorted(record[METADATA_FIELD][CHUNK_INDEXES_KEY])
+            record[METADATA_FIELD][CHUNK_INDEXES_KEY] = chunk_indexes
+            record[CHUNK_INDEX_FIELD] = chunk_indexes[0]
+            record[VECTOR_FIELD] = (total / max(np.linalg.norm(total), 1e-12)).tolist()
+            records.append(record)
+        return records
+
+
+def get_chunk_ref(entity: dict[str, Any]) -> tuple[str | None, int | None]:
+    """Get the source id and chunk index of a chunk search hit entity.
+
+    Scalar fields are returned with a content store, metadata otherwise.
+    """
+    metadata: dict[str, Any] = entity.get(METADATA_FIELD) or {}
+    return (
+        entity.get(SOURCE_ID_FIELD, metadata.get(SOURCE_ID_FIELD)),
+        entity.get(CHUNK_INDEX_FIELD, metadata.get(CHUNK_INDEX_FIELD)),
+    )
+
+
+def build_document_filters(document_hits: list[dict]) -> dict[str, list]:
+    """Build the chunk search filters covering the selected documents.
+
+    Filters only use the indexed source and chunk index fields, so chunks of
+    other pages of the selected sources may match. `select_document_chunks`
+    drops them.
+    """
+    source_ids: set[str] = set()
+    chunk_indexes: set[int] = set()
+    for hit in document_hits:
+        metadata: dict[str, Any] = hit["entity"][METADATA_FIELD]
+        source_ids.add(metadata[SOURCE_ID_FIELD])
+        chunk_indexes.update(metadata[CHUNK_INDEXES_KEY])
+    return {
+        SOURCE_ID_FIELD: sorted(source_ids),
+        CHUNK_INDEX_FIELD: sorted(chunk_indexes),
+    }
+
+
+def select_document_chunks(
+    chunk_hits: list[dict],
+    document_hits: list[dict],
+    limit: int,
+    max_chunks: int = DOCUMENT_MAX_CHUNKS,
+) -> list[dict]:
+    """Keep the best `max_chunks` chunk hits of each selected document."""
+    documents: dict[tuple[str, int], int] = {}
+    for rank, hit in enumerate(document_hits):
+        metadata: dict[str, Any] = hit["entity"][METADATA_FIELD]
+        for chunk_index in metadata[CHUNK_INDEXES_KEY]:
+            documents[(metadata[SOURCE_ID_FIELD], chunk_index)] = rank
+
+    per_document: Counter[int] = Counter()
+    results: list[dict] = []
+    for hit in chunk_hits:
+        document = documents.get(get_chunk_ref(hit["entity"]))
+        if document is None or per_document[document] >= max_chunks:
+            continue
+        per_document[document] += 1
+        results.append(hit)
+        if len(results) >= limit:
+            break
+    return results
@@ -0,0 +1,623 @@
+"""Backend-independent knowledge base search.
+
+`KnowledgeVectorDb` holds the retrieval pipeline shared by the vector store
+backends: query embedding and its cache, account-scoped filter expressions,
+the semantic result cache, two-level search over document summary vectors,
+adaptive reranking and multi-query search. A backend provides the schema, the
+raw searches and the storage operations.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from http import HTTPStatus
+from time import time
+from typing import Any
+
+from agno.document import Document
+from pydantic import BaseModel
+
+from app.common.constants import ERROR_MESSAGES
+from app.config import settings
+from app.modules.cache.embedding_cache import EmbeddingCache
+from app.modules.cache.result_cache import SemanticResultCache
+from app.modules.db.content_store import ChunkContentStore, ChunkRef
+from app.modules.db.document_index import (
+    build_document_filters,
+    select_document_chunks,
+)
+from app.modules.db.schema import (
+    ACCOUNT_ID_FIELD,
+    CHUNK_INDEX_FIELD,
+    CONTENT_FIELD,
+    METADATA_FIELD,
+    OUTPUT_FIELDS,
+    SCALAR_FIELDS,
+    SOURCE_ID_FIELD,
+)
+from app.modules.embedder.base import BatchEmbedder
+from app.modules.embedder.batcher import EmbeddingBatcher
+from app.modules.reranker.pipeline import RerankPair
+from app.modules.reranker.policy import (
+    AdaptiveRerankPolicy,
+    RerankPlan,
+    record_rerank_plan,
+)
+from app.modules.reranker.runtime import RerankerRuntime, get_reranker_runtime
+from app.utils.context import get_context
+from app.utils.exceptions import CoreError
+from app.utils.json_utils import json_dumps
+from app.utils.logger import logger
+
+KB_SEARCH_LIMIT: int = settings.KB_SEARCH_LIMIT
+HYBRID_SEARCH_LIMIT: int = settings.HYBRID_SEARCH_LIMIT
+DOCUMENT_SEARCH_LIMIT: int = settings.DOCUMENT_SEARCH_LIMIT
+ADAPTIVE_RERANK_ENABLED: bool = settings.ADAPTIVE_RERANK_ENABLED
+RERANK_SCORE_FLOOR: float | None = settings.RERANK_SCORE_FLOOR
+
+
+class RerankResult(BaseModel):
+    """Rerank result."""
+
+    index: int
+    score: float
+    document: Any
+
+
+class KnowledgeVectorDb(ABC):
+    """Knowledge base search shared by the vector store backends."""
+
+    collection: str
+    embedder: BatchEmbedder
+
+    def __init__(  # noqa: PLR0913
+        self,
+        rerank_docs: int = 5,
+        embedding_cache: EmbeddingCache | None = None,
+        result_cache: SemanticResultCache | None = None,
+        content_store: ChunkContentStore | None = None,
+        document_index: "KnowledgeVectorDb | None" = None,
+        *,
+        embedding_batcher: EmbeddingBatcher | None = None,
+        **kwargs,
+    ):
+        """Knowledge vector database constructor."""
+        super().__init__(**kwargs)
+        self.rerank_docs: int = rerank_docs
+        self.rerank_policy: AdaptiveRerankPolicy | None = (
+            AdaptiveRerankPolicy(default_depth=rerank_docs, max_depth=KB_SEARCH_LIMIT)
+            if ADAPTIVE_RERANK_ENABLED
+            else None
+        )
+        self.embedding_cache: EmbeddingCache | None = embedding_cache
+        # Coalesces the query embeddings of concurrent requests
+        self.embedding_batcher: EmbeddingBatcher | None = embedding_batcher
+        self.result_cache: SemanticResultCache | None = result_cache
+        self.content_store: ChunkContentStore | None = content_store
+        # Document summary vectors searched before the chunks
+        self.document_index: KnowledgeVectorDb | None = document_index
+
+    @abstractmethod
+    async def get_field_names(self) -> set[str]:
+        """Get the field names of the collection schema."""
+
+    @abstractmethod
+    def get_field_names_sync(self) -> set[str]:
+        """Get the field names of the collection schema."""
+
+    @abstractmethod
+    async def use_hybrid_search(self) -> bool:
+        """Check whether hybrid search is enabled and supported."""
+
+    @abstractmethod
+    async def search_hits(
+        self,
+        query: str,
+        query_embedding: list[float],
+        limit: int,
+        filters: dict[str, Any] | None = None,
+        hybrid: bool = False,
+    ) -> list[dict]:
+        """Run a search and return the raw hits, best first."""
+
+    @abstractmethod
+    async def search_hits_batch(
+        self,
+        query_embeddings: list[list[float]],
+        limit: int,
+        filters: dict[str, Any] | None = None,
+    ) -> list[list[dict]]:
+        """Run a dense search for several query vectors at once."""
+
+    @abstractmethod
+    def find(self, expr: str = "", output_fields: list[str] | None = None):
+        """Find documents in the database."""
+
+    @abstractmethod
+    def bulk_insert(self, documents: list[dict[str, Any]]) -> int:
+        """Insert documents into the database."""
+
+    @abstractmethod
+    async def async_bulk_insert(self, documents: list[dict[str, Any]]) -> int:
+        """Insert documents into the database."""
+
+    @abstractmethod
+    def bulk_delete(
+        self,
+        ids: list | str | int | None = None,
+        filter_expr: str | None = None,
+    ) -> int:
+        """Delete documents from the database using Ids or a filter expression."""
+
+    @abstractmethod
+    async def async_bulk_delete(
+        self,
+        ids: list | str | int | None = None,
+        filter_expr: str | None = None,
+    ) -> int:
+        """Delete documents from the database using Ids or a filter expression."""
+
+    def build_filter_expr(
+        self, filters: dict[str, Any] | None, field_names: set[str]
+    ) -> str | None:
+        """Build a filter expression, using scalar fields over metadata keys.
+
+        Filters on `source_id` and `chunk_index` hit their inverted indexes
+        when the collection has them, other keys filter the JSON metadata.
+        """
+        if not filters:
+            return None
+
+        expressions: list[str] = []
+        metadata_filters: dict[str, Any] = {}
+        for key, value in filters.items():
+            if key not in SCALAR_FIELDS or key not in field_names:
+                metadata_filters[key] = value
+            elif isinstance(value, list | tuple | set):
+                expressions.append(f"{key} in {json_dumps(list(value))}")
+            else:
+                expressions.append(f"{key} == {json_dumps(value)}")
+
+        # Metadata expressions are built by the backend's `_build_expr`
+        if metadata_expr := self._build_expr(metadata_filters):
+            expressions.append(f"({metadata_expr})")
+        return " and ".join(expressions) or None
+
+    def build_source_expr(self, source_id: str) -> str | None:
+        """Build the filter expression matching all chunks of a source."""
+        return self.build_filter_expr(
+            {SOURCE_ID_FIELD: source_id}, self.get_field_names_sync()
+        )
+
+    async def async_build_source_expr(self, source_id: str) -> str | None:
+        """Build the filter expression matching all chunks of a source."""
+        return self.build_filter_expr(
+            {SOURCE_ID_FIELD: source_id}, await self.get_field_names()
+        )
+
+    async def build_search_expr(self, filters: dict[str, Any] | None) -> str | None:
+        """Build the search filter expression, scoped to the caller's account.
+
+        The account filter on the partition key restricts the search to the
+        partitions of that account. Collections created before account scoping
+        have no partition key and are searched unscoped until migrated.
+        """
+        return self.build_scoped_expr(filters, await self.get_field_names())
+
+    def build_scoped_expr(
+        self, filters: dict[str, Any] | None, field_names: set[str]
+    ) -> str | None:
+        """Build the search filter expression, scoped to the caller's account."""
+        expr = self.build_filter_expr(filters, field_names)
+        if ACCOUNT_ID_FIELD not in field_names:
+            return expr
+
+        account_id: str | None = get_context("account_id")
+        if not account_id:
+            raise CoreError(ERROR_MESSAGES.MISSING_ACCOUNT_SCOPE, HTTPStatus.FORBIDDEN)
+
+        account_expr = f"{ACCOUNT_ID_FIELD} == {json_dumps(account_id)}"
+        return f"{account_expr} and ({expr})" if expr else account_expr
+
+    @property
+    def output_fields(self) -> list[str]:
+        """Fields returned by searches, only chunk references with a content store."""
+        if self.content_store is None:
+            return OUTPUT_FIELDS
+        return ["id", SOURCE_ID_FIELD, CHUNK_INDEX_FIELD]
+
+    @property
+    def requires_content_field(self) -> bool:
+        """Whether the backend needs chunk content in the vector records."""
+        return False
+
+    def offload_content(self, documents: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Move chunk content to the content store, returning thin records.
+
+        Metadata is kept in the vector records, it is still used for filters.
+        """
+        if self.content_store is None:
+            return documents
+
+        offloaded = [doc for doc in documents if doc.get(SOURCE_ID_FIELD) is not None]
+        self.content_store.put_many(offloaded)
+        if self.requires_content_field:
+            return documents
+
+        return [
+            {**doc, CONTENT_FIELD: ""} if doc.get(SOURCE_ID_FIELD) is not None else doc
+            for doc in documents
+        ]
+
+    async def hydrate_hits(self, hits: list[dict]) -> list[dict]:
+        """Fill in the content and metadata of thin search hits.
+
+        Chunks are read from the content store, chunks missing from it (e.g.
+        stored before it was enabled) from the vector database. Hits whose
+        content is found in neither, such as offloaded chunks while Redis is
+        down, are dropped.
+        """
+        if self.content_store is None or not hits:
+            return hits
+
+        chunks: list[dict[str, Any] | None] = [None] * len(hits)
+        stored = [
+            i
+            for i, hit in enumerate(hits)
+            if hit["entity"].get(SOURCE_ID_FIELD) is not None
+        ]
+        if stored:
+            refs = [
+                ChunkRef(
+                    hits[i]["id"],
+                    hits[i]["entity"][SOURCE_ID_FIELD],
+                    hits[i]["entity"][CHUNK_INDEX_FIELD],
+                )
+                for i in stored
+            ]
+            for i, chunk in zip(
+                stored, await self.content_store.get_many(refs), strict=True
+            ):
+                chunks[i] = chunk
+
+        missing_ids = [hits[i]["id"] for i, chunk in enumerate(chunks) if not chunk]
+        if missing_ids:
+            rows = await asyncio.to_thread(
+                self.find,
+                f"id in {json_dumps(missing_ids)}",
+                [CONTENT_FIELD, METADATA_FIELD],
+            )
+            # Offloaded chunks have an empty content field
+            rows_by_id = {row["id"]: row for row in rows if row.get(CONTENT_FIELD)}
+            chunks = [
+                chunk or rows_by_id.get(hit["id"])
+                for hit, chunk in zip(hits, chunks, strict=True)
+            ]
+
+        hydrated: list[dict] = []
+        for hit, chunk in zip(hits, chunks, strict=True):
+            if chunk:
+                hit["entity"][CONTENT_FIELD] = chunk.get(CONTENT_FIELD, "")
+                hit["entity"][METADATA_FIELD] = chunk.get(METADATA_FIELD) or {}
+                hydrated.append(hit)
+        if len(hydrated) < len(hits):
+            logger.warning(
+                f"[{self.collection}] Dropped {len(hits) - len(hydrated)} hits "
+                "without content"
+            )
+        return hydrated
+
+    async def search_chunk_hits(
+        self,
+        query: str,
+        query_embedding: list[float],
+        limit: int,
+        filters: dict[str, Any] | None = None,
+        hybrid: bool = False,
+    ) -> list[dict]:
+        """Search chunks, within the top documents when there is a document index.
+
+        Documents are selected on their summary vectors, then only their chunks
+        are searched and a few chunks are kept per document. Filtered searches,
+        and searches selecting no document, search all chunks.
+        """
+        if self.document_index is None or filters:
+            return await self.search_hits(
+                query, query_embedding, limit=limit, filters=filters, hybrid=hybrid
+            )
+
+        document_hits = await self.document_index.search_hits(
+            query, query_embedding, limit=DOCUMENT_SEARCH_LIMIT
+        )
+        if not document_hits:
+            return await self.search_hits(
+                query, query_embedding, limit=limit, hybrid=hybrid
+            )
+
+        # Over-fetch, hits of other pages and beyond the per-document cap are dropped
+        chunk_hits = await self.search_hits(
+            query,
+            query_embedding,
+            limit=limit * 2,
+            filters=build_document_filters(document_hits),
+            hybrid=hybrid,
+        )
+        hits = select_document_chunks(chunk_hits, document_hits, limit)
+        logger.debug(
+            f"[{self.collection}] Kept {len(hits)} of {len(chunk_hits)} chunks "
+            f"from {len(document_hits)} documents"
+        )
+        return hits
+
+    async def embed_search_queries(self, queries: list[str]) -> list[list[float]]:
+        """Embed search queries, batched with concurrent requests when enabled."""
+        if self.embedding_batcher is None:
+            return await self.embedder.async_embed_queries(queries)
+        return await self.embedding_batcher.embed(queries)
+
+    async def get_query_embedding(self, query: str) -> list[float] | None:
+        """Get the embedding for a search query, using the cache when available."""
+
+        async def _embed(text: str) -> list[float] | None:
+            return (await self.embed_search_queries([text]))[0] or None
+
+        if self.embedding_cache is None:
+            return await _embed(query)
+
+        return await self.embedding_cache.get_or_compute(query, _embed)
+
+    async def get_query_embeddings(
+        self, queries: list[str]
+    ) -> list[list[float] | None]:
+        """Embed multiple search queries with a single embedding request.
+
+        Cached embeddings are reused; only cache misses are sent to the
+        embedding model, all in one batch.
+        """
+        embeddings: list[list[float] | None] = [None] * len(queries)
+        if self.embedding_cache is not None:
+            embeddings = list(
+                await asyncio.gather(*(self.embedding_cache.get(q) for q in queries))
+            )
+
+        missing: list[int] = [i for i, emb in enumerate(embeddings) if emb is None]
+        if not missing:
+            return embeddings
+
+        try:
+            vectors = await self.embed_search_queries([queries[i] for i in missing])
+        except Exception as e:
+            logger.error(f"Error getting embeddings for {len(missing)} queries: {e}")
+            return embeddings
+
+        for i, vector in zip(missing, vectors, strict=False):
+            embeddings[i] = vector or None
+            if self.embedding_cache is not None and vector:
+                await self.embedding_cache.set(queries[i], vector)
+
+        return embeddings
+
+    @staticmethod
+    def hit_to_document(hit: dict[str, Any]) -> Document:
+        """Build a Document from a Milvus search hit."""
+        entity: dict[str, Any] = hit["entity"]
+        return Document(
+            id=hit["id"],
+            name=entity.get("name"),
+            meta_data=entity.get("meta_data", {}),
+            content=entity.get("content", ""),
+            usage=entity.get("usage"),
+        )
+
+    def get_result_cache_namespace(self, filters: dict[str, Any] | None) -> str:
+        """Build the result cache namespace for this collection, account and filters."""
+        namespace = f"{self.collection}:{get_context('account_id')}"
+        if not filters:
+            return namespace
+        return f"{namespace}:{json_dumps(filters, sort_keys=True)}"
+
+    @property
+    def reranker_runtime(self) -> RerankerRuntime:
+        """Reranker runtime shared by all collections in the process."""
+        return get_reranker_runtime()
+
+    def plan_rerank(self, hits: list[dict], hybrid: bool) -> RerankPlan:
+        """Choose how many search hits to rerank for a query."""
+        # Fused RRF scores carry no similarity margin, so keep the fixed depth
+        if self.rerank_policy is None or hybrid:
+            plan = RerankPlan(depth=min(self.rerank_docs, len(hits)), reason="fixed")
+        else:
+            plan = self.rerank_policy.plan([hit["distance"] for hit in hits])
+
+        record_rerank_plan(self.collection, len(hits), plan)
+        return plan
+
+    async def rerank(
+        self,
+        query: str,
+        documents: list[Document],
+        depth: int | None = None,
+    ) -> list[RerankResult]:
+        """Rerank the top `depth` documents on their content using the reranker.
+
+        Results scoring below `RERANK_SCORE_FLOOR` are pruned.
+        """
+        docs_to_score = documents[: self.rerank_docs if depth is None else depth]
+        if not docs_to_score:
+            return []
+
+        # Scored together with pairs from concurrent requests
+        scores = await self.reranker_runtime.score(
+            [
+                RerankPair(
+                    query,
+                    doc.content,
+                    chunk_id=f"{self.collection}:{doc.id}" if doc.id else None,
+                )
+                for doc in docs_to_score
+            ]
+        )
+
+        results = [
+            RerankResult(index=i, score=score, document=docs_to_score[i])
+            for i, score in enumerate(scores)
+            if RERANK_SCORE_FLOOR is None or score >= RERANK_SCORE_FLOOR
+        ]
+        if len(results) < len(docs_to_score):
+            logger.debug(
+                f"Pruned {len(docs_to_score) - len(results)} results below "
+                f"rerank score {RERANK_SCORE_FLOOR}"
+            )
+
+        # Sort descending by score
+        results.sort(key=lambda x: x.score, reverse=True)
+        return results
+
+    async def basic_search(
+        self, query: str, limit: int = 3, filters: dict[str, Any] | None = None
+    ) -> list[Document]:
+        """Search using vectors.
+
+        This method is used to search the knowledge base for the given query.
+        query must be present, limit should always be an integer or
+        should not be provided when calling this method.
+        """
+        logger.debug(f"[{self.collection}] Basic search invoked {query=}")
+        query_embedding = await self.get_query_embedding(query)
+        if not query_embedding:
+            logger.error(f"Error getting embedding for Query: {query}")
+            return []
+
+        hits = await self.search_hits(
+            query,
+            query_embedding,
+            limit=limit,
+            filters=filters,
+            hybrid=await self.use_hybrid_search(),
+        )
+
+        # Build search results
+        search_results: list[Document] = [
+            self.hit_to_document(hit) for hit in await self.hydrate_hits(hits)
+        ]
+
+        return search_results
+
+    async def search_many(
+        self,
+        queries: list[str],
+        limit: int = 3,
+        filters: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        """Search using vectors for multiple queries at once.
+
+        This method is used to search the knowledge base for several queries
+        (e.g. expanded or rephrased versions of the user query) in one call.
+        Always pass all queries together instead of searching them one by one.
+        queries must be a list of strings, limit should always be an integer or
+        should not be provided when calling this method. Results of all queries
+        are merged and de-duplicated.
+        """
+        queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+        logger.debug(f"[{self.collection}] Multi-query search invoked {queries=}")
+        if not queries:
+            return []
+
+        query_embeddings = [
+            embedding
+            for embedding in await self.get_query_embeddings(queries)
+            if embedding
+        ]
+        if not query_embeddings:
+            logger.error(f"Error getting embeddings for Queries: {queries}")
+            return []
+
+        results = await self.search_hits_batch(query_embeddings, limit, filters)
+
+        # Merge hits of all queries, keeping the best score per document
+        best_hits: dict[str, dict] = {}
+        for hits in results:
+            for hit in hits:
+                current = best_hits.get(hit["id"])
+                if current is None or hit["distance"] > current["distance"]:
+                    best_hits[hit["id"]] = hit
+
+        ranked_hits = sorted(
+            best_hits.values(), key=lambda hit: hit["distance"], reverse=True
+        )
+        return [
+            self.hit_to_document(hit) for hit in await self.hydrate_hits(ranked_hits)
+        ]
+
+    async def async_search(
+        self,
+        query: str,
+        user_id: str | None = None,
+        filters: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        """Search synchronously method for agent compatibility.
+
+        This method is used to search the knowledge base for the given query.
+        query must be present. The `filters` parameter is for advanced use and
+        should be ignored. Do not provide the `filters` parameter when you call
+        this tool. An additional process of re-ranking the results is also done.
+        """
+        logger.debug(
+            f"[{self.collection}] Asynchronous search wrapper invoked {query=}"
+        )
+
+        # Get embeddings and search
+        start_time = time()
+        query_embedding = await self.get_query_embedding(query)
+        if not query_embedding:
+            logger.error(f"Error getting embedding for Query: {query}")
+            return []
+        logger.debug(f"Embedded query in {time() - start_time} seconds")
+
+        # Serve near-identical queries from the semantic result cache
+        cache_namespace = self.get_result_cache_namespace(filters)
+        cache_epoch: int | None = None
+        if self.result_cache is not None:
+            cached_results, cache_epoch = await self.result_cache.lookup(
+                cache_namespace, query_embedding
+            )
+            if cached_results is not None:
+                logger.debug(f"[{user_id}] Returning cached response")
+                return cached_results
+
+        # 2) Raw Milvus search, hybrid candidates are sharper so fewer are needed
+        start_time = time()
+        hybrid = await self.use_hybrid_search()
+        hits = await self.search_chunk_hits(
+            query,
+            query_embedding,
+            limit=HYBRID_SEARCH_LIMIT if hybrid else KB_SEARCH_LIMIT,
+            filters=filters,
+            hybrid=hybrid,
+        )
+        logger.debug(f"Searched vector db in {time() - start_time} seconds")
+
+        # 3) Rerank on chunk content, as deep as the vector scores call for.
+        # Only hits that can make the final results have their content loaded
+        start_time = time()
+        plan = self.plan_rerank(hits, hybrid)
+        candidates = await self.hydrate_hits(hits[: max(plan.depth, self.rerank_docs)])
+        documents: list[Document] = [self.hit_to_document(hit) for hit in candidates]
+        reranked = await self.rerank(query, documents, depth=plan.depth)
+        logger.debug(f"Re-ranked results in {time() - start_time:.3f}s")
+
+        # 4) Order Document objects by rerank score, candidates left unscored
+        # by a skipped or shrunk rerank follow in vector order. They rank below
+        # the scored ones, so none follow when the score floor pruned any
+        pruned: bool = len(reranked) < len(documents[: plan.depth])
+        search_results: list[Document] = [
+            *(r.document for r in reranked),
+            *([] if pruned else documents[plan.depth : self.rerank_docs]),
+        ][: self.rerank_docs]
+
+        if self.result_cache is not None and cache_epoch is not None:
+            self.result_cache.store(
+                cache_namespace, query_embedding, search_results, cache_epoch
+            )
+
+        logger.debug(f"[{user_id}] Returning final response")
+        return search_results or []
@@ -0,0 +1,747 @@
+"""Embedded local vector store for knowledge base collections.
+
+A server-less backend with the same surface as `ModMilvus`, for small
+tenants, CI and offline benchmarking. Each collection is a directory holding:
+
+    vectors.npy     memory-mapped float16 matrix of normalized vectors
+    records.jsonl   append-only log of inserted records and deleted ids
+
+The log is the source of truth: vectors past the last logged row are ignored,
+and other processes (e.g. Celery workers inserting chunks) are picked up by
+replaying the log from the last read offset. Searches are vectorized exact
+cosine scans over a float32 copy of the vectors kept in memory, or an
+in-memory IVF index on large collections. Filters match columns of the
+record fields and metadata keys, encoded as integer codes.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from threading import RLock
+from typing import Any, Literal, NamedTuple
+
+import numpy as np
+from agno.document import Document
+from agno.vectordb.base import VectorDb
+
+from app.config import settings
+from app.modules.db.knowledge_search import KnowledgeVectorDb
+from app.modules.db.schema import (
+    ACCOUNT_ID_FIELD,
+    CHUNK_INDEX_FIELD,
+    CONTENT_FIELD,
+    METADATA_FIELD,
+    SCALAR_FIELDS,
+    SOURCE_ID_FIELD,
+    VECTOR_FIELD,
+)
+from app.utils.context import get_context
+from app.utils.json_utils import json_dumps
+from app.utils.logger import logger
+
+LOCAL_VECTOR_STORE_INDEX: str = settings.LOCAL_VECTOR_STORE_INDEX
+LOCAL_VECTOR_STORE_IVF_MIN_ROWS: int = settings.LOCAL_VECTOR_STORE_IVF_MIN_ROWS
+LOCAL_VECTOR_STORE_IVF_NPROBE: int = settings.LOCAL_VECTOR_STORE_IVF_NPROBE
+
+VECTORS_FILE: str = "vectors.npy"
+RECORDS_FILE: str = "records.jsonl"
+LOCK_FILE: str = ".lock"
+INITIAL_CAPACITY: int = 1024
+ASSIGN_BLOCK_ROWS: int = 32_768  # Rows assigned to IVF lists at a time
+COMPACT_DELETED_RATIO: float = 0.3
+IVF_TRAIN_ITERATIONS: int = 10
+IVF_TRAIN_POINTS_PER_LIST: int = 40
+
+# Fields with columns built on load, other fields and metadata keys get theirs
+# on first filter. Integer fields hold their values, others value codes.
+COLUMN_FIELDS: tuple[str, ...] = ("id", ACCOUNT_ID_FIELD, *SCALAR_FIELDS)
+INT_COLUMN_FIELDS: tuple[str, ...] = ("id", CHUNK_INDEX_FIELD)
+
+# A record field, or a key of a JSON field
+ColumnKey = tuple[str, str | None]
+
+
+class FilterClause(NamedTuple):
+    """One `field == value` / `field in [...]` term of a filter expression."""
+
+    field: str
+    key: str | None
+    op: Literal["==", "in"]
+    value: Any
+
+
+_CLAUSE_PATTERN = re.compile(
+    r'^(?P<field>\w+)(?:\["(?P<key>[^"]+)"\])?\s*(?P<op>==|in)\s*(?P<value>.+)$'
+)
+
+
+def split_conjunction(expr: str) -> Iterator[str]:
+    """Split an `and` expression into terms, dropping grouping parentheses."""
+    term: list[str] = []
+    in_string = False
+    i = 0
+    while i < len(expr):
+        char = expr[i]
+        if in_string:
+            term.append(char)
+            if char == "\\":
+                term.append(expr[i + 1])
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            term.append(char)
+        elif char in "()":
+            pass
+        elif expr.startswith(" and ", i):
+            yield "".join(term).strip()
+            term = []
+            i += len(" and ")
+            continue
+        else:
+            term.append(char)
+        i += 1
+
+    if "".join(term).strip():
+        yield "".join(term).strip()
+
+
+def parse_filter_expr(expr: str | None) -> list[FilterClause]:
+    """Parse the conjunctive filter expressions built for knowledge base searches."""
+    if not expr:
+        return []
+
+    clauses: list[FilterClause] = []
+    for term in split_conjunction(expr):
+        match = _CLAUSE_PATTERN.match(term)
+        if not match:
+            raise ValueError(f"Unsupported filter expression: {term}")
+        clauses.append(
+            FilterClause(
+                field=match["field"],
+                key=match["key"],
+                op=match["op"],  # type: ignore[arg-type]
+                value=json.loads(match["value"]),
+            )
+        )
+    return clauses
+
+
+def column_value(value: Any) -> Any:
+    """Get the hashable value encoded in a column, JSON for lists and objects."""
+    return json_dumps(value) if isinstance(value, dict | list) else value
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize float32 row vectors."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class LocalVectorStore(KnowledgeVectorDb, VectorDb):
+    """Embedded vector store with memory-mapped float16 vectors."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        collection: str,
+        embedder: Any,
+        path: str,
+        *,
+        index: Literal["exact", "ivf"] = LOCAL_VECTOR_STORE_INDEX,  # type: ignore[assignment]
+        ivf_min_rows: int = LOCAL_VECTOR_STORE_IVF_MIN_ROWS,
+        ivf_nprobe: int = LOCAL_VECTOR_STORE_IVF_NPROBE,
+        **kwargs,
+    ):
+        """Local vector store constructor."""
+        super().__init__(**kwargs)
+        self.collection: str = collection
+        self.embedder = embedder
+        self.dimensions: int = embedder.dimensions
+        self.directory: Path = Path(path) / collection
+        self.index: str = index
+        self.ivf_min_rows: int = ivf_min_rows
+        self.ivf_nprobe: int = ivf_nprobe
+        self._lock = RLock()
+        # Ids are never reused, they key the in-process chunk caches
+        self._next_id: int = 1
+        self._reset()
+
+    def _reset(self) -> None:
+        """Forget the loaded state, it is reloaded from disk on next use."""
+        self._vectors: np.ndarray | None = None
+        self._vectors_inode: int | None = None
+        self._records_inode: int | None = None
+        self._records_offset: int = 0
+        self._rows: list[dict[str, Any] | None] = []
+        self._row_by_id: dict[int, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        # Normalized vectors of the loaded rows, with spare rows to grow into
+        self._matrix = np.zeros((0, self.dimensions), dtype=np.float32)
+        self._columns: dict[ColumnKey, np.ndarray] = {}
+        self._codes: dict[ColumnKey, dict[Any, int]] = {}
+        self._centroids: np.ndarray | None = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._ivf_trained_rows: int = 0
+
+    @property
+    def vectors_path(self) -> Path:
+        """Path of the vector matrix."""
+        return self.directory / VECTORS_FILE
+
+    @property
+    def records_path(self) -> Path:
+        """Path of the record log."""
+        return self.directory / RECORDS_FILE
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False):
+        """Hold the collection's locks, with the state refreshed from disk.
+
+        Writers hold the inter-process lock exclusively, so readers never see
+        a vector matrix or log being grown or compacted.
+        """
+        if not self.exists():
+            self.create()
+        with self._lock, open(self.directory / LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ----------------------------------------------------------------------- #
+    # Storage
+
+    def create(self) -> None:
+        """Create the collection directory and files if missing."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not self.vectors_path.exists():
+                np.lib.format.open_memmap(
+                    self.vectors_path,
+                    mode="w+",
+                    dtype=np.float16,
+                    shape=(INITIAL_CAPACITY, self.dimensions),
+                ).flush()
+            if not self.records_path.exists():
+                # A re-created collection numbers its ids after the dropped one
+                self._append_log(
+                    {"op": "insert", "records": [], "next_id": self._next_id}
+                )
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        logger.info(f"[{self.collection}] Local vector store at '{self.directory}'")
+
+    def exists(self) -> bool:
+        """Check whether the collection exists."""
+        return self.vectors_path.exists() and self.records_path.exists()
+
+    def _refresh(self) -> None:
+        """Load records logged since the last read, reloading after a compaction."""
+        records_inode = os.stat(self.records_path).st_ino
+        if records_inode != self._records_inode:
+            self._reset()
+            self._records_inode = records_inode
+
+        vectors_inode = os.stat(self.vectors_path).st_ino
+        if self._vectors is None or vectors_inode != self._vectors_inode:
+            self._vectors = np.load(self.vectors_path, mmap_mode="r+")
+            self._vectors_inode = vectors_inode
+
+        with open(self.records_path, encoding="utf-8") as file:
+            file.seek(self._records_offset)
+            lines = file.readlines()
+            self._records_offset = file.tell()
+
+        inserted: list[dict[str, Any]] = []
+        for line in lines:
+            entry = json.loads(line)
+            if entry["op"] == "insert":
+                inserted.extend(entry["records"])
+                self._next_id = max(self._next_id, entry.get("next_id", 1))
+            else:
+                self._append_rows(inserted)
+                inserted = []
+                self._mark_deleted(entry["ids"])
+        self._append_rows(inserted)
+
+    def _append_rows(self, records: list[dict[str, Any]]) -> None:
+        """Append logged records to the in-memory rows and columns."""
+        if not records:
+            return
+
+        start = len(self._rows)
+        for offset, record in enumerate(records):
+            self._rows.append(record)
+            self._row_by_id[record["id"]] = start + offset
+        self._next_id = max(self._next_id, records[-1]["id"] + 1)
+        self._alive = np.concatenate([self._alive, np.ones(len(records), dtype=bool)])
+        self._append_matrix(start, len(self._rows))
+
+        for key in {*((field, None) for field in COLUMN_FIELDS), *self._columns}:
+            column = self._encode_column(key, records)
+            self._columns[key] = (
+                np.concatenate([self._columns[key], column])
+                if key in self._columns
+                else column
+            )
+
+        if self._centroids is not None:
+            self._assignments = np.concatenate(
+                [self._assignments, self._assign(np.arange(start, len(self._rows)))]
+            )
+
+    def _append_matrix(self, start: int, end: int) -> None:
+        """Copy the vectors of appended rows to the float32 matrix."""
+        if end > len(self._matrix):
+            grown = np.empty(
+                (max(end, 2 * len(self._matrix), INITIAL_CAPACITY), self.dimensions),
+                dtype=np.float32,
+            )
+            grown[:start] = self._matrix[:start]
+            self._matrix = grown
+        self._matrix[start:end] = self._vectors[start:end]
+
+    def _encode_column(
+        self, key: ColumnKey, records: list[dict[str, Any] | None]
+    ) -> np.ndarray:
+        """Get the column values of records, integers or value codes."""
+        field, json_key = key
+        values = [(record or {}).get(field) for record in records]
+        if json_key is not None:
+            values = [(value or {}).get(json_key) for value in values]
+        elif field in INT_COLUMN_FIELDS:
+            return np.asarray(values, dtype=np.int64)
+
+        codes = self._codes.setdefault(key, {})
+        return np.fromiter(
+            (codes.setdefault(column_value(value), len(codes)) for value in values),
+            dtype=np.int32,
+            count=len(values),
+        )
+
+    def _get_column(self, key: ColumnKey) -> np.ndarray:
+        """Get the column of a field or JSON key, encoding it on first use."""
+        if key not in self._columns:
+            self._columns[key] = self._encode_column(key, self._rows)
+        return self._columns[key]
+
+    def _mark_deleted(self, ids: list[int]) -> None:
+        """Mark rows of deleted ids as deleted."""
+        for id_ in ids:
+            row = self._row_by_id.pop(id_, None)
+            if row is not None:
+                self._rows[row] = None
+                self._alive[row] = False
+
+    def _ensure_capacity(self, rows: int) -> None:
+        """Grow the vector matrix to hold at least `rows` rows."""
+        capacity = self._vectors.shape[0]
+        if rows <= capacity:
+            return
+
+        while capacity < rows:
+            capacity *= 2
+        grown_path = self.vectors_path.with_suffix(".grow.npy")
+        grown = np.lib.format.open_memmap(
+            grown_path,
+            mode="w+",
+            dtype=np.float16,
+            shape=(capacity, self.dimensions),
+        )
+        grown[: len(self._rows)] = self._vectors[: len(self._rows)]
+        grown.flush()
+        del grown
+        os.replace(grown_path, self.vectors_path)
+        self._vectors = np.load(self.vectors_path, mmap_mode="r+")
+        self._vectors_inode = os.stat(self.vectors_path).st_ino
+
+    def _append_log(self, entry: dict[str, Any]) -> None:
+        """Append an entry to the record log and advance past it."""
+        with open(self.records_path, "a", encoding="utf-8") as file:
+            file.write(json_dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def bulk_insert(self, documents: list[dict[str, Any]]) -> int:
+        """Insert documents, each holding a `vector` and its record fields."""
+        if not documents:
+            return 0
+
+        with self._locked(exclusive=True):
+            start = len(self._rows)
+            vectors = normalize(
+                np.asarray([doc[VECTOR_FIELD] for doc in documents], dtype=np.float32)
+            )
+            self._ensure_capacity(start + len(documents))
+            self._vectors[start : start + len(documents)] = vectors
+            self._vectors.flush()
+
+            records = [
+                {
+                    **{k: v for k, v in doc.items() if k != VECTOR_FIELD},
+                    "id": self._next_id + i,
+                }
+                for i, doc in enumerate(documents)
+            ]
+            self._append_log({"op": "insert", "records": records})
+            self._refresh()
+
+        logger.info(f"[{self.collection}] Inserted {len(records)} documents")
+        return len(records)
+
+    async def async_bulk_insert(self, documents: list[dict[str, Any]]) -> int:
+        """Insert documents without blocking the event loop."""
+        return await asyncio.to_thread(self.bulk_insert, documents)
+
+    def bulk_delete(
+        self,
+        ids: list | str | int | None = None,
+        filter_expr: str | None = None,
+    ) -> int:
+        """Delete documents using Ids or a filter expression."""
+        if ids is None and not filter_expr:
+            return 0
+
+        with self._locked(exclusive=True):
+            mask = self._filter_mask(parse_filter_expr(filter_expr))
+            if ids is not None:
+                id_list = ids if isinstance(ids, list) else [ids]
+                mask &= np.isin(self._get_column(("id", None)), id_list)
+
+            deleted_ids = (
+                self._get_column(("id", None))[mask].tolist() if mask.any() else []
+            )
+            if deleted_ids:
+                self._append_log({"op": "delete", "ids": deleted_ids})
+                self._refresh()
+                if (~self._alive).mean() > COMPACT_DELETED_RATIO:
+                    self._compact()
+
+        return len(deleted_ids)
+
+    async def async_bulk_delete(
+        self,
+        ids: list | str | int | None = None,
+        filter_expr: str | None = None,
+    ) -> int:
+        """Delete documents without blocking the event loop."""
+        return await asyncio.to_thread(self.bulk_delete, ids, filter_expr)
+
+    def _compact(self) -> None:
+        """Rewrite the vectors and log without deleted rows (write lock held)."""
+        alive_rows = np.flatnonzero(self._alive)
+        capacity = max(INITIAL_CAPACITY, len(alive_rows))
+        compact_vectors_path = self.vectors_path.with_suffix(".compact.npy")
+        compact_records_path = self.records_path.with_suffix(".compact.jsonl")
+
+        vectors = np.lib.format.open_memmap(
+            compact_vectors_path,
+            mode="w+",
+            dtype=np.float16,
+            shape=(capacity, self.dimensions),
+        )
+        vectors[: len(alive_rows)] = self._vectors[alive_rows]
+        vectors.flush()
+        del vectors
+
+        with open(compact_records_path, "w", encoding="utf-8") as file:
+            records = [self._rows[row] for row in alive_rows]
+            # Ids are never reused, even those of deleted trailing rows
+            entry = {"op": "insert", "records": records, "next_id": self._next_id}
+            file.write(json_dumps(entry) + "\n")
+
+        os.replace(compact_vectors_path, self.vectors_path)
+        os.replace(compact_records_path, self.records_path)
+        self._reset()
+        self._refresh()
+        logger.info(f"[{self.collection}] Compacted to {len(alive_rows)} rows")
+
+    def find(self, expr: str = "", output_fields: list[str] | None = None):
+        """Find documents matching a filter expression."""
+        with self._locked():
+            rows = np.flatnonzero(self._filter_mask(parse_filter_expr(expr)))
+            return [self._entity(row, output_fields) for row in rows]
+
+    def _entity(self, row: int, output_fields: list[str] | None) -> dict[str, Any]:
+        """Project a stored record on the requested fields."""
+        record = self._rows[row] or {}
+        if not output_fields or "*" in output_fields:
+            return dict(record)
+        entity = {"id": record["id"], **{f: record.get(f) for f in output_fields}}
+        if VECTOR_FIELD in output_fields:
+            entity[VECTOR_FIELD] = self._matrix[row].tolist()
+        return entity
+
+    # ----------------------------------------------------------------------- #
+    # Search
+
+    def _filter_mask(self, clauses: list[FilterClause]) -> np.ndarray:
+        """Get the mask of live rows matching all filter clauses."""
+        mask = self._alive.copy()
+        for clause in clauses:
+            key: ColumnKey = (clause.field, clause.key)
+            column = self._get_column(key)
+            values = clause.value if clause.op == "in" else [clause.value]
+            if clause.key is None and clause.field in INT_COLUMN_FIELDS:
+                mask &= np.isin(column, values)
+                continue
+
+            codes = self._codes[key]
+            matched = [codes[v] for v in map(column_value, values) if v in codes]
+            mask &= np.isin(column, matched)
+        return mask
+
+    def _score_rows(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Cosine scores of stored rows, scanning all rows unless few are kept."""
+        if 2 * len(rows) < len(self._rows):
+            return self._matrix[rows] @ query
+        return (self._matrix[: len(self._rows)] @ query)[rows]
+
+    def _assign(self, rows: np.ndarray) -> np.ndarray:
+        """Assign stored rows to their nearest IVF centroid."""
+        assignments = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), ASSIGN_BLOCK_ROWS):
+            block = rows[start : start + ASSIGN_BLOCK_ROWS]
+            scores = self._matrix[block] @ self._centroids.T
+            assignments[start : start + len(block)] = scores.argmax(axis=1)
+        return assignments
+
+    def _train_ivf(self) -> None:
+        """Train IVF centroids with spherical k-means on a sample of live rows."""
+        alive_rows = np.flatnonzero(self._alive)
+        nlist = max(1, int(np.sqrt(len(alive_rows))))
+        rng = np.random.default_rng(0)
+        sample_size = min(len(alive_rows), nlist * IVF_TRAIN_POINTS_PER_LIST)
+        sample = self._matrix[
+            np.sort(rng.choice(alive_rows, sample_size, replace=False))
+        ]
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = (sample @ centroids.T).argmax(axis=1)
+            for list_id in range(nlist):
+                members = sample[labels == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+            centroids = normalize(centroids)
+
+        self._centroids = centroids
+        self._assignments = self._assign(np.arange(len(self._rows)))
+        self._ivf_trained_rows = len(alive_rows)
+        logger.info(f"[{self.collection}] Trained IVF with {nlist} lists")
+
+    def _use_ivf(self) -> bool:
+        """Check whether IVF search applies, (re)training the index when stale."""
+        alive = int(self._alive.sum())
+        if self.index != "ivf" or alive < self.ivf_min_rows:
+            return False
+        if self._centroids is None or alive > 2 * self._ivf_trained_rows:
+            self._train_ivf()
+        return True
+
+    def _search(
+        self, query_embeddings: list[list[float]], limit: int, expr: str | None
+    ) -> list[list[dict]]:
+        """Search the top `limit` live rows matching `expr` for each query."""
+        with self._locked():
+            mask = self._filter_mask(parse_filter_expr(expr))
+            queries = normalize(np.asarray(query_embeddings, dtype=np.float32))
+            use_ivf = self._use_ivf()
+
+            results: list[list[dict]] = []
+            for query in queries:
+                candidate_mask = mask
+                if use_ivf:
+                    probe = np.argsort(self._centroids @ query)[-self.ivf_nprobe :]
+                    candidate_mask = mask & np.isin(self._assignments, probe)
+                rows = np.flatnonzero(candidate_mask)
+
+                scores = self._score_rows(rows, query)
+                if len(rows) > limit:
+                    top = np.argpartition(-scores, limit - 1)[:limit]
+                else:
+                    top = np.arange(len(rows))
+                top = top[np.argsort(-scores[top])]
+
+                results.append(
+                    [
+                        {
+                            "id": self._rows[rows[i]]["id"],
+                            "distance": float(scores[i]),
+                            "entity": self._entity(rows[i], self.output_fields),
+                        }
+                        for i in top
+                    ]
+                )
+            return results
+
+    async def get_field_names(self) -> set[str]:
+        """Get the queryable fields, all record fields are supported."""
+        return self.get_field_names_sync()
+
+    def get_field_names_sync(self) -> set[str]:
+        """Get the queryable fields, all record fields are supported."""
+        return {*COLUMN_FIELDS, CONTENT_FIELD, METADATA_FIELD}
+
+    async def use_hybrid_search(self) -> bool:
+        """Hybrid (BM25) search is not supported by the local store."""
+        return False
+
+    async def search_hits(
+        self,
+        query: str,
+        query_embedding: list[float],
+        limit: int,
+        filters: dict[str, Any] | None = None,
+        hybrid: bool = False,
+    ) -> list[dict]:
+        """Run a dense search and return the raw hits."""
+        expr = await self.build_search_expr(filters)
+        results = await asyncio.to_thread(self._search, [query_embedding], limit, expr)
+        return results[0]
+
+    async def search_hits_batch(
+        self,
+        query_embeddings: list[list[float]],
+        limit: int,
+        filters: dict[str, Any] | None = None,
+    ) -> list[list[dict]]:
+        """Run a dense search for several query vectors at once."""
+        expr = await self.build_search_expr(filters)
+        return await asyncio.to_thread(self._search, query_embeddings, limit, expr)
+
+    def _build_expr(self, filters: dict[str, Any] | None) -> str | None:
+        """Build a metadata filter expression, in the Milvus expression format."""
+        if not filters:
+            return None
+        return " and ".join(
+            f'{METADATA_FIELD}["{key}"] '
+            f"{'in' if isinstance(value, list | tuple) else '=='} "
+            f"{json_dumps(list(value) if isinstance(value, tuple) else value)}"
+            for key, value in filters.items()
+        )
+
+    # ----------------------------------------------------------------------- #
+    # VectorDb interface
+
+    async def async_create(self) -> None:
+        """Create the collection."""
+        await asyncio.to_thread(self.create)
+
+    async def async_exists(self) -> bool:
+        """Check whether the collection exists."""
+        return self.exists()
+
+    def doc_exists(self, document: Document) -> bool:
+        """Check whether a document with the same content exists."""
+        return self.content_exists(document.content)
+
+    async def async_doc_exists(self, document: Document) -> bool:
+        """Check whether a document with the same content exists."""
+        return await asyncio.to_thread(self.doc_exists, document)
+
+    def content_exists(self, content: str) -> bool:
+        """Check whether a record with this content exists."""
+        with self._locked():
+            return any(row and row.get(CONTENT_FIELD) == content for row in self._rows)
+
+    def name_exists(self, name: str) -> bool:
+        """Check whether a document with this name exists."""
+        with self._locked():
+            return any(row and row.get("name") == name for row in self._rows)
+
+    async def async_name_exists(self, name: str) -> bool:
+        """Check whether a document with this name exists."""
+        return await asyncio.to_thread(self.name_exists, name)
+
+    def id_exists(self, id: str) -> bool:  # noqa: A002
+        """Check whether a record with this id exists."""
+        with self._locked():
+            return int(id) in self._row_by_id
+
+    def _documents_to_records(self, documents: list[Document]) -> list[dict[str, Any]]:
+        """Embed agno documents into insertable records."""
+        records: list[dict[str, Any]] = []
+        for document in documents:
+            document.embed(embedder=self.embedder)
+            meta_data = document.meta_data or {}
+            records.append(
+                {
+                    VECTOR_FIELD: document.embedding,
+                    "name": document.name,
+                    CONTENT_FIELD: document.content,
+                    METADATA_FIELD: meta_data,
+                    ACCOUNT_ID_FIELD: meta_data.get(ACCOUNT_ID_FIELD)
+                    or get_context("account_id"),
+                    SOURCE_ID_FIELD: meta_data.get(SOURCE_ID_FIELD),
+                    CHUNK_INDEX_FIELD: meta_data.get(CHUNK_INDEX_FIELD) or 0,
+                }
+            )
+        return records
+
+    def insert(
+        self, documents: list[Document], filters: dict[str, Any] | None = None
+    ) -> None:
+        """Embed and insert agno documents."""
+        self.bulk_insert(self._documents_to_records(documents))
+
+    async def async_insert(
+        self, documents: list[Document], filters: dict[str, Any] | None = None
+    ) -> None:
+        """Embed and insert agno documents."""
+        await asyncio.to_thread(self.insert, documents, filters)
+
+    def upsert(
+        self, documents: list[Document], filters: dict[str, Any] | None = None
+    ) -> None:
+        """Insert documents whose content is not stored yet."""
+        self.insert(
+            [doc for doc in documents if not self.doc_exists(doc)], filters=filters
+        )
+
+    async def async_upsert(
+        self, documents: list[Document], filters: dict[str, Any] | None = None
+    ) -> None:
+        """Insert documents whose content is not stored yet."""
+        await asyncio.to_thread(self.upsert, documents, filters)
+
+    def search(
+        self, query: str, limit: int = 5, filters: dict[str, Any] | None = None
+    ) -> list[Document]:
+        """Search without reranking (agno interface)."""
+        query_embedding = self.embedder.get_embedding(query)
+        if not query_embedding:
+            return []
+        expr = self.build_scoped_expr(filters, self.get_field_names_sync())
+        hits = self._search([query_embedding], limit, expr)[0]
+        return [self.hit_to_document(hit) for hit in hits]
+
+    def drop(self) -> None:
+        """Delete the collection files."""
+        with self._lock, open(self.directory / LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if self.exists():
+                # Keep the next id of every logged record
+                self._refresh()
+            for path in (self.vectors_path, self.records_path):
+                path.unlink(missing_ok=True)
+            self._reset()
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def async_drop(self) -> None:
+        """Delete the collection files."""
+        await asyncio.to_thread(self.drop)
+
+    def delete(self) -> bool:
+        """Delete all records of the collection."""
+        self.drop()
+        self.create()
+        return True
@@ -1,41 +1,329 @@
 """Modified Milvus VectorDB Class."""
 
 import asyncio
+from collections.abc import Iterator
 from time import time
-from typing import Any
+from typing import Any, override
 
-from agno.document import Document
+import numpy as np
 from agno.vectordb.milvus import Milvus
-from onnxruntime import InferenceSession
-from pydantic import BaseModel
-from transformers import AutoTokenizer
-
-from app.config import settings
-from app.utils.json_utils import json_dumps, json_loads
+from pymilvus import AnnSearchRequest, AsyncMilvusClient, MilvusException, RRFRanker
+
+from app.config import IndexProfile, settings
+from app.modules.cache.embedding_cache import EmbeddingCache
+from app.modules.cache.result_cache import SemanticResultCache
+from app.modules.db.batching import split_by_bytes
+from app.modules.db.compaction import async_record_deletes, record_deletes
+from app.modules.db.knowledge_search import KnowledgeVectorDb
+from app.modules.db.reindex import (
+    ReindexState,
+    async_get_reindex_state,
+    get_reindex_state,
+)
+from app.modules.db.schema import (
+    ACCOUNT_ID_FIELD,
+    METRIC_TYPE,
+    SCALAR_FIELDS,
+    SPARSE_FIELD,
+    VECTOR_FIELD,
+    build_collection_schema,
+    build_index_params,
+    get_vector_field,
+)
+from app.modules.db.vectors import VectorDtype, fit_vectors
 from app.utils.logger import logger
+from app.utils.retry import retry_on_exception
+
+HYBRID_RRF_K: int = settings.HYBRID_RRF_K
+HYBRID_SPARSE_DROP_RATIO: float = settings.HYBRID_SPARSE_DROP_RATIO
+VECTOR_DB_NUM_PARTITIONS: int = settings.VECTOR_DB_NUM_PARTITIONS
+VECTOR_DB_INSERT_MAX_BYTES: int = settings.VECTOR_DB_INSERT_MAX_BYTES
+VECTOR_DB_INSERT_MAX_RETRIES: int = settings.VECTOR_DB_INSERT_MAX_RETRIES
+VECTOR_DB_INSERT_RETRY_DELAY: float = settings.VECTOR_DB_INSERT_RETRY_DELAY
+
+
+class PartialInsertError(Exception):
+    """Milvus inserted only part of a batch, the inserted rows were deleted."""
 
-KB_SEARCH_LIMIT: int = settings.KB_SEARCH_LIMIT
-MODEL_NAME = settings.RERANKER_MODEL
-ONNX_PATH = settings.RERANKER_ONNX_PATH
+    def __init__(self, inserted: int, total: int):
+        """PartialInsertError Constructor."""
+        super().__init__(f"Inserted {inserted} of {total} documents, rolled back")
 
 
-class RerankResult(BaseModel):
-    """Rerank result."""
+def is_rejected_insert(error: Exception) -> bool:
+    """Check whether an insert failed without writing anything.
 
-    index: int
-    score: float
-    document: Any
+    Milvus rejects invalid and rate-limited inserts with an error status, and
+    partial inserts are rolled back. Timed out or dropped requests may have
+    been applied, and replaying them into an auto_id collection would insert
+    the batch twice.
+    """
+    if isinstance(error, PartialInsertError):
+        return True
+    if not isinstance(error, MilvusException):
+        return False
+    message = str(error).lower()
+    return not any(word in message for word in ("deadline", "timeout", "timed out"))
 
 
-class ModMilvus(Milvus):
+class ModMilvus(KnowledgeVectorDb, Milvus):
     """Modified Milvus VectorDB Client."""
 
-    def __init__(self, rerank_docs: int = 5, **kwargs):
+    def __init__(  # noqa: PLR0913
+        self,
+        rerank_docs: int = 5,
+        embedding_cache: EmbeddingCache | None = None,
+        result_cache: SemanticResultCache | None = None,
+        enable_hybrid_search: bool = False,
+        *,
+        index_profile: IndexProfile | None = None,
+        vector_dtype: VectorDtype = "float32",
+        **kwargs,
+    ):
         """Mod milvus vector database."""
-        super().__init__(**kwargs)
-        self.rerank_docs: int = rerank_docs
-        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-        self.session = InferenceSession(ONNX_PATH)
+        super().__init__(
+            rerank_docs=rerank_docs,
+            embedding_cache=embedding_cache,
+            result_cache=result_cache,
+            **kwargs,
+        )
+        self.index_profile: IndexProfile = index_profile or IndexProfile()
+        self.enable_hybrid_search: bool = enable_hybrid_search
+        self.vector_dtype: VectorDtype = vector_dtype
+        self._field_names: set[str] | None = None
+        # Dimensions and dtype of the collection's vector field
+        self._vector_field: tuple[int, VectorDtype] | None = None
+        self._async_client_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    @override
+    def async_client(self) -> AsyncMilvusClient:
+        """Async client of the running event loop.
+
+        Its gRPC channel is bound to the loop it was opened on, and training
+        tasks insert from a new loop per source.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = AsyncMilvusClient(
+                uri=self.uri, token=self.token, **self.kwargs
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    @override
+    def create(self) -> None:
+        """Create the collection with the knowledge base schema if missing."""
+        if self.client.has_collection(self.collection):
+            logger.debug(f"[{self.collection}] Collection already exists")
+            return
+
+        self.client.create_collection(
+            collection_name=self.collection,
+            schema=build_collection_schema(
+                self.client,
+                self.embedder.dimensions,
+                self.enable_hybrid_search,
+                self.vector_dtype,
+            ),
+            index_params=build_index_params(
+                self.client, self.enable_hybrid_search, self.index_profile
+            ),
+            num_partitions=VECTOR_DB_NUM_PARTITIONS,
+            consistency_level=self.index_profile.consistency_level,
+        )
+        logger.info(
+            f"[{self.collection}] Created collection {self.enable_hybrid_search=} "
+            f"index={self.index_profile.index_type} "
+            f"vector={self.embedder.dimensions}x{self.vector_dtype}"
+        )
+
+    @property
+    def dense_search_params(self) -> dict[str, Any]:
+        """Dense search parameters of the collection's index profile."""
+        return {"metric_type": METRIC_TYPE, "params": self.index_profile.search_params}
+
+    def _set_field_names(self, description: dict[str, Any]) -> set[str]:
+        """Cache the field names and vector field of a collection description."""
+        self._field_names = {field["name"] for field in description["fields"]}
+        self._vector_field = get_vector_field(description["fields"])
+
+        for field in (SPARSE_FIELD, ACCOUNT_ID_FIELD, *SCALAR_FIELDS):
+            if field not in self._field_names:
+                logger.warning(
+                    f"[{self.collection}] No '{field}' field, "
+                    "run the collection migration to enable it"
+                )
+
+        return self._field_names
+
+    async def get_field_names(self) -> set[str]:
+        """Get the field names of the collection schema, described once."""
+        if self._field_names is None:
+            return self._set_field_names(
+                await self.async_client.describe_collection(self.collection)
+            )
+        return self._field_names
+
+    def get_field_names_sync(self) -> set[str]:
+        """Get the field names of the collection schema, described once."""
+        if self._field_names is None:
+            return self._set_field_names(
+                self.client.describe_collection(self.collection)
+            )
+        return self._field_names
+
+    def reset_schema(self) -> None:
+        """Forget the described schema, e.g. after the collection alias moved."""
+        self._field_names = None
+        self._vector_field = None
+
+    def fit_vectors(
+        self, vectors: list[list[float]]
+    ) -> list[list[float]] | list[np.ndarray]:
+        """Fit embeddings to the collection's vector field.
+
+        A collection migrated to fewer dimensions is searched and written with
+        reduced embeddings until the embedding dimensions are lowered as well.
+        """
+        if self._vector_field is None:
+            self.get_field_names_sync()
+        dimensions, dtype = self._vector_field or (
+            self.embedder.dimensions,
+            self.vector_dtype,
+        )
+        return fit_vectors(vectors, dimensions, dtype)
+
+    @property
+    def requires_content_field(self) -> bool:
+        """BM25 sparse vectors are derived from the content field on insert.
+
+        Records keep their content while a hybrid shadow collection is being
+        built, as they are dual-written to it.
+        """
+        if self.enable_hybrid_search:
+            return True
+        state = get_reindex_state(self.collection)
+        return state is not None and state.hybrid
+
+    async def use_hybrid_search(self) -> bool:
+        """Check whether hybrid search is enabled and supported by the collection.
+
+        Collections created before hybrid mode have no sparse field and fall
+        back to dense search.
+        """
+        if not self.enable_hybrid_search:
+            return False
+
+        try:
+            return SPARSE_FIELD in await self.get_field_names()
+        except Exception as e:
+            logger.warning(f"[{self.collection}] Unable to describe: {e}")
+            return False
+
+    async def search_hits(
+        self,
+        query: str,
+        query_embedding: list[float],
+        limit: int,
+        filters: dict[str, Any] | None = None,
+        hybrid: bool = False,
+    ) -> list[dict]:
+        """Run a dense or hybrid (dense + BM25) search and return the raw hits.
+
+        A failed search is retried once with the schema described again, as a
+        reindex may have swapped the alias to a collection with another schema.
+        """
+        try:
+            return await self._search_hits(
+                query, query_embedding, limit, filters, hybrid
+            )
+        except MilvusException as e:
+            logger.warning(f"[{self.collection}] Search failed, re-describing: {e}")
+            self.reset_schema()
+            return await self._search_hits(
+                query, query_embedding, limit, filters, hybrid
+            )
+
+    async def _search_hits(
+        self,
+        query: str,
+        query_embedding: list[float],
+        limit: int,
+        filters: dict[str, Any] | None,
+        hybrid: bool,
+    ) -> list[dict]:
+        """Run a dense or hybrid (dense + BM25) search."""
+        expr = await self.build_search_expr(filters)
+
+        if not hybrid:
+            results = await self.async_client.search(
+                collection_name=self.collection,
+                data=self.fit_vectors([query_embedding]),
+                filter=expr,
+                output_fields=self.output_fields,
+                limit=limit,
+                search_params=self.dense_search_params,
+                consistency_level=self.index_profile.consistency_level,
+            )
+            return results[0]
+
+        # Fuse dense and BM25 rankings with reciprocal-rank fusion
+        dense_request = AnnSearchRequest(
+            data=self.fit_vectors([query_embedding]),
+            anns_field=VECTOR_FIELD,
+            param=self.dense_search_params,
+            limit=limit,
+            expr=expr,
+        )
+        sparse_request = AnnSearchRequest(
+            data=[query],
+            anns_field=SPARSE_FIELD,
+            param={"drop_ratio_search": HYBRID_SPARSE_DROP_RATIO},
+            limit=limit,
+            expr=expr,
+        )
+        results = await self.async_client.hybrid_search(
+            collection_name=self.collection,
+            reqs=[dense_request, sparse_request],
+            ranker=RRFRanker(HYBRID_RRF_K),
+            limit=limit,
+            output_fields=self.output_fields,
+            consistency_level=self.index_profile.consistency_level,
+        )
+        return results[0]
+
+    async def search_hits_batch(
+        self,
+        query_embeddings: list[list[float]],
+        limit: int,
+        filters: dict[str, Any] | None = None,
+    ) -> list[list[dict]]:
+        """Run a dense search for several query vectors in one request."""
+        try:
+            return await self._search_hits_batch(query_embeddings, limit, filters)
+        except MilvusException as e:
+            logger.warning(f"[{self.collection}] Search failed, re-describing: {e}")
+            self.reset_schema()
+            return await self._search_hits_batch(query_embeddings, limit, filters)
+
+    async def _search_hits_batch(
+        self,
+        query_embeddings: list[list[float]],
+        limit: int,
+        filters: dict[str, Any] | None,
+    ) -> list[list[dict]]:
+        """Run a dense search for several query vectors."""
+        expr = await self.build_search_expr(filters)
+        return await self.async_client.search(
+            collection_name=self.collection,
+            data=self.fit_vectors(query_embeddings),
+            filter=expr,
+            output_fields=self.output_fields,
+            limit=limit,
+            search_params=self.dense_search_params,
+            consistency_level=self.index_profile.consistency_level,
+        )
 
     def find(self, expr: str = "", output_fields: list[str] | None = None):
         """Find documents in the database."""
@@ -57,134 +345,206 @@ class ModMilvus(Milvus):
             response = self.client.delete(
                 collection_name=self.collection, ids=ids, filter=filter_expr
             )
+            record_deletes(self.collection, response["delete_count"])
+            if state := get_reindex_state(self.collection):
+                self._shadow_delete(state, filter_expr)
             return response["delete_count"]
         return 0
 
-    def bulk_insert(self, documents: list[dict[str, Any]]) -> int:
-        """Insert documents into the database."""
-        logger.info(f"Inserting {len(documents)} documents")
-
-        response = self.client.insert(
-            collection_name=self.collection,
-            data=documents,
+    async def async_bulk_delete(
+        self,
+        ids: list | str | int | None = None,
+        filter_expr: str | None = None,
+    ) -> int:
+        """Delete documents from the database using Ids or a filter expression."""
+        response = await self.async_client.delete(
+            collection_name=self.collection, ids=ids, filter=filter_expr
         )
+        await async_record_deletes(self.collection, response["delete_count"])
+        if state := await async_get_reindex_state(self.collection):
+            await self._async_shadow_delete(state, filter_expr)
+        return response["delete_count"]
+
+    def _shadow_batches(
+        self, documents: list[dict[str, Any]], state: ReindexState
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Split documents into insert batches fitted to the shadow collection."""
+        for batch in split_by_bytes(documents, VECTOR_DB_INSERT_MAX_BYTES):
+            vectors = fit_vectors(
+                [doc[VECTOR_FIELD] for doc in batch],
+                state.dimensions,
+                state.vector_dtype,
+            )
+            yield [
+                {**doc, VECTOR_FIELD: vector}
+                for doc, vector in zip(batch, vectors, strict=True)
+            ]
+
+    def _shadow_insert(
+        self, documents: list[dict[str, Any]], state: ReindexState
+    ) -> None:
+        """Dual-write documents to the shadow collection of a reindex.
+
+        Failures are only logged: the reindex job reconciles the shadow with
+        the collection before swapping the alias.
+        """
+        if state.reembed:
+            return
+        try:
+            for batch in self._shadow_batches(documents, state):
+                self.client.insert(collection_name=state.shadow, data=batch)
+        except Exception as e:
+            logger.warning(f"[{self.collection}] Dual-write to {state.shadow}: {e}")
+
+    async def _async_shadow_insert(
+        self, documents: list[dict[str, Any]], state: ReindexState
+    ) -> None:
+        """Dual-write documents to the shadow collection of a reindex."""
+        if state.reembed:
+            return
+        try:
+            for batch in self._shadow_batches(documents, state):
+                await self.async_client.insert(collection_name=state.shadow, data=batch)
+        except Exception as e:
+            logger.warning(f"[{self.collection}] Dual-write to {state.shadow}: {e}")
+
+    def _shadow_delete(self, state: ReindexState, filter_expr: str | None) -> None:
+        """Apply a filtered delete to the shadow collection of a reindex."""
+        if not filter_expr:
+            return
+        try:
+            self.client.delete(collection_name=state.shadow, filter=filter_expr)
+        except Exception as e:
+            logger.warning(f"[{self.collection}] Dual-delete on {state.shadow}: {e}")
+
+    async def _async_shadow_delete(
+        self, state: ReindexState, filter_expr: str | None
+    ) -> None:
+        """Apply a filtered delete to the shadow collection of a reindex."""
+        if not filter_expr:
+            return
+        try:
+            await self.async_client.delete(
+                collection_name=state.shadow, filter=filter_expr
+            )
+        except Exception as e:
+            logger.warning(f"[{self.collection}] Dual-delete on {state.shadow}: {e}")
+
+    def _fit_batch(self, batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Fit the vectors of an insert batch to the collection's vector field."""
+        vectors = self.fit_vectors([doc[VECTOR_FIELD] for doc in batch])
+        return [
+            {**doc, VECTOR_FIELD: vector}
+            for doc, vector in zip(batch, vectors, strict=True)
+        ]
 
+    @retry_on_exception(
+        max_retries=VECTOR_DB_INSERT_MAX_RETRIES,
+        delay_seconds=VECTOR_DB_INSERT_RETRY_DELAY,
+        retry_condition=is_rejected_insert,
+    )
+    def _insert_batch(self, batch: list[dict[str, Any]]) -> int:
+        """Insert one batch, retried when it was rejected or partially inserted."""
+        try:
+            response = self.client.insert(
+                collection_name=self.collection, data=self._fit_batch(batch)
+            )
+        except MilvusException:
+            # Retried with the schema of a possibly swapped collection alias
+            self.reset_schema()
+            raise
+        if response["insert_count"] < len(batch):
+            self.client.delete(collection_name=self.collection, ids=response["ids"])
+            raise PartialInsertError(response["insert_count"], len(batch))
         return response["insert_count"]
 
-    def rerank(self, query: str, documents: list) -> list[RerankResult]:
-        """Rerank documents using the reranker."""
-        if not documents:
-            logger.warning("No documents provided")
-            return []
-
-        docs_to_score = documents[: self.rerank_docs]
-
-        inputs = [f"{query} [SEP] {doc}" for doc in docs_to_score]
-        tokenized = self.tokenizer(
-            inputs, padding=True, truncation=True, return_tensors="np"
-        )
-
-        ort_inputs = dict(tokenized.items())
-        logits = self.session.run(None, ort_inputs)[0].squeeze(-1)
-
-        results = [
-            RerankResult(index=i, score=float(score), document=docs_to_score[i])
-            for i, score in enumerate(logits)
-        ]
+    @retry_on_exception(
+        max_retries=VECTOR_DB_INSERT_MAX_RETRIES,
+        delay_seconds=VECTOR_DB_INSERT_RETRY_DELAY,
+        retry_condition=is_rejected_insert,
+    )
+    async def _async_insert_batch(self, batch: list[dict[str, Any]]) -> int:
+        """Insert one batch, retried when it was rejected or partially inserted."""
+        await self.get_field_names()
+        try:
+            response = await self.async_client.insert(
+                collection_name=self.collection, data=self._fit_batch(batch)
+            )
+        except MilvusException:
+            # Retried with the schema of a possibly swapped collection alias
+            self.reset_schema()
+            raise
+        if response["insert_count"] < len(batch):
+            await self.async_client.delete(
+                collection_name=self.collection, ids=response["ids"]
+            )
+            raise PartialInsertError(response["insert_count"], len(batch))
+        return response["insert_count"]
 
-        # Sort descending by score
-        results.sort(key=lambda x: x.score, reverse=True)
-        return results
+    def _log_insert(self, inserted: int, failed: int) -> None:
+        """Log the outcome of a bulk insert."""
+        if failed:
+            logger.error(
+                f"[{self.collection}] Inserted {inserted} documents, {failed} failed"
+            )
+        else:
+            logger.info(f"[{self.collection}] Inserted {inserted} documents")
 
-    async def basic_search(
-        self, query: str, limit: int = 3, filters: dict[str, Any] | None = None
-    ) -> list[Document]:
-        """Search using vectors.
+    def bulk_insert(self, documents: list[dict[str, Any]]) -> int:
+        """Insert documents into the database in batches bounded by payload size.
 
-        This method is used to search the knowledge base for the given query.
-        query must be present, limit should always be an integer or
-        should not be provided when calling this method.
+        Batches rejected by Milvus or partially inserted are retried. Failed
+        batches, including timed out ones that may have been written, are
+        skipped and logged, and the number of inserted documents is returned.
+        Only inserted batches are dual-written to a reindex shadow collection.
         """
-        logger.debug(f"[{self.collection}] Basic search invoked {query=}")
-        query_embedding = self.embedder.get_embedding(query)
-        if query_embedding is None:
-            logger.error(f"Error getting embedding for Query: {query}")
-            return []
-
-        results = await self.async_client.search(
-            collection_name=self.collection,
-            data=[query_embedding],
-            filter=self._build_expr(filters),
-            output_fields=["id", "keywords", "content", "meta_data"],
-            limit=limit,
-        )
-
-        # Build search results
-        search_results: list[Document] = [
-            Document(
-                id=result["id"],
-                name=result["entity"].get("name", None),
-                meta_data=result["entity"].get("meta_data", {}),
-                content=result["entity"].get("content", ""),
-                usage=result["entity"].get("usage", None),
+        logger.info(f"Inserting {len(documents)} documents")
+        inserted: list[dict[str, Any]] = []
+        failed = 0
+
+        for batch in split_by_bytes(documents, VECTOR_DB_INSERT_MAX_BYTES):
+            start_time = time()
+            try:
+                self._insert_batch(batch)
+            except Exception as e:
+                failed += len(batch)
+                logger.error(f"[{self.collection}] Batch of {len(batch)} failed: {e}")
+                continue
+            inserted.extend(batch)
+            logger.debug(
+                f"[{self.collection}] Inserted batch of {len(batch)} "
+                f"in {time() - start_time:.3f}s"
             )
-            for result in results[0]
-        ]
 
-        return search_results
+        self._log_insert(len(inserted), failed)
+        if inserted and (state := get_reindex_state(self.collection)):
+            self._shadow_insert(inserted, state)
+        return len(inserted)
 
-    async def async_search(
-        self,
-        query: str,
-        user_id: str | None = None,
-        filters: dict[str, Any] | None = None,
-    ) -> list[Document]:
-        """Search synchronously method for agent compatibility.
+    async def async_bulk_insert(self, documents: list[dict[str, Any]]) -> int:
+        """Insert documents asynchronously in batches bounded by payload size.
 
-        This method is used to search the knowledge base for the given query.
-        query must be present. The `filters` parameter is for advanced use and
-        should be ignored. Do not provide the `filters` parameter when you call
-        this tool. An additional process of re-ranking the results is also done.
+        Failed batches are handled as by `bulk_insert`.
         """
-        logger.debug(
-            f"[{self.collection}] Asynchronous search wrapper invoked {query=}"
-        )
-
-        # Get embeddings and search
-        query_embedding = await asyncio.to_thread(self.embedder.get_embedding, query)
-        if query_embedding is None:
-            logger.error(f"Error getting embedding for Query: {query}")
-            return []
-
-        # 2) Raw Milvus search
-        start_time = time()
-        results = await self.async_client.search(
-            collection_name=self.collection,
-            data=[query_embedding],
-            filter=self._build_expr(filters),
-            output_fields=["id", "keywords", "content", "meta_data"],
-            limit=KB_SEARCH_LIMIT,
-        )
-        logger.debug(f"Searched vector db in {time() - start_time} seconds")
-
-        # 3) Rerank
-        start_time = time()
-        raw_entities = [json_dumps(res["entity"]) for res in results[0]]
-        reranked = await asyncio.to_thread(self.rerank, query, raw_entities)
-        reranked = [json_loads(r.document) for r in reranked]  # type: ignore
-        logger.debug("Re-ranked results in %.3fs", time() - start_time)
-
-        # 4) Build Document objects
-        search_results: list[Document] = [
-            Document(
-                id=record["id"],
-                name=record.get("name"),
-                meta_data=record.get("meta_data", {}),
-                content=record.get("content", ""),
-                usage=record.get("usage"),
-            )
-            for record in reranked
-        ]
+        logger.info(f"Inserting {len(documents)} documents")
+        inserted: list[dict[str, Any]] = []
+        failed = 0
+
+        for batch in split_by_bytes(documents, VECTOR_DB_INSERT_MAX_BYTES):
+            start_time = time()
+            try:
+                await self._async_insert_batch(batch)
+            except Exception as e:
+                failed += len(batch)
+                logger.error(f"[{self.collection}] Batch of {len(batch)} failed: {e}")
+                continue
+            inserted.extend(batch)
+            logger.debug(
+                f"[{self.collection}] Inserted batch of {len(batch)} "
+                f"in {time() - start_time:.3f}s"
+            )
 
-        logger.debug(f"[{user_id}] Returning final response")
-        return search_results or []
+        self._log_insert(len(inserted), failed)
+        if inserted and (state := await async_get_reindex_state(self.collection)):
+            await self._async_shadow_insert(inserted, state)
+        return len(inserted)
@@ -0,0 +1,65 @@
+"""Shared state of online collection reindexing.
+
+While a reindex job runs, it publishes the shadow collection being built for
+a collection alias. Writers dual-write chunks and deletes to the shadow, so it
+stays complete until the alias is swapped to it. The state expires unless the
+job keeps refreshing it, so a crashed job stops the dual-writes.
+"""
+
+from pydantic import BaseModel
+
+from app.modules.cache import cache_redis_client, cache_redis_sync_client
+from app.modules.db.vectors import VectorDtype
+from app.utils.logger import logger
+
+REINDEX_STATE_PREFIX: str = "reindex"
+REINDEX_STATE_TTL: int = 300  # Seconds without a heartbeat before it expires
+
+
+class ReindexState(BaseModel):
+    """Shadow collection of a reindex in progress."""
+
+    shadow: str
+    dimensions: int
+    vector_dtype: VectorDtype
+    # Re-embedded shadows are only filled by the job's reconciliation
+    reembed: bool = False
+    # Hybrid shadows derive BM25 vectors from the dual-written content
+    hybrid: bool = False
+
+
+def make_state_key(collection: str) -> str:
+    """Build the Redis key of a collection's reindex state."""
+    return f"{REINDEX_STATE_PREFIX}:{collection}"
+
+
+def set_reindex_state(collection: str, state: ReindexState) -> None:
+    """Publish or refresh the reindex state of a collection."""
+    cache_redis_sync_client.set(
+        make_state_key(collection), state.model_dump_json(), ex=REINDEX_STATE_TTL
+    )
+
+
+def clear_reindex_state(collection: str) -> None:
+    """Stop dual-writes to the shadow collection."""
+    cache_redis_sync_client.delete(make_state_key(collection))
+
+
+def get_reindex_state(collection: str) -> ReindexState | None:
+    """Get the reindex state of a collection, None when not reindexing."""
+    try:
+        payload = cache_redis_sync_client.get(make_state_key(collection))
+    except Exception as e:
+        logger.warning(f"[{collection}] Unable to read the reindex state: {e}")
+        return None
+    return ReindexState.model_validate_json(payload) if payload else None
+
+
+async def async_get_reindex_state(collection: str) -> ReindexState | None:
+    """Get the reindex state of a collection, None when not reindexing."""
+    try:
+        payload = await cache_redis_client.get(make_state_key(collection))
+    except Exception as e:
+        logger.warning(f"[{collection}] Unable to read the reindex state: {e}")
+        return None
+    return ReindexState.model_validate_json(payload) if payload else None
@@ -0,0 +1,111 @@
+"""Milvus collection schema for knowledge base collections."""
+
+from pymilvus import DataType, Function, FunctionType, MilvusClient
+from pymilvus.milvus_client.index import IndexParams
+
+from app.config import IndexProfile
+from app.modules.db.vectors import VectorDtype
+
+VECTOR_FIELD: str = "vector"
+SPARSE_FIELD: str = "sparse"
+CONTENT_FIELD: str = "content"
+METADATA_FIELD: str = "meta_data"
+ACCOUNT_ID_FIELD: str = "account_id"
+SOURCE_ID_FIELD: str = "source_id"
+CHUNK_INDEX_FIELD: str = "chunk_index"
+CONTENT_MAX_LENGTH: int = 65_535
+ACCOUNT_ID_MAX_LENGTH: int = 64
+SOURCE_ID_MAX_LENGTH: int = 64
+
+# Metadata keys promoted to indexed scalar fields
+SCALAR_FIELDS: tuple[str, ...] = (SOURCE_ID_FIELD, CHUNK_INDEX_FIELD)
+METRIC_TYPE: str = "COSINE"
+
+VECTOR_DATA_TYPES: dict[VectorDtype, DataType] = {
+    "float32": DataType.FLOAT_VECTOR,
+    "float16": DataType.FLOAT16_VECTOR,
+}
+
+# Fields returned by knowledge base searches
+OUTPUT_FIELDS: list[str] = ["id", "keywords", CONTENT_FIELD, METADATA_FIELD]
+
+
+def build_collection_schema(
+    client: MilvusClient,
+    dimensions: int,
+    hybrid: bool,
+    vector_dtype: VectorDtype = "float32",
+):
+    """Build the schema of a knowledge base collection.
+
+    With `hybrid` enabled, the content field is analyzed and Milvus derives a
+    BM25 sparse vector from it on insert, so no client-side encoding is needed.
+    `account_id` is the partition key, so account-scoped searches only scan
+    the partitions holding that account's entities. `source_id` and
+    `chunk_index` are copied out of the metadata into indexed scalar fields.
+    Float16 vectors halve the memory of the vector field and its index.
+    """
+    schema = client.create_schema(auto_id=True, enable_dynamic_field=True)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field(VECTOR_FIELD, VECTOR_DATA_TYPES[vector_dtype], dim=dimensions)
+    schema.add_field(
+        CONTENT_FIELD,
+        DataType.VARCHAR,
+        max_length=CONTENT_MAX_LENGTH,
+        enable_analyzer=hybrid,
+    )
+    schema.add_field(METADATA_FIELD, DataType.JSON)
+    schema.add_field(
+        ACCOUNT_ID_FIELD,
+        DataType.VARCHAR,
+        max_length=ACCOUNT_ID_MAX_LENGTH,
+        is_partition_key=True,
+    )
+    schema.add_field(SOURCE_ID_FIELD, DataType.VARCHAR, max_length=SOURCE_ID_MAX_LENGTH)
+    schema.add_field(CHUNK_INDEX_FIELD, DataType.INT64)
+
+    if hybrid:
+        schema.add_field(SPARSE_FIELD, DataType.SPARSE_FLOAT_VECTOR)
+        schema.add_function(
+            Function(
+                name=f"{CONTENT_FIELD}_bm25",
+                function_type=FunctionType.BM25,
+                input_field_names=[CONTENT_FIELD],
+                output_field_names=[SPARSE_FIELD],
+            )
+        )
+
+    return schema
+
+
+def get_vector_field(fields: list[dict]) -> tuple[int, VectorDtype]:
+    """Get the dimensions and dtype of the vector field of a collection description."""
+    field = next(field for field in fields if field["name"] == VECTOR_FIELD)
+    dtype = "float16" if field["type"] == VECTOR_DATA_TYPES["float16"] else "float32"
+    return int(field["params"]["dim"]), dtype
+
+
+def build_index_params(
+    client: MilvusClient, hybrid: bool, profile: IndexProfile | None = None
+) -> IndexParams:
+    """Build the index params of a knowledge base collection."""
+    profile = profile or IndexProfile()
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name=VECTOR_FIELD,
+        index_type=profile.index_type,
+        metric_type=METRIC_TYPE,
+        params=profile.params,
+    )
+    # Deletes and source-scoped searches become index lookups, not JSON scans
+    for field_name in SCALAR_FIELDS:
+        index_params.add_index(field_name=field_name, index_type="INVERTED")
+
+    if hybrid:
+        index_params.add_index(
+            field_name=SPARSE_FIELD,
+            index_type="SPARSE_INVERTED_INDEX",
+            metric_type="BM25",
+        )
+
+    return index_params
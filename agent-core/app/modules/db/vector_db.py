@@ -1,73 +1,306 @@
 """Training VectorDB Module."""
 
+import asyncio
+from collections.abc import Iterable
+
 from app.common.enums import KnowledgeType, SupportedTrainingExtensions
+from app.modules.cache.result_cache import invalidate_cached_results
 from app.modules.core.knowledge_bases import text_knowledge_base, video_knowledge_base
 from app.modules.data.embeddings import generate_embedding
 from app.modules.data.models import DocMetadata
-from app.modules.db.mod_milvus import ModMilvus
+from app.modules.db.document_index import (
+    DocumentKey,
+    DocumentSummaryBuilder,
+    get_document_key,
+)
+from app.modules.db.knowledge_search import KnowledgeVectorDb
+from app.modules.db.schema import (
+    ACCOUNT_ID_FIELD,
+    CHUNK_INDEX_FIELD,
+    METADATA_FIELD,
+    SOURCE_ID_FIELD,
+    VECTOR_FIELD,
+)
+from app.modules.db.vectors import decode_vector
 from app.utils.logger import logger
 
+CHUNK_FILTER_BATCH_SIZE: int = 1000  # Chunk indexes per filter expression
 
-def insert_chunks(
-    documents: list[dict],
-    knowledge_type: KnowledgeType = KnowledgeType.TEXT,
-):
-    """Insert a processed chunks into VectorDB."""
-    try:
-        knowledge_collection: dict[KnowledgeType, ModMilvus] = {
-            KnowledgeType.TEXT: text_knowledge_base.vector_db,
-            KnowledgeType.MEDIA: video_knowledge_base.vector_db,
-        }
 
-        collection: ModMilvus = knowledge_collection[knowledge_type]
+def get_knowledge_collection(knowledge_type: KnowledgeType) -> KnowledgeVectorDb:
+    """Get the collection storing a knowledge type."""
+    knowledge_collection: dict[KnowledgeType, KnowledgeVectorDb] = {
+        KnowledgeType.TEXT: text_knowledge_base.vector_db,
+        KnowledgeType.MEDIA: video_knowledge_base.vector_db,
+    }
+    return knowledge_collection[knowledge_type]
+
 
-        if collection:
-            insert_count: int = collection.bulk_insert(documents)
+async def async_insert_chunks(
+    documents: list[dict],
+    knowledge_type: KnowledgeType = KnowledgeType.TEXT,
+) -> bool:
+    """Insert a processed chunks into VectorDB without blocking.
 
+    Returns False when some chunks could not be inserted.
+    """
+    insert_count: int = 0
+    try:
+        collection: KnowledgeVectorDb = get_knowledge_collection(knowledge_type)
+        insert_count = await collection.async_bulk_insert(
+            await asyncio.to_thread(collection.offload_content, documents)
+        )
         logger.info(f"Inserted {insert_count} documents successfully.")
     except Exception as e:
         logger.error(f"Error inserting chunk: {e}")
 
+    # Cached results of re-trained sources are now stale, even when partly
+    await asyncio.to_thread(
+        invalidate_cached_results,
+        {doc["meta_data"].get("source_id") for doc in documents} - {None},
+    )
+    return insert_count == len(documents)
+
 
-def add_chunks_to_vector_db(
+def embed_chunks(
     chunked_texts: list[str],
     metadatas: list[DocMetadata] | list[dict],
+    knowledge_type: KnowledgeType,
+    account_id: str,
+) -> list[dict]:
+    """Embed chunks into the records inserted in vector db.
+
+    Chunks are stored under the account's partition key, so they are only
+    searchable by that account. `EmbeddingError` is raised when some chunks
+    cannot be embedded.
+    """
+    # Get embeddings for all chunks, with concurrent requests
+    embeddings: list[list[float]] = generate_embedding(
+        chunked_texts, get_knowledge_collection(knowledge_type).embedder
+    )
+
+    return [
+        {
+            "vector": embedding,
+            "meta_data": metadata.__dict__,
+            "content": chunked_text,
+            ACCOUNT_ID_FIELD: account_id,
+            SOURCE_ID_FIELD: metadata.source_id,
+            CHUNK_INDEX_FIELD: metadata.chunk_index,
+        }
+        for embedding, chunked_text, metadata in zip(
+            embeddings, chunked_texts, metadatas, strict=True
+        )
+    ]
+
+
+async def async_add_chunks_to_vector_db(
+    chunk_batches: Iterable[tuple[list[str], list[DocMetadata]]],
     file_type: SupportedTrainingExtensions,
     file_name: str,
     knowledge_type: KnowledgeType,
-):
-    """Add chunks in vector db. For chunks whose header level is present."""
-    # Get embeddings for all chunks
-    embeddings: list[list[float]] = generate_embedding(chunked_texts)
+    account_id: str,
+) -> tuple[list[dict], bool]:
+    """Add batches of chunks in vector db. For chunks whose header level is present.
 
-    insert_chunks(
-        [
-            {
-                "vector": embedding,
-                "meta_data": metadata.__dict__,
-                "content": chunked_text,
-            }
-            for embedding, chunked_text, metadata in zip(
-                embeddings, chunked_texts, metadatas, strict=False
+    Each batch is inserted while the next one is embedded. Returns the embedded
+    chunk records, and False when some of them could not be inserted. Batches
+    are not inserted past one whose chunks cannot be embedded, `EmbeddingError`
+    is raised.
+    """
+    chunks: list[dict] = []
+    inserted: bool = True
+    insert: asyncio.Task | None = None
+    try:
+        for batch_texts, batch_metadatas in chunk_batches:
+            batch_chunks: list[dict] = await asyncio.to_thread(
+                embed_chunks, batch_texts, batch_metadatas, knowledge_type, account_id
             )
-        ],
-        knowledge_type,
+            if insert is not None:
+                inserted &= await insert
+            insert = asyncio.create_task(
+                async_insert_chunks(batch_chunks, knowledge_type)
+            )
+            chunks.extend(batch_chunks)
+        if insert is not None:
+            inserted &= await insert
+    finally:
+        # Let the insert in flight finish when embedding the next batch failed
+        if insert is not None and not insert.done():
+            await asyncio.wait([insert])
+
+    if inserted:
+        logger.info(
+            f"Successfully added '{file_name} | {file_type.value}' to vector DB"
+        )
+    else:
+        logger.error(f"Some chunks of '{file_name} | {file_type.value}' not added")
+    return chunks, inserted
+
+
+def add_document_summaries(
+    summaries: DocumentSummaryBuilder, knowledge_type: KnowledgeType
+) -> bool:
+    """Insert the summary vectors of trained documents into the document index.
+
+    Returns False when the summaries could not be inserted.
+    """
+    collection: KnowledgeVectorDb = get_knowledge_collection(knowledge_type)
+    if collection.document_index is None:
+        return True
+
+    documents: list[dict] = summaries.build()
+    if not documents:
+        return True
+
+    try:
+        insert_count: int = collection.document_index.bulk_insert(documents)
+        logger.info(f"Inserted {insert_count} document summaries successfully.")
+    except Exception as e:
+        # Rebuild with `run:build-document-index`
+        logger.error(f"Error inserting document summaries: {e}")
+        return False
+    return True
+
+
+def build_chunk_exprs(
+    collection: KnowledgeVectorDb, source_id: str, chunk_indexes: list[int]
+) -> list[str]:
+    """Build the filter expressions matching chunks of a source by chunk index."""
+    field_names: set[str] = collection.get_field_names_sync()
+    return [
+        collection.build_filter_expr(
+            {
+                SOURCE_ID_FIELD: source_id,
+                CHUNK_INDEX_FIELD: chunk_indexes[
+                    start : start + CHUNK_FILTER_BATCH_SIZE
+                ],
+            },
+            field_names,
+        )
+        or ""
+        for start in range(0, len(chunk_indexes), CHUNK_FILTER_BATCH_SIZE)
+    ]
+
+
+def get_stored_chunks(
+    source_id: str, knowledge_type: KnowledgeType
+) -> list[dict] | None:
+    """Get the metadata and chunk indexes of the stored chunks of a source.
+
+    Returns None for collections without the `chunk_index` field, which can
+    not remove chunks of a source selectively.
+    """
+    collection: KnowledgeVectorDb = get_knowledge_collection(knowledge_type)
+    if CHUNK_INDEX_FIELD not in collection.get_field_names_sync():
+        return None
+
+    return collection.find(
+        collection.build_source_expr(source_id),
+        output_fields=[METADATA_FIELD, SOURCE_ID_FIELD, CHUNK_INDEX_FIELD],
     )
-    logger.info(f"Successfully added '{file_name} | {file_type.value}' to vector DB")
 
 
-def remove_knowledge(source_id: str) -> None:
-    """Remove knowledge from the VectorDB for given source_id."""
-    text_collection: ModMilvus = text_knowledge_base.vector_db
-    text_deleted_count: int = text_collection.bulk_delete(
-        filter_expr=f'meta_data["source_id"] == "{source_id}"'
+def remove_chunks(
+    source_id: str, chunk_indexes: list[int], knowledge_type: KnowledgeType
+) -> None:
+    """Remove chunks of a source by chunk index."""
+    collection: KnowledgeVectorDb = get_knowledge_collection(knowledge_type)
+    deleted_count: int = sum(
+        collection.bulk_delete(filter_expr=expr)
+        for expr in build_chunk_exprs(collection, source_id, chunk_indexes)
     )
 
-    logger.info(f"Knowledge Deleted [Text], Total - {text_deleted_count}")
+    if collection.content_store is not None:
+        collection.content_store.delete_chunks(source_id, chunk_indexes)
+
+    logger.info(f"Removed {deleted_count} chunks of source {source_id}")
+    invalidate_cached_results([source_id])
+
 
-    video_collection: ModMilvus = video_knowledge_base.vector_db
-    video_deleted_count: int = video_collection.bulk_delete(
-        filter_expr=f'meta_data["source_id"] == "{source_id}"'
+def replace_document_summaries(
+    summaries: DocumentSummaryBuilder,
+    knowledge_type: KnowledgeType,
+    *,
+    source_id: str,
+    documents: set[DocumentKey],
+    kept_indexes: list[int],
+) -> None:
+    """Replace the summary vectors of the changed documents of a source.
+
+    `summaries` holds the inserted chunks of the documents, the vectors of
+    their unchanged chunks (`kept_indexes`) are read from the collection.
+    """
+    collection: KnowledgeVectorDb = get_knowledge_collection(knowledge_type)
+    document_index: KnowledgeVectorDb | None = collection.document_index
+    if document_index is None:
+        return
+
+    output_fields: list[str] = [
+        VECTOR_FIELD,
+        METADATA_FIELD,
+        ACCOUNT_ID_FIELD,
+        SOURCE_ID_FIELD,
+        CHUNK_INDEX_FIELD,
+    ]
+    kept_chunks: list[dict] = [
+        chunk
+        for expr in build_chunk_exprs(collection, source_id, kept_indexes)
+        for chunk in collection.find(expr, output_fields)
+    ]
+    summaries.add(
+        [
+            {**chunk, VECTOR_FIELD: decode_vector(chunk[VECTOR_FIELD])}
+            for chunk in kept_chunks
+        ]
     )
 
+    # Replaced summaries are deleted by id, new summaries may share their index
+    replaced_ids: list = [
+        record["id"]
+        for record in document_index.find(
+            document_index.build_source_expr(source_id),
+            output_fields=[METADATA_FIELD, SOURCE_ID_FIELD],
+        )
+        if get_document_key(record) in documents
+    ]
+    if add_document_summaries(summaries, knowledge_type) and replaced_ids:
+        document_index.bulk_delete(ids=replaced_ids)
+
+
+async def async_remove_knowledge(source_id: str) -> None:
+    """Remove knowledge from the VectorDB for given source_id without blocking.
+
+    Both collections are deleted from concurrently.
+    """
+    text_collection: KnowledgeVectorDb = text_knowledge_base.vector_db
+    video_collection: KnowledgeVectorDb = video_knowledge_base.vector_db
+
+    text_deleted_count, video_deleted_count = await asyncio.gather(
+        text_collection.async_bulk_delete(
+            filter_expr=await text_collection.async_build_source_expr(source_id)
+        ),
+        video_collection.async_bulk_delete(
+            filter_expr=await video_collection.async_build_source_expr(source_id)
+        ),
+    )
+
+    logger.info(f"Knowledge Deleted [Text], Total - {text_deleted_count}")
     logger.info(f"Knowledge Deleted [Video], Total - {video_deleted_count}")
+
+    document_deletes = [
+        document_index.async_bulk_delete(
+            filter_expr=await document_index.async_build_source_expr(source_id)
+        )
+        for collection in (text_collection, video_collection)
+        if (document_index := collection.document_index) is not None
+    ]
+    await asyncio.gather(
+        *(
+            collection.content_store.async_delete_source(source_id)
+            for collection in (text_collection, video_collection)
+            if collection.content_store is not None
+        ),
+        *document_deletes,
+    )
+    await asyncio.to_thread(invalidate_cached_results, [source_id])
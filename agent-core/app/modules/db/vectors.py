@@ -0,0 +1,50 @@
+"""Vector field encoding for reduced dimensions and float16 storage."""
+
+from typing import Literal
+
+import numpy as np
+
+VectorDtype = Literal["float32", "float16"]
+
+
+def reduce_dimensions(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Truncate embeddings to their first `dimensions` values and re-normalize.
+
+    Gemini embeddings are Matryoshka-trained, so the prefix of an embedding is
+    the embedding the model returns for a lower `output_dimensionality`.
+    """
+    reduced = np.asarray(vectors, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.maximum(norms, 1e-12)
+
+
+def fit_vectors(
+    vectors: list[list[float]] | np.ndarray, dimensions: int, dtype: VectorDtype
+) -> list[list[float]] | list[np.ndarray]:
+    """Fit embeddings to a vector field of `dimensions` and `dtype`.
+
+    Larger embeddings are reduced. Float16 fields take numpy float16 rows.
+    """
+    array = np.asarray(vectors, dtype=np.float32)
+    if array.shape[1] < dimensions:
+        raise ValueError(
+            f"Embeddings of {array.shape[1]} dimensions do not fit a vector field "
+            f"of {dimensions}, migrate the collection first"
+        )
+    if array.shape[1] > dimensions:
+        array = reduce_dimensions(array, dimensions)
+    elif isinstance(vectors, list) and dtype == "float32":
+        return vectors
+
+    if dtype == "float16":
+        return list(array.astype(np.float16))
+    return array.tolist()
+
+
+def decode_vector(value: list[float] | bytes | np.ndarray) -> np.ndarray:
+    """Decode a vector read from Milvus, float16 vectors are returned as bytes."""
+    if isinstance(value, list) and value and isinstance(value[0], bytes):
+        value = value[0]
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.float16).astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
@@ -0,0 +1 @@
+"""Embedder Module."""
@@ -0,0 +1,21 @@
+"""Batch embedding interface shared by the embedder backends."""
+
+from abc import ABC, abstractmethod
+
+
+class BatchEmbedder(ABC):
+    """Embedder with batched document and query embedding.
+
+    Backends are also agno embedders: `get_embedding` embeds a single query.
+    """
+
+    id: str
+    dimensions: int
+
+    @abstractmethod
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed chunk texts for storage, in order."""
+
+    @abstractmethod
+    async def async_embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embed search queries, in order."""
@@ -0,0 +1,43 @@
+"""Cross-request coalescing of query embeddings.
+
+Search queries submitted by concurrent requests within a short window are
+sent to the embedding model as one batch, and the embeddings are fanned back
+to each caller. Batches are sent concurrently, so a slow embedding request
+does not hold back the queries arriving after it.
+"""
+
+from collections.abc import Awaitable, Callable
+
+from app.utils.micro_batcher import MicroBatcher
+
+EmbedFn = Callable[[list[str]], Awaitable[list[list[float]]]]
+
+
+class EmbeddingBatcher(MicroBatcher[str, list[float]]):
+    """Async queue that coalesces query embedding requests into batches."""
+
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        max_batch_size: int = 100,
+        max_wait_ms: float = 5.0,
+    ):
+        """Embedding batcher constructor."""
+        super().__init__(
+            self._embed_distinct,
+            name="Embedder",
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            concurrent=True,
+        )
+        self.embed_fn: EmbedFn = embed_fn
+
+    async def _embed_distinct(self, texts: list[str]) -> list[list[float]]:
+        """Embed the distinct queries of a batch."""
+        distinct = list(dict.fromkeys(texts))
+        embeddings = dict(zip(distinct, await self.embed_fn(distinct), strict=True))
+        return [embeddings[text] for text in texts]
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed search queries, batched with concurrent callers."""
+        return await self.submit(texts)
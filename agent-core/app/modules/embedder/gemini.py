@@ -0,0 +1,33 @@
+"""Gemini embedding backend."""
+
+from dataclasses import dataclass
+
+from agno.embedder.google import GeminiEmbedder
+
+from app.modules.embedder.base import BatchEmbedder
+
+
+@dataclass
+class BatchGeminiEmbedder(GeminiEmbedder, BatchEmbedder):
+    """Gemini embedder sending a batch of texts per request."""
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed chunk texts with a single request."""
+        response = self.client.models.embed_content(
+            contents=texts,
+            model=self.id,
+            config={"output_dimensionality": self.dimensions},
+        )
+        return [emb.values or [] for emb in response.embeddings or []]
+
+    async def async_embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embed search queries with a single request."""
+        response = await self.client.aio.models.embed_content(
+            model=self.id,
+            contents=texts,
+            config={
+                "output_dimensionality": self.dimensions,
+                "task_type": self.task_type,
+            },
+        )
+        return [emb.values or [] for emb in response.embeddings or []]
@@ -0,0 +1,142 @@
+"""Local ONNX sentence-embedding backend.
+
+A quantized sentence-embedding model runs in process with ONNX Runtime, so
+queries are embedded in milliseconds on CPU and training is not rate limited.
+The model is loaded on first use. Inference runs on a bounded thread pool, in
+length-sorted batches that keep padding low.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Literal
+
+import numpy as np
+from agno.embedder.base import Embedder
+from onnxruntime import GraphOptimizationLevel, InferenceSession, SessionOptions
+from transformers import AutoTokenizer
+
+from app.config import settings
+from app.modules.embedder.base import BatchEmbedder
+from app.utils.logger import logger
+
+ONNX_EMBEDDING_THREADS: int = settings.ONNX_EMBEDDING_THREADS
+ONNX_EMBEDDING_INTRA_OP_THREADS: int = settings.ONNX_EMBEDDING_INTRA_OP_THREADS
+
+Pooling = Literal["cls", "mean"]
+
+# Inference requests of all ONNX embedders share the pool
+onnx_embedding_executor = ThreadPoolExecutor(
+    max_workers=ONNX_EMBEDDING_THREADS, thread_name_prefix="onnx-embedding"
+)
+
+
+def pool_embeddings(
+    outputs: np.ndarray, attention_mask: np.ndarray, pooling: Pooling
+) -> np.ndarray:
+    """Pool token embeddings into normalized sentence embeddings.
+
+    Models exported with their pooling layer already return one vector per
+    sentence.
+    """
+    if outputs.ndim == 3:  # noqa: PLR2004
+        if pooling == "cls":
+            outputs = outputs[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(np.float32)
+            outputs = (outputs * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    norms = np.linalg.norm(outputs, axis=1, keepdims=True)
+    return outputs / np.maximum(norms, 1e-12)
+
+
+@dataclass
+class OnnxEmbedder(Embedder, BatchEmbedder):
+    """Sentence embedder running a local ONNX model."""
+
+    id: str = "BAAI/bge-small-en-v1.5"
+    onnx_path: str = "./models/bge-small-en-v1.5.quant.onnx"
+    dimensions: int = 384
+    pooling: Pooling = "cls"
+    max_tokens: int = 512
+    batch_size: int = 32
+    query_prefix: str = ""
+
+    _tokenizer: Any = field(default=None, init=False, repr=False)
+    _session: InferenceSession | None = field(default=None, init=False, repr=False)
+    _lock: Lock = field(default_factory=Lock, init=False, repr=False)
+
+    def load(self) -> InferenceSession:
+        """Load the tokenizer and ONNX session once."""
+        with self._lock:
+            if self._session is None:
+                options = SessionOptions()
+                # 0 keeps the ONNX Runtime default (one thread per physical core)
+                options.intra_op_num_threads = ONNX_EMBEDDING_INTRA_OP_THREADS
+                options.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+                self._tokenizer = AutoTokenizer.from_pretrained(self.id)
+                self._session = InferenceSession(
+                    self.onnx_path,
+                    sess_options=options,
+                    providers=["CPUExecutionProvider"],
+                )
+                logger.info(f"[Embedder] Loaded '{self.onnx_path}' for {self.id}")
+        return self._session
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        """Run one inference batch."""
+        session = self.load()
+        inputs = self._tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_tokens,
+            return_tensors="np",
+        )
+        ort_inputs = {
+            i.name: inputs[i.name].astype(np.int64) for i in session.get_inputs()
+        }
+        outputs = session.run(None, ort_inputs)[0]
+        embeddings = pool_embeddings(outputs, inputs["attention_mask"], self.pooling)
+        if embeddings.shape[1] != self.dimensions:
+            raise ValueError(
+                f"{self.id} returns {embeddings.shape[1]} dimensions, "
+                f"not {self.dimensions}"
+            )
+        return embeddings
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts in batches of similar length, in order."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings: list[list[float]] = [[] for _ in texts]
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            vectors = self._embed_batch([texts[i] for i in batch])
+            for i, vector in zip(batch, vectors.tolist(), strict=True):
+                embeddings[i] = vector
+        return embeddings
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed chunk texts for storage, in order."""
+        return self.embed(texts)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embed search queries with the model's query prefix, in order."""
+        return self.embed([f"{self.query_prefix}{text}" for text in texts])
+
+    async def async_embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embed search queries on the inference pool."""
+        return await asyncio.get_running_loop().run_in_executor(
+            onnx_embedding_executor, self.embed_queries, texts
+        )
+
+    def get_embedding(self, text: str) -> list[float]:
+        """Embed a search query."""
+        return self.embed_queries([text])[0]
+
+    def get_embedding_and_usage(
+        self, text: str
+    ) -> tuple[list[float], dict[str, Any] | None]:
+        """Embed a search query, local models report no usage."""
+        return self.get_embedding(text), None
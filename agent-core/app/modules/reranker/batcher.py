@@ -0,0 +1,43 @@
+"""Cross-request micro-batching for the reranker.
+
+(query, document) pairs submitted by concurrent requests within a short
+window are coalesced into one inference batch, and the scores are fanned
+back to each caller.
+"""
+
+import asyncio
+from collections.abc import Callable
+
+from app.modules.reranker.pipeline import RerankPair
+from app.utils.micro_batcher import MicroBatcher
+
+ScoreFn = Callable[[list[RerankPair]], list[float]]
+
+
+class RerankBatcher(MicroBatcher[RerankPair, float]):
+    """Async queue that coalesces rerank requests into padded batches.
+
+    Batches are scored one at a time in a worker thread.
+    """
+
+    def __init__(
+        self,
+        score_fn: ScoreFn,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 3.0,
+    ):
+        """Rerank batcher constructor."""
+        super().__init__(
+            self._score_batch,
+            name="Reranker",
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+        )
+        self.score_fn: ScoreFn = score_fn
+
+    async def _score_batch(self, pairs: list[RerankPair]) -> list[float]:
+        return await asyncio.to_thread(self.score_fn, pairs)
+
+    async def score(self, pairs: list[RerankPair]) -> list[float]:
+        """Score (query, document) pairs, batched with concurrent callers."""
+        return await self.submit(pairs)
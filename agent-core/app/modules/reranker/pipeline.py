@@ -0,0 +1,170 @@
+"""Token-budgeted, length-bucketed input pipeline for the reranker.
+
+Queries and documents are tokenized separately and joined as a proper
+tokenizer pair. Documents are truncated to the remaining token budget, and
+pairs are sorted by length into buckets that are padded independently so a
+single long chunk does not inflate the cost of every row.
+"""
+
+from collections import OrderedDict
+from collections.abc import Iterator
+from threading import Lock
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from app.config import settings
+
+RERANK_MAX_TOKENS: int = settings.RERANK_MAX_TOKENS
+RERANK_MAX_QUERY_TOKENS: int = settings.RERANK_MAX_QUERY_TOKENS
+RERANK_BUCKET_SIZE: int = settings.RERANK_BUCKET_SIZE
+RERANK_TOKEN_CACHE_SIZE: int = settings.RERANK_TOKEN_CACHE_SIZE
+
+
+class RerankPair(NamedTuple):
+    """A query and the document content to score against it.
+
+    `chunk_id` identifies immutable chunk content so its token ids can be
+    reused across searches.
+    """
+
+    query: str
+    content: str
+    chunk_id: str | None = None
+
+
+class ChunkTokenCache:
+    """Bounded LRU of chunk token ids keyed by chunk id."""
+
+    def __init__(self, max_items: int = RERANK_TOKEN_CACHE_SIZE):
+        """Chunk token cache constructor."""
+        self.max_items: int = max_items
+        self._items: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, chunk_id: str) -> list[int] | None:
+        """Get cached token ids for a chunk."""
+        with self._lock:
+            ids = self._items.get(chunk_id)
+            if ids is None:
+                return None
+            self._items.move_to_end(chunk_id)
+            return ids.tolist()
+
+    def set(self, chunk_id: str, ids: list[int]) -> None:
+        """Cache token ids for a chunk, evicting the least recently used."""
+        with self._lock:
+            self._items[chunk_id] = np.asarray(ids, dtype=np.int32)
+            self._items.move_to_end(chunk_id)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+class RerankInputPipeline:
+    """Builds padded ONNX input batches from (query, content) pairs."""
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        max_tokens: int = RERANK_MAX_TOKENS,
+        max_query_tokens: int = RERANK_MAX_QUERY_TOKENS,
+        bucket_size: int = RERANK_BUCKET_SIZE,
+        token_cache: ChunkTokenCache | None = None,
+    ):
+        """Rerank input pipeline constructor."""
+        self.tokenizer = tokenizer
+        self.token_cache: ChunkTokenCache | None = token_cache
+        self.max_tokens: int = max_tokens
+        self.max_query_tokens: int = max_query_tokens
+        self.bucket_size: int = bucket_size
+        self.num_special_tokens: int = tokenizer.num_special_tokens_to_add(pair=True)
+        self.pad_token_id: int = tokenizer.pad_token_id or 0
+
+    def encode_queries(self, queries: list[str]) -> list[list[int]]:
+        """Tokenize queries (without special tokens) within the query budget."""
+        return self.tokenizer(
+            queries,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=self.max_query_tokens,
+        )["input_ids"]
+
+    def encode_documents(self, contents: list[str]) -> list[list[int]]:
+        """Tokenize document contents (without special tokens)."""
+        return self.tokenizer(
+            contents,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=self.max_tokens,
+        )["input_ids"]
+
+    def encode_pair_contents(self, pairs: list[RerankPair]) -> list[list[int]]:
+        """Get content token ids, tokenizing only chunks missing from the cache."""
+        content_ids: list[list[int] | None] = [
+            self.token_cache.get(pair.chunk_id)
+            if self.token_cache is not None and pair.chunk_id is not None
+            else None
+            for pair in pairs
+        ]
+
+        missing: list[int] = [i for i, ids in enumerate(content_ids) if ids is None]
+        if missing:
+            encoded = self.encode_documents([pairs[i].content for i in missing])
+            for i, ids in zip(missing, encoded, strict=True):
+                content_ids[i] = ids
+                if self.token_cache is not None and pairs[i].chunk_id is not None:
+                    self.token_cache.set(pairs[i].chunk_id, ids)
+
+        return content_ids  # type: ignore[return-value]
+
+    def build_pair(
+        self, query_ids: list[int], content_ids: list[int]
+    ) -> tuple[list[int], list[int]]:
+        """Join query and content ids, truncating the content to the budget."""
+        budget = self.max_tokens - self.num_special_tokens - len(query_ids)
+        content_ids = content_ids[: max(budget, 0)]
+        return (
+            self.tokenizer.build_inputs_with_special_tokens(query_ids, content_ids),
+            self.tokenizer.create_token_type_ids_from_sequences(query_ids, content_ids),
+        )
+
+    def encode(self, pairs: list[RerankPair]) -> list[tuple[list[int], list[int]]]:
+        """Encode pairs into (input_ids, token_type_ids), tokenizing each query once."""
+        unique_queries = list(dict.fromkeys(pair.query for pair in pairs))
+        query_ids = dict(
+            zip(unique_queries, self.encode_queries(unique_queries), strict=True)
+        )
+        content_ids = self.encode_pair_contents(pairs)
+
+        return [
+            self.build_pair(query_ids[pair.query], ids)
+            for pair, ids in zip(pairs, content_ids, strict=True)
+        ]
+
+    def buckets(
+        self, encoded: list[tuple[list[int], list[int]]]
+    ) -> Iterator[tuple[list[int], dict[str, np.ndarray]]]:
+        """Yield (original indices, padded model inputs) for each length bucket."""
+        order = sorted(range(len(encoded)), key=lambda i: len(encoded[i][0]))
+
+        for start in range(0, len(order), self.bucket_size):
+            indices = order[start : start + self.bucket_size]
+            seq_len = max(len(encoded[i][0]) for i in indices)
+
+            input_ids = np.full((len(indices), seq_len), self.pad_token_id, np.int64)
+            token_type_ids = np.zeros((len(indices), seq_len), np.int64)
+            attention_mask = np.zeros((len(indices), seq_len), np.int64)
+            for row, i in enumerate(indices):
+                ids, type_ids = encoded[i]
+                input_ids[row, : len(ids)] = ids
+                token_type_ids[row, : len(type_ids)] = type_ids
+                attention_mask[row, : len(ids)] = 1
+
+            yield (
+                indices,
+                {
+                    "input_ids": input_ids,
+                    "attention_mask": attention_mask,
+                    "token_type_ids": token_type_ids,
+                },
+            )
@@ -0,0 +1,88 @@
+"""Adaptive rerank depth policy.
+
+The number of candidates sent to the reranker is chosen from the vector
+scores of the search hits: a decisive lead of the top hit skips or shrinks
+reranking, while flat scores widen it to the full candidate list.
+"""
+
+from dataclasses import dataclass
+
+from opentelemetry import trace as trace_api
+
+from app.config import settings
+from app.utils.logger import logger
+
+RERANK_MIN_DEPTH: int = settings.RERANK_MIN_DEPTH
+RERANK_SKIP_MARGIN: float = settings.RERANK_SKIP_MARGIN
+RERANK_SHRINK_MARGIN: float = settings.RERANK_SHRINK_MARGIN
+RERANK_FLAT_SPREAD: float = settings.RERANK_FLAT_SPREAD
+
+
+@dataclass
+class RerankPlan:
+    """Rerank depth chosen for one query."""
+
+    depth: int
+    reason: str
+    margin: float = 0.0
+    spread: float = 0.0
+
+
+class AdaptiveRerankPolicy:
+    """Chooses the rerank depth from the vector-score distribution."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        default_depth: int,
+        max_depth: int,
+        min_depth: int = RERANK_MIN_DEPTH,
+        skip_margin: float = RERANK_SKIP_MARGIN,
+        shrink_margin: float = RERANK_SHRINK_MARGIN,
+        flat_spread: float = RERANK_FLAT_SPREAD,
+    ):
+        """Adaptive rerank policy constructor."""
+        self.default_depth: int = default_depth
+        self.max_depth: int = max_depth
+        self.min_depth: int = min_depth
+        self.skip_margin: float = skip_margin
+        self.shrink_margin: float = shrink_margin
+        self.flat_spread: float = flat_spread
+
+    def plan(self, vector_scores: list[float]) -> RerankPlan:
+        """Plan the rerank depth for hits sorted by descending vector score."""
+        total = len(vector_scores)
+        if total < 2:  # noqa: PLR2004
+            return RerankPlan(depth=0, reason="single_candidate")
+
+        default_depth = min(self.default_depth, total)
+        margin = vector_scores[0] - vector_scores[1]
+        spread = vector_scores[0] - vector_scores[default_depth - 1]
+
+        if margin >= self.skip_margin:
+            depth, reason = 0, "decisive"
+        elif margin >= self.shrink_margin:
+            depth, reason = min(self.min_depth, total), "clear_lead"
+        elif spread <= self.flat_spread:
+            depth, reason = min(self.max_depth, total), "flat"
+        else:
+            depth, reason = default_depth, "default"
+
+        return RerankPlan(depth=depth, reason=reason, margin=margin, spread=spread)
+
+
+def record_rerank_plan(collection: str, candidates: int, plan: RerankPlan) -> None:
+    """Record the rerank depth chosen for a query on the logs and current span."""
+    logger.info(
+        f"[Rerank] {collection=} {candidates=} depth={plan.depth} "
+        f"reason={plan.reason} margin={plan.margin:.4f} spread={plan.spread:.4f}"
+    )
+    trace_api.get_current_span().set_attributes(
+        {
+            "rerank.collection": collection,
+            "rerank.candidates": candidates,
+            "rerank.depth": plan.depth,
+            "rerank.reason": plan.reason,
+            "rerank.margin": plan.margin,
+            "rerank.spread": plan.spread,
+        }
+    )
@@ -0,0 +1,101 @@
+"""Process-wide reranker runtime shared by all knowledge base collections."""
+
+from functools import cache
+
+from onnxruntime import (
+    ExecutionMode,
+    GraphOptimizationLevel,
+    InferenceSession,
+    SessionOptions,
+)
+from transformers import AutoTokenizer
+
+from app.config import settings
+from app.modules.reranker.batcher import RerankBatcher
+from app.modules.reranker.pipeline import (
+    ChunkTokenCache,
+    RerankInputPipeline,
+    RerankPair,
+)
+from app.utils.logger import logger
+
+RERANKER_MODEL: str = settings.RERANKER_MODEL
+RERANKER_ONNX_PATH: str = settings.RERANKER_ONNX_PATH
+RERANK_MAX_BATCH_SIZE: int = settings.RERANK_MAX_BATCH_SIZE
+RERANK_BATCH_WAIT_MS: float = settings.RERANK_BATCH_WAIT_MS
+
+GRAPH_OPTIMIZATION_LEVELS: dict[str, GraphOptimizationLevel] = {
+    "disable": GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES: dict[str, ExecutionMode] = {
+    "sequential": ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ExecutionMode.ORT_PARALLEL,
+}
+
+
+def build_session_options() -> SessionOptions:
+    """Build ONNX Runtime session options from the app settings."""
+    options = SessionOptions()
+    # 0 keeps the ONNX Runtime default (one thread per physical core)
+    options.intra_op_num_threads = settings.RERANKER_INTRA_OP_THREADS
+    options.inter_op_num_threads = settings.RERANKER_INTER_OP_THREADS
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[
+        settings.RERANKER_GRAPH_OPTIMIZATION
+    ]
+    options.enable_cpu_mem_arena = settings.RERANKER_ENABLE_MEM_ARENA
+    options.execution_mode = EXECUTION_MODES[settings.RERANKER_EXECUTION_MODE]
+    return options
+
+
+class RerankerRuntime:
+    """Reranker tokenizer, ONNX session and request batcher."""
+
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL,
+        onnx_path: str = RERANKER_ONNX_PATH,
+        session_options: SessionOptions | None = None,
+    ):
+        """Reranker runtime constructor."""
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.session = InferenceSession(
+            onnx_path,
+            sess_options=session_options or build_session_options(),
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names: list[str] = [i.name for i in self.session.get_inputs()]
+        self.pipeline = RerankInputPipeline(
+            self.tokenizer, token_cache=ChunkTokenCache()
+        )
+        self.batcher = RerankBatcher(
+            self.score_pairs,
+            max_batch_size=RERANK_MAX_BATCH_SIZE,
+            max_wait_ms=RERANK_BATCH_WAIT_MS,
+        )
+        logger.info(f"[Reranker] Loaded '{onnx_path}' for {model_name}")
+
+    def score_pairs(self, pairs: list[RerankPair]) -> list[float]:
+        """Score a batch of (query, content) pairs with the ONNX reranker."""
+        scores: list[float] = [0.0] * len(pairs)
+
+        for indices, inputs in self.pipeline.buckets(self.pipeline.encode(pairs)):
+            ort_inputs = {name: inputs[name] for name in self.input_names}
+            logits = self.session.run(None, ort_inputs)[0].reshape(-1)
+            for i, score in zip(indices, logits, strict=True):
+                scores[i] = float(score)
+
+        return scores
+
+    async def score(self, pairs: list[RerankPair]) -> list[float]:
+        """Score pairs, batched with concurrent requests of all collections."""
+        return await self.batcher.score(pairs)
+
+
+@cache
+def get_reranker_runtime() -> RerankerRuntime:
+    """Get the process-wide reranker runtime, loading it on first use."""
+    return RerankerRuntime()
@@ -1,5 +1,6 @@
 """Process MarkDown files for training."""
 
+import asyncio
 import re
 from collections.abc import Generator
 from typing import override
@@ -10,9 +11,19 @@ from app.common.enums import (
     MediaType,
     SupportedTrainingExtensions,
 )
+from app.config import settings
 from app.modules.core.agents.descriptor_agent import describe_media_url
 from app.modules.data.chunk.fixed_chunking import chunk_markdown
-from app.modules.db.vector_db import add_chunks_to_vector_db
+from app.modules.db.chunk_diff import ChunkDiff, hash_chunk
+from app.modules.db.document_index import DocumentSummaryBuilder
+from app.modules.db.schema import CHUNK_INDEX_FIELD
+from app.modules.db.vector_db import (
+    add_document_summaries,
+    async_add_chunks_to_vector_db,
+    get_stored_chunks,
+    remove_chunks,
+    replace_document_summaries,
+)
 from app.modules.training import Train
 from app.modules.training.training_types import DocMetadata
 from app.modules.training.utils import get_batches
@@ -22,10 +33,15 @@ from app.utils.image import generate_image_hash, save_base64_image
 from app.utils.logger import logger
 from app.utils.shlink import shorten_url
 
+TRAINING_INGEST_BATCH_SIZE: int = settings.TRAINING_INGEST_BATCH_SIZE
+TRAINING_INCREMENTAL_ENABLED: bool = settings.TRAINING_INCREMENTAL_ENABLED
+
 
 class MarkdownTrain(Train):
     """Markdown training runner."""
 
+    knowledge_type: KnowledgeType = KnowledgeType.TEXT
+
     def __init__(  # noqa: PLR0913
         self,
         user_id: str,
@@ -47,6 +63,13 @@ class MarkdownTrain(Train):
         )
         self.source_name: str = source_name
         self.source_content: str = source_content
+        # Chunks are numbered across all texts of the source
+        self.chunk_count: int = 0
+        self.document_summaries = DocumentSummaryBuilder()
+        # Set when re-training only the changes of the source
+        self.chunk_diff: ChunkDiff | None = None
+        # Set when some chunks could not be inserted
+        self.insert_failed: bool = False
 
     def process_images(self, content: str) -> str:
         """Process images in markdown content."""
@@ -87,36 +110,107 @@ class MarkdownTrain(Train):
         file_content: str = self.process_images(self.source_content)
         yield file_content
 
-    def chunk_markdown_text(self, text: str) -> tuple[list, list[DocMetadata]]:
-        """Chunk markdown text."""
-        return chunk_markdown(
+    def chunk_markdown_text(
+        self, text: str, source_url: str | None = None
+    ) -> tuple[list, list[DocMetadata]]:
+        """Chunk markdown text, of a page of the source when `source_url` is set."""
+        text_chunks, chunk_metadata = chunk_markdown(
             text,
             source=self.source_name,
             source_id=self.source_id,
-            source_url=self.source_url,
+            source_url=self.source_url if source_url is None else source_url,
         )
+        for text_chunk, metadata in zip(text_chunks, chunk_metadata, strict=True):
+            metadata.chunk_index += self.chunk_count
+            metadata.chunk_hash = hash_chunk(text_chunk, metadata)
+        self.chunk_count += len(text_chunks)
+        return text_chunks, chunk_metadata
 
     def add_to_vector_db(
         self,
         text_chunks: list[str],
         chunk_metadata: list[DocMetadata],
     ) -> None:
-        """Add chunks to vector db."""
-        for batch_chunks, batch_metadata in get_batches([text_chunks, chunk_metadata]):
-            add_chunks_to_vector_db(
-                batch_chunks,
-                batch_metadata,
+        """Add chunks to vector db, only those not stored yet when re-training."""
+        if self.chunk_diff is not None:
+            text_chunks, chunk_metadata = self.chunk_diff.select_changed(
+                text_chunks, chunk_metadata
+            )
+        if not text_chunks:
+            return
+
+        # Chunks of a batch are embedded with concurrent requests
+        chunks, inserted = asyncio.run(
+            async_add_chunks_to_vector_db(
+                get_batches([text_chunks, chunk_metadata], TRAINING_INGEST_BATCH_SIZE),
                 self.source_type,
                 self.source_name,
-                knowledge_type=KnowledgeType.TEXT,
+                knowledge_type=self.knowledge_type,
+                account_id=self.account_id,
             )
+        )
+        self.document_summaries.add(chunks)
+        self.insert_failed |= not inserted
+
+    def start_training(self) -> None:
+        """Load the stored chunks of the source, to only train its changes."""
+        if not TRAINING_INCREMENTAL_ENABLED:
+            return
+
+        stored_chunks = get_stored_chunks(self.source_id, self.knowledge_type)
+        if stored_chunks is not None:
+            self.chunk_diff = ChunkDiff(stored_chunks)
+
+    def finish_training(self) -> None:
+        """Remove the vanished chunks of the source and update its documents.
+
+        Raises `TrainingError` when some chunks could not be inserted, the
+        stored chunks they replace are kept.
+        """
+        if self.chunk_diff is None:
+            add_document_summaries(self.document_summaries, self.knowledge_type)
+        elif self.insert_failed:
+            logger.warning(f"[{self.source_id}] Insert failed, keeping stored chunks")
+        elif not self.chunk_count:
+            # e.g. the sitemap could not be fetched, the source did not vanish
+            logger.warning(f"[{self.source_id}] No content, keeping stored chunks")
+        else:
+            self.apply_chunk_diff(self.chunk_diff)
+
+        if self.insert_failed:
+            raise TrainingError(f"Some chunks of source {self.source_id} not inserted")
+
+    def apply_chunk_diff(self, diff: ChunkDiff) -> None:
+        """Remove the vanished chunks and replace the changed document summaries."""
+        diff.finish()
+        if diff.vanished:
+            remove_chunks(
+                self.source_id,
+                [chunk[CHUNK_INDEX_FIELD] for chunk in diff.vanished],
+                self.knowledge_type,
+            )
+        if diff.changed_documents:
+            replace_document_summaries(
+                self.document_summaries,
+                self.knowledge_type,
+                source_id=self.source_id,
+                documents=diff.changed_documents,
+                kept_indexes=diff.get_kept_indexes(diff.changed_documents),
+            )
+        logger.info(
+            f"[{self.source_id}] Re-trained {len(diff.changed_documents)} "
+            f"documents: {diff.added} chunks added, {len(diff.kept)} unchanged, "
+            f"{len(diff.vanished)} removed"
+        )
 
     @override
     def run(self):
         try:
+            self.start_training()
             for markdown_text in self.get_content_in_markdown():
                 text_chunks, chunk_metadata = self.chunk_markdown_text(markdown_text)
                 self.add_to_vector_db(text_chunks, chunk_metadata)
+            self.finish_training()
             if self.send_complete_event:
                 complete_training_event_sync(
                     self.user_id,
@@ -70,21 +70,34 @@ class SitemapTrain(MarkdownTrain):
     def run(self) -> None:
         """Run the sitemap training."""
         try:
+            self.start_training()
             urls: list[str] = self.__extract_urls_from_sitemap(self.url)
             total_urls: int = len(urls)
-            success_urls: int = 0
 
             markdown_results: list[CrawlResult] = asyncio.run(crawl_urls(urls))
 
             all_urls_chunks: list[str] = []
             all_urls_metadata: list[DocMetadata] = []
-
-            for result in markdown_results:
-                text_chunks, chunk_metadata = self.chunk_markdown_text(result)
+            failed_urls: list[str] = []
+
+            # Pages are separate documents of the source, keyed by their URL
+            for url, result in zip(urls, markdown_results, strict=True):
+                if not result:
+                    failed_urls.append(url)
+                    continue
+                text_chunks, chunk_metadata = self.chunk_markdown_text(result, url)
                 all_urls_chunks.extend(text_chunks)
                 all_urls_metadata.extend(chunk_metadata)
+            success_urls: int = total_urls - len(failed_urls)
+
+            # Stored chunks of pages that could not be crawled are kept
+            if self.chunk_diff is not None and failed_urls:
+                self.chunk_diff.keep_documents(
+                    {(self.source_id, url) for url in failed_urls}
+                )
 
             self.add_to_vector_db(all_urls_chunks, all_urls_metadata)
+            self.finish_training()
 
             if self.send_complete_event:
                 complete_training_event_sync(
@@ -9,22 +9,24 @@ from app.utils.logger import logger
 TRAINING_BATCH_SIZE: int = settings.TRAINING_BATCH_SIZE
 
 
-def get_total_batch_number(docs_len: int) -> int:
+def get_total_batch_number(docs_len: int, batch_size: int = TRAINING_BATCH_SIZE) -> int:
     """Calculate the total number of batches required for training."""
-    return (docs_len + TRAINING_BATCH_SIZE - 1) // TRAINING_BATCH_SIZE
+    return (docs_len + batch_size - 1) // batch_size
 
 
-def get_batches(data: list[Any] | list[list[Any]]) -> Generator:
+def get_batches(
+    data: list[Any] | list[list[Any]], batch_size: int = TRAINING_BATCH_SIZE
+) -> Generator:
     """Generate batches of data from the provided list."""
     total_batches: int = get_total_batch_number(
-        len(data[0] if isinstance(data[0], list) else data)
+        len(data[0] if isinstance(data[0], list) else data), batch_size
     )
     logger.info(f"Generated {total_batches} batches")
 
     for i in range(total_batches):
         start, end = (
-            i * TRAINING_BATCH_SIZE,
-            i * TRAINING_BATCH_SIZE + TRAINING_BATCH_SIZE,
+            i * batch_size,
+            i * batch_size + batch_size,
         )
 
         if data and isinstance(data, list) and isinstance(data[0], list):
@@ -8,7 +8,7 @@ from app.common.enums import (
     TrainingResourceType,
 )
 from app.modules.bg_process import celery_app
-from app.modules.db.vector_db import remove_knowledge
+from app.modules.db.vector_db import async_remove_knowledge
 from app.modules.training import Train
 from app.modules.training.markdown import MarkdownTrain
 from app.modules.training.pdf import PDFTrain
@@ -203,7 +203,7 @@ async def route_training_events(
                 return await route_by_training_resource(event.content, event_metadata)
 
             case TrainingEventActions.DELETE.value:
-                remove_knowledge(event.content.metadata.source_id)
+                await async_remove_knowledge(event.content.metadata.source_id)
             case _:
                 logger.error(f"Not a valid training operation = {event.action}")
 
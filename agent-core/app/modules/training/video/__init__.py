@@ -6,16 +6,15 @@ from urllib.parse import urlparse
 
 from app.common.enums import KnowledgeType, MediaType, SupportedTrainingExtensions
 from app.modules.core.agents.descriptor_agent import describe_media_url
-from app.modules.db.vector_db import add_chunks_to_vector_db
 from app.modules.training.markdown import MarkdownTrain
-from app.modules.training.training_types import DocMetadata
-from app.modules.training.utils import get_batches
 from app.utils.video import youtube_tools
 
 
 class VideoTrain(MarkdownTrain):
     """Video training runner."""
 
+    knowledge_type: KnowledgeType = KnowledgeType.MEDIA
+
     def __init__(  # noqa: PLR0913
         self,
         user_id: str,
@@ -55,22 +54,6 @@ class VideoTrain(MarkdownTrain):
         # Default extension
         return SupportedTrainingExtensions.VIDEO_MP4
 
-    @override
-    def add_to_vector_db(
-        self,
-        text_chunks: list[str],
-        chunk_metadata: list[DocMetadata],
-    ) -> None:
-        """Add chunks to vector db."""
-        for batch_chunks, batch_metadata in get_batches([text_chunks, chunk_metadata]):
-            add_chunks_to_vector_db(
-                batch_chunks,
-                batch_metadata,
-                self.source_type,
-                self.source_name,
-                knowledge_type=KnowledgeType.MEDIA,
-            )
-
     @override
     def get_content_in_markdown(self) -> Generator:
         # To determine if it is youtube video
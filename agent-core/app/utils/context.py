@@ -8,6 +8,7 @@ ContextType = str | list | None
 # Use ContextVars to safely store request-specific state in a concurrent environment.
 # They are isolated per asynchronous task (i.e., per request).
 _user_id_var: ContextVar[str] = ContextVar("user_id")
+_account_id_var: ContextVar[str] = ContextVar("account_id")
 _session_id_var: ContextVar[str] = ContextVar("session_id")
 _agent_message_id_var: ContextVar[str] = ContextVar("agent_message_id")
 _token_var: ContextVar[str | None] = ContextVar("token", default=None)
@@ -20,6 +21,7 @@ _source_ids_var: ContextVar[list[str] | None] = ContextVar("source_ids", default
 # Dynamic mapping of context keys to their ContextVar objects
 _CONTEXT_VARS: dict[str, ContextVar] = {
     "user_id": _user_id_var,
+    "account_id": _account_id_var,
     "session_id": _session_id_var,
     "agent_message_id": _agent_message_id_var,
     "token": _token_var,
@@ -31,6 +33,7 @@ _CONTEXT_VARS: dict[str, ContextVar] = {
 # Type for valid context keys
 ContextKey = Literal[
     "user_id",
+    "account_id",
     "session_id",
     "agent_message_id",
     "token",
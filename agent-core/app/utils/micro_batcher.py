@@ -0,0 +1,132 @@
+"""Cross-request micro-batching util.
+
+Items submitted by concurrent callers within a short window are coalesced
+into one batch, executed at once, and the results are fanned back to each
+caller.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from app.utils.logger import logger
+
+
+@dataclass
+class BatchRequest[T]:
+    """Items submitted by one caller."""
+
+    items: list[T]
+    future: asyncio.Future
+
+
+class MicroBatcher[T, R]:
+    """Async queue that coalesces requests into batches of items.
+
+    `execute_fn` returns one result per item of a batch. Batches are executed
+    one at a time, or concurrently when `concurrent` is set, so a slow batch
+    does not hold back the requests arriving after it.
+    """
+
+    def __init__(
+        self,
+        execute_fn: Callable[[list[T]], Awaitable[list[R]]],
+        *,
+        name: str,
+        max_batch_size: int,
+        max_wait_ms: float,
+        concurrent: bool = False,
+    ):
+        """Micro-batcher constructor."""
+        self.execute_fn: Callable[[list[T]], Awaitable[list[R]]] = execute_fn
+        self.name: str = name
+        self.max_batch_size: int = max_batch_size
+        self.max_wait: float = max_wait_ms / 1000
+        self.concurrent: bool = concurrent
+        self._queue: asyncio.Queue[BatchRequest[T]] | None = None
+        self._worker: asyncio.Task | None = None
+        self._carry: BatchRequest[T] | None = None
+        # Strong references to the batches in flight
+        self._dispatches: set[asyncio.Task] = set()
+
+    def _ensure_worker(self) -> asyncio.Queue[BatchRequest[T]]:
+        if self._queue is None or self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._carry = None
+            self._worker = asyncio.create_task(self._run())
+        return self._queue
+
+    async def submit(self, items: list[T]) -> list[R]:
+        """Execute items, batched with concurrent callers."""
+        if not items:
+            return []
+
+        queue = self._ensure_worker()
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        await queue.put(BatchRequest(items=items, future=future))
+        return await future
+
+    async def _collect_batch(self) -> list[BatchRequest[T]]:
+        """Collect requests until the batch is full or the wait window ends."""
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+
+        first = self._carry or await self._queue.get()
+        self._carry = None
+        batch, size = [first], len(first.items)
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            try:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                else:
+                    request = self._queue.get_nowait()
+            except TimeoutError:
+                break
+
+            # Keep requests whole; an overflowing one opens the next batch
+            if size + len(request.items) > self.max_batch_size:
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request.items)
+
+        return batch
+
+    async def _dispatch(self, batch: list[BatchRequest[T]]) -> None:
+        """Execute the items of a batch and resolve its callers."""
+        items = [item for request in batch for item in request.items]
+
+        try:
+            results = await self.execute_fn(items)
+        except Exception as e:
+            logger.error(f"[{self.name}] Batch of {len(items)} items failed: {e}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        logger.debug(
+            f"[{self.name}] Executed {len(items)} items for {len(batch)} requests"
+        )
+        offset = 0
+        for request in batch:
+            end = offset + len(request.items)
+            if not request.future.done():
+                request.future.set_result(results[offset:end])
+            offset = end
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            if not self.concurrent:
+                await self._dispatch(batch)
+                continue
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
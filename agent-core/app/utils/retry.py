@@ -14,8 +14,12 @@ def retry_on_exception(
     delay_seconds: float = 1,
     exceptions: tuple = (Exception,),
     retry_condition: Callable[[Exception], bool] | None = None,
+    backoff: float = 1.0,
 ):
-    """Retry decorator."""
+    """Retry decorator.
+
+    The delay is multiplied by `backoff` after every failed attempt.
+    """
 
     def decorator(func):
         @wraps(func)
@@ -30,7 +34,7 @@ def retry_on_exception(
                     attempts += 1
                     logger.debug(f"Attempt {attempts}/{max_retries} failed: {e}")
                     if attempts < max_retries:
-                        await asyncio.sleep(delay_seconds)
+                        await asyncio.sleep(delay_seconds * backoff ** (attempts - 1))
                     else:
                         raise  # Re-raise the exception after max retries
             return None
@@ -47,7 +51,7 @@ def retry_on_exception(
                     attempts += 1
                     logger.debug(f"Attempt {attempts}/{max_retries} failed: {e}")
                     if attempts < max_retries:
-                        time.sleep(delay_seconds)
+                        time.sleep(delay_seconds * backoff ** (attempts - 1))
                     else:
                         raise  # Re-raise the exception after max retries
             return None
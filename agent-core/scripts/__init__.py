@@ -1,6 +1,7 @@
 """Application scripts."""
 
 import subprocess
+import sys
 
 
 def run_pre_commit() -> None:
@@ -55,9 +56,97 @@ def run_celery_debug() -> None:
         print("ERROR while starting celery app in DEBUG mode.")
 
 
+def run_celery_beat() -> None:
+    """Run celery beat, the scheduler of periodic maintenance tasks."""
+    try:
+        subprocess.run(
+            ["celery", "-A", "app.modules.bg_process", "beat"],
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        print("ERROR while starting celery beat.")
+
+
 def quantize_reranker_model() -> None:
-    """Quantize the reranker model."""
+    """Build, benchmark and compare the quantized reranker model variants."""
     try:
-        subprocess.run(["python", "scripts/quantize_reranker_model.py"], check=True)
+        subprocess.run(
+            ["python", "scripts/quantize_reranker_model.py", *sys.argv[1:]],
+            check=True,
+        )
     except subprocess.CalledProcessError:
         print("ERROR while quantizing the reranker model.")
+
+
+def export_embedding_model() -> None:
+    """Export and quantize the local ONNX embedding model."""
+    try:
+        subprocess.run(
+            ["python", "scripts/export_embedding_model.py", *sys.argv[1:]],
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        print("ERROR while exporting the embedding model.")
+
+
+def create_collections() -> None:
+    """Create the knowledge base collections."""
+    try:
+        subprocess.run(["python", "scripts/create_collections.py"], check=True)
+    except subprocess.CalledProcessError:
+        print("ERROR while creating the knowledge base collections.")
+
+
+def migrate_collections() -> None:
+    """Migrate the knowledge base collections to the current schema."""
+    try:
+        subprocess.run(
+            ["python", "scripts/migrate_collections.py", *sys.argv[1:]],
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        print("ERROR while migrating the knowledge base collections.")
+
+
+def benchmark_index() -> None:
+    """Benchmark or apply the ANN index profile of a knowledge base collection."""
+    try:
+        subprocess.run(
+            ["python", "scripts/benchmark_index.py", *sys.argv[1:]],
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        print("ERROR while benchmarking the collection index.")
+
+
+def evaluate_dimensions() -> None:
+    """Evaluate reduced-dimension and float16 vectors of a collection."""
+    try:
+        subprocess.run(
+            ["python", "scripts/evaluate_dimensions.py", *sys.argv[1:]],
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        print("ERROR while evaluating the vector dimensions.")
+
+
+def reindex_collection() -> None:
+    """Reindex a collection without downtime and swap its alias."""
+    try:
+        subprocess.run(
+            ["python", "scripts/reindex_collection.py", *sys.argv[1:]],
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        print("ERROR while reindexing the collection.")
+
+
+def build_document_index() -> None:
+    """Build the document index of a collection from its chunks."""
+    try:
+        subprocess.run(
+            ["python", "scripts/build_document_index.py", *sys.argv[1:]],
+            check=True,
+        )
+    except subprocess.CalledProcessError:
+        print("ERROR while building the document index.")
@@ -0,0 +1,337 @@
+"""Script to benchmark ANN index profiles of a knowledge base collection.
+
+Vectors are sampled from the collection and each candidate index is built on
+a temporary collection. Every search-parameter setting is reported with its
+recall@k against exact search and its p50 / p99 search latency, so the index
+profile (`TEXT_INDEX_PROFILE` / `VIDEO_INDEX_PROFILE`) is chosen from data.
+
+With `--apply --yes`, the vector index of the live collection is rebuilt in
+place with the configured profile. The collection is released until the new
+index is built and loaded, so its searches fail meanwhile. `run:reindex`
+builds the index on a shadow collection and swaps it in without downtime.
+
+Usage:
+    python scripts/benchmark_index.py --collection text [--sample 20000] [--k 10]
+    python scripts/benchmark_index.py --collection text --profiles profiles.json
+    python scripts/benchmark_index.py --collection text --apply --yes
+"""
+
+import argparse
+import json
+import math
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+from pymilvus import DataType, MilvusClient
+
+from app.config import IndexProfile
+from app.modules.core.knowledge_bases import text_knowledge_base, video_knowledge_base
+from app.modules.db.mod_milvus import ModMilvus
+from app.modules.db.schema import METRIC_TYPE, VECTOR_DATA_TYPES, VECTOR_FIELD
+from app.modules.db.vectors import VectorDtype, decode_vector, fit_vectors
+
+INSERT_BATCH_SIZE: int = 1000
+
+
+def default_candidates(dimensions: int, num_vectors: int, k: int) -> list[IndexProfile]:
+    """Build the default candidate profiles, sweeping the search parameters."""
+    nlist = max(16, int(4 * math.sqrt(num_vectors)))
+    # Sub-vectors of 8 dimensions, dimensions must be divisible by m
+    pq_m = next(
+        m
+        for m in (dimensions // 8, dimensions // 4, dimensions // 2, 1)
+        if m and dimensions % m == 0
+    )
+
+    sweeps: list[tuple[str, dict, list[dict]]] = [
+        ("AUTOINDEX", {}, [{}]),
+        (
+            "HNSW",
+            {"M": 16, "efConstruction": 200},
+            [{"ef": ef} for ef in (max(k, 32), 64, 128, 256)],
+        ),
+        (
+            "IVF_FLAT",
+            {"nlist": nlist},
+            [{"nprobe": nprobe} for nprobe in (8, 16, 32, 64)],
+        ),
+        (
+            "IVF_PQ",
+            {"nlist": nlist, "m": pq_m, "nbits": 8},
+            [{"nprobe": nprobe} for nprobe in (8, 16, 32, 64)],
+        ),
+        (
+            "DISKANN",
+            {},
+            [{"search_list": size} for size in (max(k, 50), 100, 200)],
+        ),
+    ]
+    return [
+        IndexProfile(index_type=index_type, params=params, search_params=search_params)
+        for index_type, params, search_params_sweep in sweeps
+        for search_params in search_params_sweep
+    ]
+
+
+def sample_vectors(
+    vector_db: ModMilvus, limit: int, batch_size: int = 1000
+) -> np.ndarray:
+    """Sample up to `limit` vectors from the collection."""
+    iterator = vector_db.client.query_iterator(
+        collection_name=vector_db.collection,
+        batch_size=batch_size,
+        limit=limit,
+        filter="",
+        output_fields=[VECTOR_FIELD],
+    )
+    vectors: list[np.ndarray] = []
+    try:
+        while rows := iterator.next():
+            vectors.extend(decode_vector(row[VECTOR_FIELD]) for row in rows)
+    finally:
+        iterator.close()
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact cosine top-k ids of each query."""
+    data = data / np.linalg.norm(data, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ data.T
+    top_k = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top_k, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top_k, order, axis=1)
+
+
+def create_bench_collection(
+    client: MilvusClient,
+    name: str,
+    data: np.ndarray,
+    profile: IndexProfile,
+    vector_dtype: VectorDtype = "float32",
+) -> float:
+    """Create a temporary collection holding the sampled vectors, return build secs."""
+    if client.has_collection(name):
+        client.drop_collection(name)
+
+    schema = client.create_schema(auto_id=False)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field(VECTOR_FIELD, VECTOR_DATA_TYPES[vector_dtype], dim=data.shape[1])
+    client.create_collection(collection_name=name, schema=schema)
+
+    for start in range(0, len(data), INSERT_BATCH_SIZE):
+        vectors = fit_vectors(
+            data[start : start + INSERT_BATCH_SIZE], data.shape[1], vector_dtype
+        )
+        client.insert(
+            collection_name=name,
+            data=[
+                {"id": start + i, VECTOR_FIELD: vector}
+                for i, vector in enumerate(vectors)
+            ],
+        )
+    client.flush(name)
+
+    start_time = perf_counter()
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name=VECTOR_FIELD,
+        index_type=profile.index_type,
+        metric_type=METRIC_TYPE,
+        params=profile.params,
+    )
+    client.create_index(collection_name=name, index_params=index_params)
+    client.load_collection(name)
+    return perf_counter() - start_time
+
+
+def run_queries(  # noqa: PLR0913
+    client: MilvusClient,
+    name: str,
+    queries: np.ndarray,
+    profile: IndexProfile,
+    k: int,
+    *,
+    vector_dtype: VectorDtype = "float32",
+) -> tuple[np.ndarray, list[float]]:
+    """Search every query one by one, returning the hit ids and latencies (ms)."""
+    hit_ids = np.full((len(queries), k), -1, dtype=np.int64)
+    latencies: list[float] = []
+
+    for row, query in enumerate(queries):
+        data = fit_vectors(query[np.newaxis], len(query), vector_dtype)
+        start_time = perf_counter()
+        results = client.search(
+            collection_name=name,
+            data=data,
+            limit=k,
+            search_params={"metric_type": METRIC_TYPE, "params": profile.search_params},
+            consistency_level=profile.consistency_level,
+        )
+        latencies.append((perf_counter() - start_time) * 1000)
+        ids = [hit["id"] for hit in results[0]]
+        hit_ids[row, : len(ids)] = ids
+
+    return hit_ids, latencies
+
+
+def recall_at_k(hit_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """Mean fraction of the exact top-k found by the index."""
+    return float(
+        np.mean(
+            [
+                len(set(hits) & set(exact)) / len(exact)
+                for hits, exact in zip(hit_ids, exact_ids, strict=True)
+            ]
+        )
+    )
+
+
+def benchmark(
+    vector_db: ModMilvus, candidates: list[IndexProfile], args: argparse.Namespace
+) -> list[dict]:
+    """Benchmark every candidate profile on vectors sampled from the collection."""
+    client = vector_db.client
+    vectors = sample_vectors(vector_db, args.sample + args.queries)
+    if len(vectors) <= args.queries + args.k:
+        raise SystemExit(f"[{vector_db.collection}] Not enough vectors to benchmark")
+
+    # Held-out vectors are used as queries
+    data, queries = vectors[: -args.queries], vectors[-args.queries :]
+    exact_ids = exact_top_k(data, queries, args.k)
+    print(f"[{vector_db.collection}] {len(data)} vectors, {len(queries)} queries")
+
+    bench_name = f"{vector_db.collection}_index_bench"
+    results: list[dict] = []
+    built: tuple[str, str] | None = None
+    build_secs = 0.0
+    try:
+        for profile in candidates:
+            # Search-parameter sweeps of the same index reuse the built index
+            build_key = (profile.index_type, json.dumps(profile.params, sort_keys=True))
+            if build_key != built:
+                build_secs = create_bench_collection(
+                    client, bench_name, data, profile, vector_db.vector_dtype
+                )
+                built = build_key
+
+            hit_ids, latencies = run_queries(
+                client,
+                bench_name,
+                queries,
+                profile,
+                args.k,
+                vector_dtype=vector_db.vector_dtype,
+            )
+            result = {
+                "index_type": profile.index_type,
+                "params": profile.params,
+                "search_params": profile.search_params,
+                f"recall@{args.k}": round(recall_at_k(hit_ids, exact_ids), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                "build_secs": round(build_secs, 2),
+            }
+            results.append(result)
+            print(json.dumps(result))
+    finally:
+        if client.has_collection(bench_name):
+            client.drop_collection(bench_name)
+
+    return results
+
+
+def apply_profile(vector_db: ModMilvus) -> None:
+    """Rebuild the vector index of the live collection with its configured profile."""
+    client = vector_db.client
+    collection = vector_db.collection
+    profile = vector_db.index_profile
+
+    client.release_collection(collection)
+    for index_name in client.list_indexes(collection, field_name=VECTOR_FIELD):
+        client.drop_index(collection, index_name)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name=VECTOR_FIELD,
+        index_type=profile.index_type,
+        metric_type=METRIC_TYPE,
+        params=profile.params,
+    )
+    client.create_index(collection_name=collection, index_params=index_params)
+    client.load_collection(collection)
+    print(f"[{collection}] Rebuilt '{VECTOR_FIELD}' index as {profile.model_dump()}")
+
+
+def main() -> None:
+    """Benchmark or apply the index profile of a knowledge base collection."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collection", choices=["text", "video"], default="text")
+    parser.add_argument("--sample", type=int, default=20_000, help="Indexed vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--profiles", help="JSON list of index profiles instead of the defaults"
+    )
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Rebuild the live collection index with the configured profile",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Confirm that searches fail while the live index is rebuilt",
+    )
+    args = parser.parse_args()
+
+    knowledge_base = (
+        text_knowledge_base if args.collection == "text" else video_knowledge_base
+    )
+    vector_db: ModMilvus = knowledge_base.vector_db
+
+    if args.apply:
+        if not args.yes:
+            raise SystemExit(
+                f"[{vector_db.collection}] --apply releases the collection until "
+                "the index is rebuilt. Pass --yes to confirm, or use run:reindex "
+                "to rebuild it without downtime"
+            )
+        apply_profile(vector_db)
+        return
+
+    if args.profiles:
+        candidates = [
+            IndexProfile(**profile)
+            for profile in json.loads(Path(args.profiles).read_text(encoding="utf-8"))
+        ]
+    else:
+        candidates = [
+            *default_candidates(vector_db.embedder.dimensions, args.sample, args.k),
+            vector_db.index_profile,
+        ]
+
+    results = benchmark(vector_db, candidates, args)
+
+    print(
+        f"\n{'index':<10}{'params':<36}{'search':<22}{'recall':>8}{'p50':>9}{'p99':>9}"
+    )
+    for result in results:
+        print(
+            f"{result['index_type']:<10}"
+            f"{json.dumps(result['params']):<36}"
+            f"{json.dumps(result['search_params']):<22}"
+            f"{result[f'recall@{args.k}']:>8}"
+            f"{result['p50_ms']:>9}"
+            f"{result['p99_ms']:>9}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nReport saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
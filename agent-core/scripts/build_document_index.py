@@ -0,0 +1,112 @@
+"""Script to build the document index of a collection from its chunks.
+
+Document summary vectors are inserted at training time. This builds them for
+sources trained before `DOCUMENT_INDEX_ENABLED` was set, which two-level
+searches would never select. With `--rebuild`, the document index is dropped
+and rebuilt for all sources (e.g. after reindexing the chunk collection).
+
+Usage:
+    python scripts/build_document_index.py --collection text
+    python scripts/build_document_index.py --collection video --rebuild
+"""
+
+import argparse
+
+from app.modules.core.knowledge_bases import text_knowledge_base, video_knowledge_base
+from app.modules.db.document_index import DocumentSummaryBuilder
+from app.modules.db.mod_milvus import ModMilvus
+from app.modules.db.schema import (
+    ACCOUNT_ID_FIELD,
+    CHUNK_INDEX_FIELD,
+    METADATA_FIELD,
+    SOURCE_ID_FIELD,
+    VECTOR_FIELD,
+)
+from app.modules.db.vectors import decode_vector
+
+
+def get_indexed_sources(document_index: ModMilvus, batch_size: int) -> set[str]:
+    """Get the sources that already have document summaries."""
+    source_ids: set[str] = set()
+    iterator = document_index.client.query_iterator(
+        collection_name=document_index.collection,
+        batch_size=batch_size,
+        filter="",
+        output_fields=[SOURCE_ID_FIELD],
+    )
+    try:
+        while rows := iterator.next():
+            source_ids.update(row[SOURCE_ID_FIELD] for row in rows)
+    finally:
+        iterator.close()
+    return source_ids
+
+
+def build_document_index(vector_db: ModMilvus, args: argparse.Namespace) -> None:
+    """Insert the summaries of the collection's sources missing from its index."""
+    document_index = vector_db.document_index
+    if not isinstance(document_index, ModMilvus):
+        raise SystemExit(f"[{vector_db.collection}] Set DOCUMENT_INDEX_ENABLED first")
+    if SOURCE_ID_FIELD not in vector_db.get_field_names_sync():
+        raise SystemExit(f"[{vector_db.collection}] Run run:migrate-collections first")
+
+    if args.rebuild and document_index.client.has_collection(document_index.collection):
+        document_index.client.drop_collection(document_index.collection)
+        print(f"[{document_index.collection}] Dropped")
+    document_index.create()
+
+    indexed = get_indexed_sources(document_index, args.batch_size * 10)
+    summaries = DocumentSummaryBuilder()
+    chunk_count = 0
+    iterator = vector_db.client.query_iterator(
+        collection_name=vector_db.collection,
+        batch_size=args.batch_size,
+        filter="",
+        output_fields=[
+            VECTOR_FIELD,
+            METADATA_FIELD,
+            ACCOUNT_ID_FIELD,
+            SOURCE_ID_FIELD,
+            CHUNK_INDEX_FIELD,
+        ],
+    )
+    try:
+        while rows := iterator.next():
+            chunks = [
+                {**row, VECTOR_FIELD: decode_vector(row[VECTOR_FIELD])}
+                for row in rows
+                if row.get(SOURCE_ID_FIELD) and row[SOURCE_ID_FIELD] not in indexed
+            ]
+            summaries.add(chunks)
+            chunk_count += len(chunks)
+    finally:
+        iterator.close()
+
+    documents = summaries.build()
+    inserted = document_index.bulk_insert(documents) if documents else 0
+    print(
+        f"[{document_index.collection}] Inserted {inserted} document summaries "
+        f"from {chunk_count} chunks, {len(indexed)} sources were already indexed"
+    )
+
+
+def main() -> None:
+    """Build the document index of a knowledge base collection."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collection", choices=["text", "video"], default="text")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Drop the document index and rebuild it for all sources",
+    )
+    args = parser.parse_args()
+
+    knowledge_base = (
+        text_knowledge_base if args.collection == "text" else video_knowledge_base
+    )
+    build_document_index(knowledge_base.vector_db, args)
+
+
+if __name__ == "__main__":
+    main()
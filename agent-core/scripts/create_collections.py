@@ -0,0 +1,11 @@
+"""Script to create the knowledge base collections with the current schema."""
+
+from app.modules.core.knowledge_bases import text_knowledge_base, video_knowledge_base
+
+for knowledge_base in (text_knowledge_base, video_knowledge_base):
+    knowledge_base.vector_db.create()
+    print(f"Collection '{knowledge_base.vector_db.collection}' is ready")
+
+    if document_index := knowledge_base.vector_db.document_index:
+        document_index.create()
+        print(f"Document index '{document_index.collection}' is ready")
@@ -0,0 +1,176 @@
+"""Script to evaluate reduced-dimension and float16 vectors of a collection.
+
+Vectors are sampled from the collection, and each candidate dimensions and
+dtype is compared against exact search on the stored vectors: recall@k of the
+reduced vectors, exact search latency and vector memory, projected to the
+whole collection. With `--milvus`, every candidate is also indexed with the
+collection's index profile on a temporary collection to measure ANN recall
+and latency. Use it before lowering `VECTOR_DIMENSIONS` / `VECTOR_DTYPE` and
+running `run:migrate-collections`.
+
+Usage:
+    python scripts/evaluate_dimensions.py --collection text
+    python scripts/evaluate_dimensions.py --dimensions 1024 768 512 --milvus
+"""
+
+import argparse
+import json
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+from benchmark_index import (
+    create_bench_collection,
+    exact_top_k,
+    recall_at_k,
+    run_queries,
+    sample_vectors,
+)
+
+from app.modules.core.knowledge_bases import text_knowledge_base, video_knowledge_base
+from app.modules.db.mod_milvus import ModMilvus
+from app.modules.db.vectors import VectorDtype, reduce_dimensions
+
+DEFAULT_DIMENSIONS: list[int] = [3072, 1536, 1024, 768, 512, 256]
+DTYPE_BYTES: dict[VectorDtype, int] = {"float32": 4, "float16": 2}
+
+
+def reduce_vectors(
+    vectors: np.ndarray, dimensions: int, dtype: VectorDtype
+) -> np.ndarray:
+    """Reduce vectors as they would be stored, computing in float32."""
+    return reduce_dimensions(vectors, dimensions).astype(dtype).astype(np.float32)
+
+
+def exact_latencies(data: np.ndarray, queries: np.ndarray, k: int) -> list[float]:
+    """Exact search latency (ms) of every query one by one."""
+    latencies: list[float] = []
+    for query in queries:
+        start_time = perf_counter()
+        scores = data @ query
+        np.argpartition(-scores, k)[:k]
+        latencies.append((perf_counter() - start_time) * 1000)
+    return latencies
+
+
+def evaluate(vector_db: ModMilvus, args: argparse.Namespace) -> list[dict]:
+    """Evaluate every candidate dimensions and dtype on sampled vectors."""
+    vectors = sample_vectors(vector_db, args.sample + args.queries)
+    if len(vectors) <= args.queries + args.k:
+        raise SystemExit(f"[{vector_db.collection}] Not enough vectors to evaluate")
+
+    source_dimensions = vectors.shape[1]
+    row_count = int(
+        vector_db.client.get_collection_stats(vector_db.collection)["row_count"]
+    )
+    data, queries = vectors[: -args.queries], vectors[-args.queries :]
+    exact_ids = exact_top_k(data, queries, args.k)
+    print(
+        f"[{vector_db.collection}] {row_count} rows of {source_dimensions} dims, "
+        f"{len(data)} sampled vectors, {len(queries)} queries"
+    )
+
+    candidates = [
+        (dimensions, dtype)
+        for dimensions in sorted(
+            {d for d in args.dimensions if d <= source_dimensions}
+            | {source_dimensions},
+            reverse=True,
+        )
+        for dtype in args.dtypes
+    ]
+
+    results: list[dict] = []
+    bench_name = f"{vector_db.collection}_dimensions_bench"
+    try:
+        for dimensions, dtype in candidates:
+            reduced_data = reduce_vectors(data, dimensions, dtype)
+            reduced_queries = reduce_vectors(queries, dimensions, dtype)
+            hit_ids = exact_top_k(reduced_data, reduced_queries, args.k)
+            latencies = exact_latencies(reduced_data, reduced_queries, args.k)
+            vector_bytes = dimensions * DTYPE_BYTES[dtype]
+
+            result = {
+                "dimensions": dimensions,
+                "dtype": dtype,
+                f"recall@{args.k}": round(recall_at_k(hit_ids, exact_ids), 4),
+                "exact_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "vector_bytes": vector_bytes,
+                "collection_mib": round(row_count * vector_bytes / 2**20, 1),
+            }
+
+            if args.milvus:
+                create_bench_collection(
+                    vector_db.client,
+                    bench_name,
+                    reduced_data,
+                    vector_db.index_profile,
+                    dtype,
+                )
+                ann_ids, ann_latencies = run_queries(
+                    vector_db.client,
+                    bench_name,
+                    reduced_queries,
+                    vector_db.index_profile,
+                    args.k,
+                    vector_dtype=dtype,
+                )
+                result[f"ann_recall@{args.k}"] = round(
+                    recall_at_k(ann_ids, exact_ids), 4
+                )
+                result["ann_p50_ms"] = round(float(np.percentile(ann_latencies, 50)), 3)
+                result["ann_p99_ms"] = round(float(np.percentile(ann_latencies, 99)), 3)
+
+            results.append(result)
+            print(json.dumps(result))
+    finally:
+        if args.milvus and vector_db.client.has_collection(bench_name):
+            vector_db.client.drop_collection(bench_name)
+
+    return results
+
+
+def main() -> None:
+    """Evaluate reduced vectors of a knowledge base collection."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collection", choices=["text", "video"], default="text")
+    parser.add_argument("--sample", type=int, default=20_000, help="Indexed vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Held-out queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=DEFAULT_DIMENSIONS)
+    parser.add_argument(
+        "--dtypes",
+        nargs="+",
+        choices=["float32", "float16"],
+        default=["float32", "float16"],
+    )
+    parser.add_argument(
+        "--milvus",
+        action="store_true",
+        help="Also measure ANN recall and latency with the collection's index",
+    )
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    knowledge_base = (
+        text_knowledge_base if args.collection == "text" else video_knowledge_base
+    )
+    results = evaluate(knowledge_base.vector_db, args)
+
+    print(f"\n{'dims':>6}{'dtype':>9}{'recall':>8}{'exact p50':>11}{'MiB':>10}")
+    for result in results:
+        print(
+            f"{result['dimensions']:>6}"
+            f"{result['dtype']:>9}"
+            f"{result[f'recall@{args.k}']:>8}"
+            f"{result['exact_p50_ms']:>11}"
+            f"{result['collection_mib']:>10}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nReport saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
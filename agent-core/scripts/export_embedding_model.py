@@ -0,0 +1,153 @@
+"""Script to export and quantize the local ONNX sentence-embedding model.
+
+`ONNX_EMBEDDING_MODEL` is exported to an fp32 ONNX graph and quantized to
+dynamic int8. Both variants embed the bundled query set through the production
+embedder, and the int8 embeddings and passage rankings are compared with the
+fp32 ones. With `--install`, the int8 model is copied to `ONNX_EMBEDDING_PATH`
+when it keeps the fp32 embeddings.
+
+Collections switched to the ONNX backend (`TEXT_EMBEDDING_BACKEND=onnx`) must
+be re-embedded, e.g. with `run:reindex --reembed`.
+
+Usage:
+    python scripts/export_embedding_model.py [--install] [--min-cosine 0.99]
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from transformers import AutoModel, AutoTokenizer
+
+from app.config import settings
+from app.modules.embedder.onnx import OnnxEmbedder
+
+ONNX_EMBEDDING_MODEL: str = settings.ONNX_EMBEDDING_MODEL
+ONNX_EMBEDDING_PATH: str = settings.ONNX_EMBEDDING_PATH
+
+MODELS_DIR = Path("./models")
+EVAL_SET_PATH = Path(__file__).parent / "data" / "reranker_eval_set.json"
+
+
+def export_fp32(output_path: Path) -> None:
+    """Export the sentence-embedding model to an fp32 ONNX graph."""
+    tokenizer = AutoTokenizer.from_pretrained(ONNX_EMBEDDING_MODEL)
+    model = AutoModel.from_pretrained(ONNX_EMBEDDING_MODEL)
+    model.eval()
+
+    # Dummy input for tracing
+    inputs = tokenizer("passage", return_tensors="pt")
+    input_names: list[str] = list(inputs.keys())
+    torch.onnx.export(
+        model,
+        tuple(inputs[name] for name in input_names),
+        output_path,
+        input_names=input_names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            **{name: {0: "batch_size", 1: "seq_len"} for name in input_names},
+            "last_hidden_state": {0: "batch_size", 1: "seq_len"},
+        },
+        opset_version=14,
+    )
+    print(f"fp32 model saved to {output_path}")
+
+
+def load_embedder(onnx_path: Path) -> OnnxEmbedder:
+    """Load a model variant with the configured embedder settings."""
+    return OnnxEmbedder(
+        id=ONNX_EMBEDDING_MODEL,
+        onnx_path=str(onnx_path),
+        dimensions=settings.ONNX_EMBEDDING_DIMENSIONS,
+        pooling=settings.ONNX_EMBEDDING_POOLING,
+        max_tokens=settings.ONNX_EMBEDDING_MAX_TOKENS,
+        batch_size=settings.ONNX_EMBEDDING_BATCH_SIZE,
+        query_prefix=settings.ONNX_EMBEDDING_QUERY_PREFIX,
+    )
+
+
+def embed_eval_set(
+    embedder: OnnxEmbedder, eval_set: list[dict]
+) -> tuple[np.ndarray, list[list[int]], float]:
+    """Embed the eval passages, rank them per query and time the embedding."""
+    passages = [passage for item in eval_set for passage in item["passages"]]
+    start = perf_counter()
+    passage_vectors = np.asarray(embedder.embed_documents(passages))
+    elapsed_ms = (perf_counter() - start) * 1000
+
+    query_vectors = np.asarray(
+        embedder.embed_queries([item["query"] for item in eval_set])
+    )
+    rankings: list[list[int]] = []
+    offset = 0
+    for item, query_vector in zip(eval_set, query_vectors, strict=True):
+        scores = passage_vectors[offset : offset + len(item["passages"])] @ query_vector
+        rankings.append(np.argsort(-scores).tolist())
+        offset += len(item["passages"])
+    return passage_vectors, rankings, elapsed_ms / len(passages)
+
+
+def main() -> None:
+    """Export the fp32 and int8 variants and compare their embeddings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--min-cosine",
+        type=float,
+        default=0.99,
+        help="Minimum mean cosine similarity of int8 to fp32 embeddings",
+    )
+    parser.add_argument(
+        "--install",
+        action="store_true",
+        help="Copy the int8 model to ONNX_EMBEDDING_PATH",
+    )
+    args = parser.parse_args()
+
+    MODELS_DIR.mkdir(parents=True, exist_ok=True)
+    stem = ONNX_EMBEDDING_MODEL.rsplit("/", 1)[-1]
+    fp32_path = MODELS_DIR / f"{stem}.fp32.onnx"
+    int8_path = MODELS_DIR / f"{stem}.int8-dynamic.onnx"
+
+    export_fp32(fp32_path)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"Dynamic int8 model saved to {int8_path}")
+
+    with open(EVAL_SET_PATH, encoding="utf-8") as file:
+        eval_set: list[dict] = json.load(file)
+
+    fp32_vectors, fp32_rankings, fp32_ms = embed_eval_set(
+        load_embedder(fp32_path), eval_set
+    )
+    int8_vectors, int8_rankings, int8_ms = embed_eval_set(
+        load_embedder(int8_path), eval_set
+    )
+
+    # Embeddings are normalized, their dot product is the cosine similarity
+    cosine = float(np.mean(np.sum(fp32_vectors * int8_vectors, axis=1)))
+    top1 = statistics.fmean(
+        fp32[0] == int8[0]
+        for fp32, int8 in zip(fp32_rankings, int8_rankings, strict=True)
+    )
+    print(f"{'variant':<14}{'ms/passage':>12}")
+    print(f"{'fp32':<14}{fp32_ms:>12.2f}")
+    print(f"{'int8-dynamic':<14}{int8_ms:>12.2f}")
+    print(f"int8 vs fp32: mean cosine {cosine:.4f}, top-1 agreement {top1:.0%}")
+
+    if not args.install:
+        return
+    if cosine < args.min_cosine:
+        raise SystemExit(f"Mean cosine {cosine:.4f} < {args.min_cosine}, not installed")
+
+    Path(ONNX_EMBEDDING_PATH).parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(int8_path, ONNX_EMBEDDING_PATH)
+    print(f"Installed int8-dynamic model to {ONNX_EMBEDDING_PATH}")
+
+
+if __name__ == "__main__":
+    main()
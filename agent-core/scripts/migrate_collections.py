@@ -0,0 +1,347 @@
+"""Script to migrate knowledge base collections to the current schema.
+
+Milvus cannot add a partition key or indexed fields to an existing
+collection, so each collection missing the `account_id` partition key or the
+`source_id` / `chunk_index` scalar fields is copied into a new collection
+with the current schema, then swapped in by renaming, or by pointing the
+alias at it for collections behind an alias (after `run:reindex`). Scalar
+fields are backfilled from the chunk metadata. The original collection is
+kept, as `<name>_legacy` when renamed, unless `--drop-legacy` is set.
+
+Sources with chunks missing a chunk index, or repeating one (trained before
+chunks were numbered across the source), are renumbered in insertion order,
+so `(source_id, chunk_index)` identifies a chunk. Rebuild their document
+summaries afterwards with `run:build-document-index --rebuild`.
+
+With `--dimensions` / `--vector-dtype`, collections whose vector field does
+not match them are migrated the same way; without them, collections keep
+their vector field. Vectors are truncated to the leading dimensions and
+re-normalized, or re-embedded from the chunk content with `--reembed`
+(required to grow the dimensions). Migrating with `--dimensions` before
+lowering the setting keeps the app serving: it reduces its embeddings to the
+collection's dimensions.
+
+The account of each chunk is taken from its `account_id` (dynamic field),
+then from `--account-map`, a JSON object of source id to account id, e.g.
+exported from the backend database with:
+
+    SELECT json_object_agg(id, "accountId") FROM "Document";
+
+and finally from `--default-account-id`. Chunks without an account are not
+copied. Pause training while migrating, and restart the app afterwards.
+
+Usage:
+    python scripts/migrate_collections.py --account-map accounts.json
+    python scripts/migrate_collections.py --dimensions 768 --vector-dtype float16
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+from pymilvus import MilvusClient
+
+from app.config import settings
+from app.modules.core.knowledge_bases import text_knowledge_base, video_knowledge_base
+from app.modules.db.collection_copy import convert_vectors
+from app.modules.db.mod_milvus import ModMilvus
+from app.modules.db.schema import (
+    ACCOUNT_ID_FIELD,
+    CHUNK_INDEX_FIELD,
+    METADATA_FIELD,
+    SCALAR_FIELDS,
+    SOURCE_ID_FIELD,
+    SPARSE_FIELD,
+    VECTOR_FIELD,
+    build_collection_schema,
+    build_index_params,
+    get_vector_field,
+)
+from app.modules.db.vectors import VectorDtype
+
+VECTOR_DB_NUM_PARTITIONS: int = settings.VECTOR_DB_NUM_PARTITIONS
+
+
+@dataclass
+class MigrationOptions:
+    """Options of a collection migration."""
+
+    account_map: dict[str, str]
+    default_account_id: str | None
+    dimensions: int | None  # None keeps the collection's dimensions
+    vector_dtype: VectorDtype | None  # None keeps the collection's dtype
+    reembed: bool
+    batch_size: int
+    drop_legacy: bool
+
+
+def is_migrated(
+    source_fields: dict[str, dict], vector_field: tuple[int, VectorDtype]
+) -> bool:
+    """Check whether a collection has the current fields and vector field."""
+    account_field = source_fields.get(ACCOUNT_ID_FIELD) or {}
+    return (
+        bool(account_field.get("is_partition_key"))
+        and all(field in source_fields for field in SCALAR_FIELDS)
+        and get_vector_field(list(source_fields.values())) == vector_field
+    )
+
+
+def resolve_account_id(
+    row: dict, account_map: dict[str, str], default_account_id: str | None
+) -> str | None:
+    """Resolve the account of a chunk."""
+    source_id = (row.get(METADATA_FIELD) or {}).get(SOURCE_ID_FIELD)
+    return row.get(ACCOUNT_ID_FIELD) or account_map.get(source_id) or default_account_id
+
+
+def resolve_vector_field(
+    collection: str, source_fields: dict[str, dict], options: MigrationOptions
+) -> tuple[int, VectorDtype]:
+    """Get the target vector field, the collection's unless set in the options."""
+    source_dimensions, source_dtype = get_vector_field(list(source_fields.values()))
+    dimensions: int = options.dimensions or source_dimensions
+    vector_dtype: VectorDtype = options.vector_dtype or source_dtype
+    if (dimensions, vector_dtype) == (source_dimensions, source_dtype):
+        return dimensions, vector_dtype
+
+    if source_dimensions < dimensions and not options.reembed:
+        raise SystemExit(
+            f"[{collection}] Growing {source_dimensions} to {dimensions} "
+            "dimensions requires --reembed"
+        )
+    print(
+        f"[{collection}] Vectors {source_dimensions}x{source_dtype} -> "
+        f"{dimensions}x{vector_dtype}"
+    )
+    return dimensions, vector_dtype
+
+
+def resolve_alias(client: MilvusClient, collection: str) -> str | None:
+    """Get the collection behind an alias, None when the name is no alias."""
+    try:
+        return client.describe_alias(collection)["collection_name"]
+    except Exception:
+        return None
+
+
+def get_chunk_ref(row: dict) -> tuple[str, int | None]:
+    """Get the source id and chunk index of a row, from its fields or metadata."""
+    metadata = row.get(METADATA_FIELD) or {}
+    chunk_index = row.get(CHUNK_INDEX_FIELD)
+    if chunk_index is None:
+        chunk_index = metadata.get(CHUNK_INDEX_FIELD)
+    return row.get(SOURCE_ID_FIELD) or metadata.get(SOURCE_ID_FIELD) or "", chunk_index
+
+
+def plan_chunk_indexes(
+    client: MilvusClient,
+    collection: str,
+    source_fields: dict[str, dict],
+    batch_size: int,
+) -> dict[Any, int]:
+    """Renumber the chunks of sources with missing or repeated chunk indexes.
+
+    Chunks are numbered in primary key, i.e. insertion, order. Returns the new
+    chunk index by primary key.
+    """
+    primary_key = next(n for n, f in source_fields.items() if f.get("is_primary"))
+    chunks: defaultdict[str, list[tuple[Any, int | None]]] = defaultdict(list)
+    iterator = client.query_iterator(
+        collection_name=collection,
+        batch_size=batch_size * 10,
+        filter="",
+        output_fields=[
+            field
+            for field in (METADATA_FIELD, SOURCE_ID_FIELD, CHUNK_INDEX_FIELD)
+            if field in source_fields
+        ],
+    )
+    try:
+        while rows := iterator.next():
+            for row in rows:
+                source_id, chunk_index = get_chunk_ref(row)
+                chunks[source_id].append((row[primary_key], chunk_index))
+    finally:
+        iterator.close()
+
+    chunk_indexes: dict[Any, int] = {}
+    for source_chunks in chunks.values():
+        indexes = [chunk_index for _, chunk_index in source_chunks]
+        if None not in indexes and len(set(indexes)) == len(indexes):
+            continue
+        for chunk_index, (key, _) in enumerate(sorted(source_chunks)):
+            chunk_indexes[key] = chunk_index
+    return chunk_indexes
+
+
+def swap_in(
+    client: MilvusClient, collection: str, live: str | None, target: str
+) -> str:
+    """Swap the migrated collection in, returning the original collection.
+
+    A collection behind an alias stays there, the alias is pointed at the
+    migrated collection under a versioned name, like a reindex does.
+    """
+    if live is not None:
+        migrated = f"{collection}_{datetime.now(UTC):%Y%m%d%H%M%S}"
+        client.rename_collection(target, migrated)
+        client.alter_alias(migrated, collection)
+        return live
+
+    legacy = f"{collection}_legacy"
+    client.rename_collection(collection, legacy)
+    client.rename_collection(target, collection)
+    return legacy
+
+
+def migrate_collection(vector_db: ModMilvus, options: MigrationOptions) -> None:
+    """Copy a collection into the current schema and swap it in."""
+    client = vector_db.client
+    collection = vector_db.collection
+    live = resolve_alias(client, collection)
+    if live is None and not client.has_collection(collection):
+        print(f"[{collection}] Collection does not exist, skipping")
+        return
+
+    source_fields = {
+        field["name"]: field
+        for field in client.describe_collection(live or collection)["fields"]
+    }
+    dimensions, vector_dtype = resolve_vector_field(collection, source_fields, options)
+    if is_migrated(source_fields, (dimensions, vector_dtype)):
+        print(f"[{collection}] Already on the current schema")
+        return
+
+    hybrid = SPARSE_FIELD in source_fields
+    target = f"{collection}_migrating"
+    if client.has_collection(target):
+        print(f"[{collection}] Dropping incomplete copy '{target}'")
+        client.drop_collection(target)
+
+    client.create_collection(
+        collection_name=target,
+        schema=build_collection_schema(client, dimensions, hybrid, vector_dtype),
+        index_params=build_index_params(client, hybrid, vector_db.index_profile),
+        num_partitions=VECTOR_DB_NUM_PARTITIONS,
+        consistency_level=vector_db.index_profile.consistency_level,
+    )
+
+    chunk_indexes = plan_chunk_indexes(
+        client, live or collection, source_fields, options.batch_size
+    )
+    if chunk_indexes:
+        print(f"[{collection}] Renumbering {len(chunk_indexes)} chunks")
+
+    # Primary keys are regenerated and BM25 vectors are derived on insert
+    primary_key = next(n for n, f in source_fields.items() if f.get("is_primary"))
+    excluded_fields = {SPARSE_FIELD, primary_key}
+
+    copied = skipped = 0
+    iterator = client.query_iterator(
+        collection_name=live or collection,
+        batch_size=options.batch_size,
+        filter="",
+        output_fields=["*"],
+    )
+    try:
+        while rows := iterator.next():
+            batch: list[dict] = []
+            accounts = [
+                resolve_account_id(row, options.account_map, options.default_account_id)
+                for row in rows
+            ]
+            kept = [(row, acc) for row, acc in zip(rows, accounts, strict=True) if acc]
+            skipped += len(rows) - len(kept)
+            vectors = (
+                convert_vectors(
+                    vector_db,
+                    [row for row, _ in kept],
+                    dimensions,
+                    vector_dtype,
+                    options.reembed,
+                )
+                if kept
+                else []
+            )
+            for (row, account_id), vector in zip(kept, vectors, strict=True):
+                entity = {k: v for k, v in row.items() if k not in excluded_fields}
+                source_id, chunk_index = get_chunk_ref(row)
+                if row[primary_key] in chunk_indexes:
+                    chunk_index = chunk_indexes[row[primary_key]]
+                    entity[METADATA_FIELD] = {
+                        **(row.get(METADATA_FIELD) or {}),
+                        CHUNK_INDEX_FIELD: chunk_index,
+                    }
+                batch.append(
+                    {
+                        **entity,
+                        VECTOR_FIELD: vector,
+                        ACCOUNT_ID_FIELD: account_id,
+                        SOURCE_ID_FIELD: source_id,
+                        CHUNK_INDEX_FIELD: chunk_index,
+                    }
+                )
+
+            if batch:
+                client.insert(collection_name=target, data=batch)
+                copied += len(batch)
+            print(f"[{collection}] Copied {copied}, skipped {skipped} without account")
+    finally:
+        iterator.close()
+
+    legacy = swap_in(client, collection, live, target)
+    print(f"[{collection}] Swapped in migrated collection, original is '{legacy}'")
+
+    if options.drop_legacy:
+        client.drop_collection(legacy)
+        print(f"[{collection}] Dropped '{legacy}'")
+
+
+def main() -> None:
+    """Migrate the text and video collections."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--account-map", help="JSON file of source id to account id")
+    parser.add_argument("--default-account-id", help="Account of unmapped chunks")
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        help="Vector dimensions, defaults to those of each collection",
+    )
+    parser.add_argument(
+        "--vector-dtype",
+        choices=["float32", "float16"],
+        help="Vector dtype, defaults to that of each collection",
+    )
+    parser.add_argument(
+        "--reembed",
+        action="store_true",
+        help="Re-embed chunk content instead of truncating the stored vectors",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--drop-legacy", action="store_true")
+    args = parser.parse_args()
+
+    account_map: dict[str, str] = {}
+    if args.account_map:
+        with open(args.account_map, encoding="utf-8") as file:
+            account_map = json.load(file)
+
+    options = MigrationOptions(
+        account_map=account_map,
+        default_account_id=args.default_account_id,
+        dimensions=args.dimensions,
+        vector_dtype=args.vector_dtype,
+        reembed=args.reembed,
+        batch_size=args.batch_size,
+        drop_legacy=args.drop_legacy,
+    )
+    for knowledge_base in (text_knowledge_base, video_knowledge_base):
+        migrate_collection(knowledge_base.vector_db, options)
+
+
+if __name__ == "__main__":
+    main()
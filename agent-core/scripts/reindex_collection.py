@@ -0,0 +1,369 @@
+"""Script to reindex a knowledge base collection without downtime.
+
+The app addresses collections by `TEXT_COLLECTION_NAME` / `VIDEO_COLLECTION_NAME`
+and Milvus resolves those names as aliases of versioned collections
+(`<name>_<timestamp>`). To change the vector field, index or hybrid mode:
+
+1. A shadow collection is created with the target schema and index profile.
+2. The shadow is published in Redis, and the app dual-writes new chunks and
+   deletes to it.
+3. Existing chunks are backfilled with a query iterator, with vectors
+   truncated or re-embedded (`--reembed`).
+4. The shadow is reconciled with the live collection by source and chunk
+   index until their chunk counts match.
+5. The alias is swapped to the shadow, and duplicates of chunks dual-written
+   during the swap are removed. Only chunks written after the reconciliation
+   are deduplicated, chunks stored with repeated chunk indexes are kept.
+
+The previous collection is kept for rollback unless `--drop-old` is set. A
+collection named like the alias (before its first reindex) is renamed to
+`<name>_initial`, which leaves the name unresolved for one rename.
+
+Re-embedded shadows (`--reembed`, e.g. with a new `EMBEDDING_MODEL` or
+embedding backend in the job's environment) are not dual-written, only
+reconciled: pause training until the swap, and switch the app to the new
+embedding model after it.
+
+Usage:
+    python scripts/reindex_collection.py --collection text --dimensions 768
+    python scripts/reindex_collection.py --collection video \
+        --index-profile '{"index_type": "HNSW", "params": {"M": 16}}'
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import UTC, datetime
+
+from pymilvus import MilvusClient
+
+from app.config import IndexProfile, settings
+from app.modules.core.knowledge_bases import text_knowledge_base, video_knowledge_base
+from app.modules.db.collection_copy import convert_vectors, get_contents
+from app.modules.db.mod_milvus import ModMilvus
+from app.modules.db.reindex import (
+    ReindexState,
+    clear_reindex_state,
+    set_reindex_state,
+)
+from app.modules.db.schema import (
+    CHUNK_INDEX_FIELD,
+    CONTENT_FIELD,
+    SOURCE_ID_FIELD,
+    SPARSE_FIELD,
+    VECTOR_FIELD,
+    build_collection_schema,
+    build_index_params,
+    get_vector_field,
+)
+from app.utils.json_utils import json_dumps
+
+VECTOR_DB_NUM_PARTITIONS: int = settings.VECTOR_DB_NUM_PARTITIONS
+
+ChunkKey = tuple[str | None, int | None]
+
+
+class Reindex:
+    """Reindex of one collection alias into a shadow collection."""
+
+    def __init__(self, vector_db: ModMilvus, args: argparse.Namespace):
+        """Reindex constructor."""
+        self.vector_db: ModMilvus = vector_db
+        self.client: MilvusClient = vector_db.client
+        self.alias: str = vector_db.collection
+        self.args = args
+        self.live: str = self.resolve_live_collection()
+        self.shadow: str = f"{self.alias}_{datetime.now(UTC):%Y%m%d%H%M%S}"
+        if args.hybrid is None:
+            # Keep the hybrid mode of the live collection
+            fields = self.client.describe_collection(self.live)["fields"]
+            args.hybrid = SPARSE_FIELD in {field["name"] for field in fields}
+        self.state = ReindexState(
+            shadow=self.shadow,
+            dimensions=args.dimensions,
+            vector_dtype=args.vector_dtype,
+            reembed=args.reembed,
+            hybrid=args.hybrid,
+        )
+
+    def resolve_live_collection(self) -> str:
+        """Get the collection behind the alias, or the collection named like it."""
+        try:
+            return self.client.describe_alias(self.alias)["collection_name"]
+        except Exception:
+            if self.client.has_collection(self.alias):
+                return self.alias
+        raise SystemExit(f"[{self.alias}] No collection or alias to reindex")
+
+    def log(self, message: str) -> None:
+        """Print a progress message."""
+        print(f"[{self.alias}] {message}")
+
+    def heartbeat(self) -> None:
+        """Keep the reindex state, and so the app's dual-writes, alive."""
+        set_reindex_state(self.alias, self.state)
+
+    def create_shadow(self) -> None:
+        """Create the shadow collection with the target schema."""
+        fields = self.client.describe_collection(self.live)["fields"]
+        if SOURCE_ID_FIELD not in {field["name"] for field in fields}:
+            raise SystemExit(f"[{self.alias}] Run run:migrate-collections first")
+
+        source_dimensions, _ = get_vector_field(fields)
+        if source_dimensions < self.args.dimensions and not self.args.reembed:
+            raise SystemExit(f"[{self.alias}] Growing dimensions requires --reembed")
+
+        profile: IndexProfile = (
+            IndexProfile.model_validate_json(self.args.index_profile)
+            if self.args.index_profile
+            else self.vector_db.index_profile
+        )
+        self.client.create_collection(
+            collection_name=self.shadow,
+            schema=build_collection_schema(
+                self.client,
+                self.args.dimensions,
+                self.args.hybrid,
+                self.args.vector_dtype,
+            ),
+            index_params=build_index_params(self.client, self.args.hybrid, profile),
+            num_partitions=VECTOR_DB_NUM_PARTITIONS,
+            consistency_level=profile.consistency_level,
+        )
+        self.log(
+            f"Created shadow '{self.shadow}' from '{self.live}': "
+            f"{self.args.dimensions}x{self.args.vector_dtype} "
+            f"{profile.index_type} hybrid={self.args.hybrid}"
+        )
+
+    def copy_rows(self, rows: list[dict]) -> int:
+        """Copy rows of the live collection into the shadow."""
+        if not rows:
+            return 0
+
+        vectors = convert_vectors(
+            self.vector_db,
+            rows,
+            self.args.dimensions,
+            self.args.vector_dtype,
+            self.args.reembed,
+        )
+        # Primary keys are regenerated and BM25 vectors are derived on insert
+        entities = [
+            {
+                **{k: v for k, v in row.items() if k not in {"id", SPARSE_FIELD}},
+                VECTOR_FIELD: vector,
+            }
+            for row, vector in zip(rows, vectors, strict=True)
+        ]
+        if self.args.hybrid:
+            # Content offloaded to the content store is needed for BM25
+            for entity, content in zip(
+                entities, get_contents(self.vector_db, rows), strict=True
+            ):
+                entity[CONTENT_FIELD] = content
+        self.client.insert(collection_name=self.shadow, data=entities)
+        return len(entities)
+
+    def backfill(self) -> None:
+        """Copy the existing chunks of the live collection."""
+        copied = 0
+        iterator = self.client.query_iterator(
+            collection_name=self.live,
+            batch_size=self.args.batch_size,
+            filter="",
+            output_fields=["*"],
+        )
+        try:
+            while rows := iterator.next():
+                copied += self.copy_rows(rows)
+                self.heartbeat()
+                self.log(f"Backfilled {copied} chunks")
+        finally:
+            iterator.close()
+
+    def collect_chunk_ids(self, collection: str) -> dict[ChunkKey, list[int]]:
+        """Get the ids of every chunk of a collection by source and chunk index."""
+        chunk_ids: dict[ChunkKey, list[int]] = defaultdict(list)
+        iterator = self.client.query_iterator(
+            collection_name=collection,
+            batch_size=self.args.batch_size * 10,
+            filter="",
+            output_fields=[SOURCE_ID_FIELD, CHUNK_INDEX_FIELD],
+        )
+        try:
+            while rows := iterator.next():
+                for row in rows:
+                    key = (row.get(SOURCE_ID_FIELD), row.get(CHUNK_INDEX_FIELD))
+                    chunk_ids[key].append(row["id"])
+        finally:
+            iterator.close()
+        return chunk_ids
+
+    def reconcile(self) -> tuple[int, int]:
+        """Copy chunks missing from the shadow and delete stale ones.
+
+        Returns the number of copied and deleted chunks.
+        """
+        live_ids = self.collect_chunk_ids(self.live)
+        shadow_ids = self.collect_chunk_ids(self.shadow)
+
+        stale: list[int] = []
+        missing: list[int] = []
+        for key in live_ids.keys() | shadow_ids.keys():
+            expected, present = live_ids.get(key, []), shadow_ids.get(key, [])
+            stale.extend(present[len(expected) :])
+            missing.extend(expected[len(present) :])
+
+        for start in range(0, len(stale), self.args.batch_size):
+            self.client.delete(
+                collection_name=self.shadow,
+                ids=stale[start : start + self.args.batch_size],
+            )
+
+        copied = 0
+        for start in range(0, len(missing), self.args.batch_size):
+            ids = missing[start : start + self.args.batch_size]
+            copied += self.copy_rows(
+                self.client.query(
+                    collection_name=self.live,
+                    filter=f"id in {json_dumps(ids)}",
+                    output_fields=["*"],
+                )
+            )
+            self.heartbeat()
+
+        return copied, len(stale)
+
+    def count(self, collection: str) -> int:
+        """Count the chunks of a collection."""
+        return self.client.query(
+            collection_name=collection,
+            filter="",
+            output_fields=["count(*)"],
+            consistency_level="Strong",
+        )[0]["count(*)"]
+
+    def swap(self) -> str:
+        """Point the alias at the shadow, returning the previous collection."""
+        if self.live != self.alias:
+            self.client.alter_alias(self.shadow, self.alias)
+            return self.live
+
+        # First reindex: the app still uses the collection named like the alias
+        initial = f"{self.alias}_initial"
+        self.client.rename_collection(self.alias, initial)
+        self.client.create_alias(self.shadow, self.alias)
+        return initial
+
+    def get_max_id(self, collection: str) -> int:
+        """Get the highest chunk id of a collection."""
+        return max(
+            (i for ids in self.collect_chunk_ids(collection).values() for i in ids),
+            default=0,
+        )
+
+    def remove_duplicates(self, max_reconciled_id: int) -> int:
+        """Delete chunks dual-written twice while the alias was swapped.
+
+        Only chunks written after the reconciliation are removed. Sources
+        trained before chunks were numbered across the source repeat chunk
+        indexes, and those chunks are all kept.
+        """
+        duplicates: list[int] = []
+        for (source_id, _), ids in self.collect_chunk_ids(self.shadow).items():
+            written = sorted(i for i in ids if i > max_reconciled_id)
+            if not source_id or not written:
+                continue
+            # Keep one of the written chunks unless the key was reconciled
+            duplicates.extend(written[1:] if len(written) == len(ids) else written)
+        for start in range(0, len(duplicates), self.args.batch_size):
+            self.client.delete(
+                collection_name=self.shadow,
+                ids=duplicates[start : start + self.args.batch_size],
+            )
+        return len(duplicates)
+
+    def run(self) -> None:
+        """Build the shadow collection and swap the alias to it."""
+        self.create_shadow()
+        self.heartbeat()
+        try:
+            self.backfill()
+
+            for round_number in range(1, self.args.reconcile_rounds + 1):
+                copied, deleted = self.reconcile()
+                live_count, shadow_count = (
+                    self.count(self.live),
+                    self.count(self.shadow),
+                )
+                self.log(
+                    f"Reconcile round {round_number}: copied {copied}, "
+                    f"deleted {deleted}, live {live_count}, shadow {shadow_count}"
+                )
+                if live_count == shadow_count:
+                    break
+            else:
+                raise SystemExit(
+                    f"[{self.alias}] Counts do not match, alias not swapped. "
+                    f"Shadow kept as '{self.shadow}'"
+                )
+
+            max_reconciled_id = self.get_max_id(self.shadow)
+            previous = self.swap()
+        finally:
+            clear_reindex_state(self.alias)
+
+        self.log(f"Alias now points to '{self.shadow}', previous is '{previous}'")
+        self.log(
+            f"Removed {self.remove_duplicates(max_reconciled_id)} duplicated chunks"
+        )
+
+        if self.args.drop_old:
+            self.client.drop_collection(previous)
+            self.log(f"Dropped '{previous}'")
+        else:
+            self.log(f"Roll back with client.alter_alias('{previous}', '{self.alias}')")
+
+
+def main() -> None:
+    """Reindex a knowledge base collection."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collection", choices=["text", "video"], default="text")
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        help="Vector dimensions, defaults to those of the collection's embedder",
+    )
+    parser.add_argument(
+        "--vector-dtype",
+        choices=["float32", "float16"],
+        default=settings.VECTOR_DTYPE,
+    )
+    parser.add_argument(
+        "--index-profile",
+        help="JSON index profile, defaults to the collection's configured profile",
+    )
+    parser.add_argument(
+        "--hybrid",
+        action=argparse.BooleanOptionalAction,
+        help="Hybrid (BM25) shadow, defaults to the live collection's mode",
+    )
+    parser.add_argument(
+        "--reembed",
+        action="store_true",
+        help="Re-embed chunk content instead of truncating the stored vectors",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--reconcile-rounds", type=int, default=3)
+    parser.add_argument("--drop-old", action="store_true")
+    args = parser.parse_args()
+
+    knowledge_base = (
+        text_knowledge_base if args.collection == "text" else video_knowledge_base
+    )
+    args.dimensions = args.dimensions or knowledge_base.vector_db.embedder.dimensions
+    Reindex(knowledge_base.vector_db, args).run()
+
+
+if __name__ == "__main__":
+    main()
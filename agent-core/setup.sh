@@ -39,5 +39,5 @@ pre-commit install --hook-type pre-commit --hook-type pre-push
 echo "Pre-commits setup complete."
 
 echo "Quantizing reranker model..."
-poetry run run:quantize-reranker
+poetry run run:quantize-reranker --install
 echo "Saved quantized reranker model."